@@ -1,13 +1,18 @@
-from fastapi import FastAPI , HTTPException , Depends
+from fastapi import FastAPI , HTTPException , Depends , Request , BackgroundTasks , Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List , Optional
+from fastapi.responses import StreamingResponse
+from typing import List , Literal , Optional
 from pydantic import BaseModel
 from uuid import UUID
 import os
+import re
+import json
+import tempfile
 import logging 
 from src.orchestrator import ContextOrchestrator
+from src.bulk_ingest import BulkIngestor
 from dotenv import load_dotenv
-from src.Schemas import ( ConversationInput, ProcessConversationRequest, ProcessConversationResponse, LLMProvider)
+from src.Schemas import ( ConversationInput, ProcessConversationRequest, ProcessConversationResponse, LLMProvider, RankingWeights, ContextRequest, ContextResponse)
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 os.environ["HF_HUB_DISABLE_SYMLINKS"] = "1"
 
@@ -32,25 +37,134 @@ app.add_middleware(
 
 orchestrator: Optional[ContextOrchestrator] = None
 
+def _stage_limits_from_env() -> dict:
+    env_map = {
+        "extraction": "EXTRACTION_CONCURRENCY",
+        "embedding": "EMBEDDING_CONCURRENCY",
+        "working": "WORKING_CONCURRENCY",
+        "episodic": "EPISODIC_CONCURRENCY",
+        "semantic": "SEMANTIC_CONCURRENCY",
+    }
+    return {
+        stage: int(os.environ[var])
+        for stage, var in env_map.items()
+        if os.getenv(var)
+    }
+
+def _retrieval_timeouts_from_env() -> dict:
+    env_map = {
+        "working": "RETRIEVAL_TIMEOUT_WORKING",
+        "episodic": "RETRIEVAL_TIMEOUT_EPISODIC",
+        "semantic": "RETRIEVAL_TIMEOUT_SEMANTIC",
+    }
+    return {
+        store: float(os.environ[var])
+        for store, var in env_map.items()
+        if os.getenv(var)
+    }
+
+def _token_budgets_from_env() -> dict:
+    env_map = {
+        provider.value: f"TOKEN_BUDGET_{provider.name}"
+        for provider in LLMProvider
+    }
+    return {
+        provider: int(os.environ[var])
+        for provider, var in env_map.items()
+        if os.getenv(var)
+    }
+
+def _ranking_weights_from_env() -> Optional[RankingWeights]:
+    env_map = {
+        "similarity": "RANKING_WEIGHT_SIMILARITY",
+        "recency": "RANKING_WEIGHT_RECENCY",
+        "confidence": "RANKING_WEIGHT_CONFIDENCE",
+        "reinforcement": "RANKING_WEIGHT_REINFORCEMENT",
+        "half_life_hours": "RANKING_HALF_LIFE_HOURS",
+    }
+    overrides = {
+        field: float(os.environ[var])
+        for field, var in env_map.items()
+        if os.getenv(var)
+    }
+    return RankingWeights(**overrides) if overrides else None
+
 class SemanticSearchRequest(BaseModel):
     query:str
     top_k:int=10
     min_confidence:float = 0.5
+    # "vector", "lexical" (BM25) or "hybrid" (rank-fused); the server's RETRIEVAL_MODE when unset
+    mode: Optional[Literal["vector","lexical","hybrid"]] = None
+    # Restricts results to one project; include_global adds global-scope memories
+    project_id: Optional[str] = None
+    include_global: Optional[bool] = None
+    # Re-ranking weights for this search; the server's defaults when unset
+    ranking_weights: Optional[RankingWeights] = None
 
 
 def get_orchestrator() -> ContextOrchestrator:
+    if not os.getenv("GROQ_API_KEY"):
+        raise HTTPException(status_code=500, detail="")
+    return _create_orchestrator()
+
+
+def _create_orchestrator() -> ContextOrchestrator:
+    # Requests go through get_orchestrator, which needs the LLM key; startup
+    # replay of the write-behind journal does not
     global orchestrator
     if orchestrator is None :
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key :
-            raise HTTPException(status_code=500, detail="")
         orchestrator = ContextOrchestrator(
-            groq_api_key=groq_api_key,
+            groq_api_key=os.getenv("GROQ_API_KEY"),
             sqlite_db_path=os.getenv("SQLITE_DB_PATH", "episodic_memory.db"),
+            sqlite_pool_size=int(os.getenv("SQLITE_POOL_SIZE", "4")),
             qdrant_host=os.getenv("QDRANT_HOST", "localhost"),
             qdrant_port=int(os.getenv("QDRANT_PORT", "6333")),
             qdrant_collection=os.getenv("QDRANT_COLLECTION", "semantic_memory"),
-            vector_size=int(os.getenv("VECTOR_SIZE", "384"))
+            qdrant_mode=os.getenv("QDRANT_MODE", "memory"),
+            qdrant_grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+            qdrant_url=os.getenv("QDRANT_URL") or None,
+            qdrant_path=os.getenv("QDRANT_PATH") or None,
+            qdrant_api_key=os.getenv("QDRANT_API_KEY") or None,
+            qdrant_timeout=int(os.getenv("QDRANT_TIMEOUT", "10")),
+            qdrant_max_retries=int(os.getenv("QDRANT_MAX_RETRIES", "3")),
+            semantic_backend=os.getenv("SEMANTIC_BACKEND", "qdrant"),
+            numpy_index_path=os.getenv("NUMPY_INDEX_PATH") or None,
+            snapshot_max_sessions=int(os.getenv("SNAPSHOT_MAX_SESSIONS", "1024")),
+            snapshot_ttl_seconds=float(os.getenv("SNAPSHOT_TTL_SECONDS", "60")),
+            vector_size=int(os.getenv("VECTOR_SIZE", "384")),
+            retrieval_flush_interval=float(os.getenv("RETRIEVAL_STATS_FLUSH_INTERVAL", "5")),
+            retrieval_flush_threshold=int(os.getenv("RETRIEVAL_STATS_FLUSH_THRESHOLD", "256")),
+            working_backend=os.getenv("WORKING_MEMORY_BACKEND", "memory"),
+            working_max_entries=int(os.getenv("WORKING_MEMORY_MAX_ENTRIES", "10000")),
+            working_sweep_interval=float(os.getenv("WORKING_MEMORY_SWEEP_INTERVAL", "60")),
+            redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            executor_max_workers=int(os.getenv("EXECUTOR_MAX_WORKERS", "0")) or None,
+            stage_limits=_stage_limits_from_env(),
+            embedding_batch_max_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64")),
+            embedding_batch_max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "0")),
+            embedding_cache_max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+            extraction_cache_max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "1024")),
+            extraction_cache_ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", str(24 * 3600))),
+            extraction_cache_path=os.getenv("EXTRACTION_CACHE_PATH") or None,
+            policy_rules_path=os.getenv("POLICY_RULES_PATH") or None,
+            policy_reload_interval=float(os.getenv("POLICY_RELOAD_INTERVAL", "1")),
+            extraction_streaming=os.getenv("EXTRACTION_STREAMING", "false").lower() in ("1", "true", "yes"),
+            dedup_enabled=os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes"),
+            dedup_similarity_threshold=float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.95")),
+            tokenizer_name=os.getenv("TOKENIZER_NAME") or None,
+            tokenizer_path=os.getenv("TOKENIZER_PATH") or None,
+            token_budgets=_token_budgets_from_env(),
+            retrieval_mode=os.getenv("RETRIEVAL_MODE", "hybrid"),
+            include_global_scope=os.getenv("RETRIEVAL_INCLUDE_GLOBAL", "true").lower() in ("1", "true", "yes"),
+            rerank_enabled=os.getenv("RERANK_ENABLED", "true").lower() in ("1", "true", "yes"),
+            ranking_weights=_ranking_weights_from_env(),
+            rerank_overfetch=int(os.getenv("RERANK_OVERFETCH", "3")),
+            retrieval_timeouts=_retrieval_timeouts_from_env(),
+            write_behind_enabled=os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes"),
+            write_behind_path=os.getenv("WRITE_BEHIND_PATH") or None,
+            write_behind_batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "256")),
+            write_behind_max_attempts=int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
         )
     return orchestrator
 
@@ -63,9 +177,9 @@ async def root():
         "status": "operational",
         "version": "2.0.0",
         "storage": {
-            "working_memory": "Redis",
+            "working_memory": "Redis" if os.getenv("WORKING_MEMORY_BACKEND", "memory") == "redis" else "In-memory",
             "episodic_memory": "SQLite",
-            "semantic_memory": "Qdrant"
+            "semantic_memory": "NumPy" if os.getenv("SEMANTIC_BACKEND", "qdrant") == "numpy" else "Qdrant"
         }
     }
 
@@ -74,7 +188,7 @@ async def health_check(
     orch: ContextOrchestrator = Depends(get_orchestrator)
 ):
     """Detailed health check of all subsystems"""
-    health = orch.memory_store.health_check()
+    health = await orch.executor.run("semantic", orch.memory_store.health_check)
     
     overall_healthy = all(health.values())
     status_code = 200 if overall_healthy else 503
@@ -84,14 +198,59 @@ async def health_check(
         "subsystems": health
     }
 
+async def _deferred_extraction(orch: ContextOrchestrator , request: ProcessConversationRequest):
+    session_id = request.conversation_input.session_id
+    try:
+        _ , stored_memories , _ = await orch.extract_and_store(
+            request.conversation_input,
+            apply_polices=request.apply_policies,
+            extraction_mode=request.extraction_mode
+        )
+        print(f"Deferred extraction for session {session_id} stored {len(stored_memories)} memories")
+    except Exception as e:
+        print(f"Deferred extraction for session {session_id} failed: {e}")
+
+@app.post("/api/context" , response_model=ContextResponse)
+async def get_context(request: ContextRequest , orch:ContextOrchestrator = Depends(get_orchestrator)):
+    # Retrieval and rendering only; nothing is extracted or stored
+    try:
+        return await orch.get_context(
+            conversation_input=request.conversation_input,
+            target_provider=request.target_provider,
+            ranking_weights=request.ranking_weights
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500,detail= f"Context error: {str(e)}")
+
 @app.post("/api/process" , response_model=ProcessConversationResponse)
-async def process_conversation(request: ProcessConversationRequest , orch:ContextOrchestrator = Depends(get_orchestrator)):
+async def process_conversation(
+    request: ProcessConversationRequest,
+    background_tasks: BackgroundTasks,
+    orch:ContextOrchestrator = Depends(get_orchestrator)
+):
     try:
+        if request.defer_extraction:
+            # The response carries retrieved context only; extraction and
+            # storage run once it has been sent
+            context = await orch.get_context(
+                conversation_input=request.conversation_input,
+                target_provider=request.target_provider,
+                ranking_weights=request.ranking_weights
+            )
+            background_tasks.add_task(_deferred_extraction , orch , request)
+            return ProcessConversationResponse(
+                rendered_context=context.rendered_context,
+                stored_memories=[],
+                policy_decisions=[],
+                metadata={**context.metadata , "extraction_deferred": True}
+            )
         response = await orch.process_conversation(
             conversation_input=request.conversation_input,
             target_provider=request.target_provider,
             apply_polices=request.apply_policies,
-            retrieve_context=request.retrieve_context
+            retrieve_context=request.retrieve_context,
+            extraction_mode=request.extraction_mode,
+            ranking_weights=request.ranking_weights
         )
         print("Process conversation response:", response)
         return response
@@ -101,7 +260,7 @@ async def process_conversation(request: ProcessConversationRequest , orch:Contex
 @app.get("/api/memory/stats/{session_id}")
 async def get_memory_stat(session_id:str , orch : ContextOrchestrator = Depends(get_orchestrator)):
     try:
-        stats = orch.get_memory_stats(session_id)
+        stats = await orch.get_memory_stats(session_id)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500,detail=f"Stats error: {str(e)}")
@@ -109,7 +268,11 @@ async def get_memory_stat(session_id:str , orch : ContextOrchestrator = Depends(
 @app.get("/api/memory/working/{session_id}")
 async def get_working_memory(session_id:str , orch : ContextOrchestrator = Depends(get_orchestrator)):
     try:
-        memories = orch.memory_store.working.get_active(session_id)
+        memories = await orch.executor.run(
+            "working",
+            orch.memory_store.working.get_active,
+            session_id
+        )
         return{
             "session_id":session_id,
             "memories":[mem.model_dump() for mem in memories]
@@ -123,7 +286,11 @@ async def get_working_memory(session_id:str , orch : ContextOrchestrator = Depen
 @app.get("/api/memory/episodic/{session_id}")
 async def get_episodic_memory(session_id:str,limit:int = 20 , orch:ContextOrchestrator=Depends(get_orchestrator)):
     try:
-        memories = orch.memory_store.episodic.get_session_timeline(session_id)
+        memories = await orch.executor.run(
+            "episodic",
+            orch.memory_store.episodic.get_session_timeline,
+            session_id
+        )
         memories = memories[-limit] if len(memories) > limit else memories
         return{
             "session_id":session_id,
@@ -135,14 +302,30 @@ async def get_episodic_memory(session_id:str,limit:int = 20 , orch:ContextOrches
 @app.get("/api/memory/semantic/search")
 async def search_semantic_memory(request:SemanticSearchRequest,orch:ContextOrchestrator= Depends(get_orchestrator)):
     try:
-        query_embedding = orch.extractor.generate_embedding(request.query)
-        memories = orch.memory_store.semantic.search(
+        mode = request.mode or orch.retrieval_mode
+        # Lexical search needs no query vector
+        query_embedding = (
+            (await orch.embed_texts([request.query]))[0] if mode != "lexical" else None
+        )
+        memories = await orch.executor.run(
+            "semantic",
+            orch.memory_store.search_semantic,
+            request.query,
             query_embedding,
             top_k = request.top_k,
-            min_confidence=request.min_confidence
+            mode=mode,
+            min_confidence=request.min_confidence,
+            project_id=request.project_id,
+            include_global=(
+                orch.include_global_scope if request.include_global is None
+                else request.include_global
+            ),
+            ranking_weights=request.ranking_weights
         )
+        orch.schedule_retrieval_flush()
         return{
             "query":request.query,
+            "mode":mode,
             "results":[mem.model_dump() for mem in memories]
         }
     except Exception as e:
@@ -151,7 +334,8 @@ async def search_semantic_memory(request:SemanticSearchRequest,orch:ContextOrche
 @app.delete("/api/memory/deprecate/{memory_id}")
 async def deprecate_memory(memory_id:str,orch:ContextOrchestrator=Depends(get_orchestrator)):
     try:
-        orch.memory_store.semantic.deprecate(memory_id)
+        # Through the manager so the snapshots and the lexical index drop it too
+        await orch.executor.run("semantic", orch.memory_store.deprecate_semantic, [memory_id])
         return {
             "memory_id": memory_id,
             "status": "deprecated"
@@ -169,7 +353,13 @@ async def reinforce_memory(
     orch:ContextOrchestrator=Depends(get_orchestrator)
 ):
     try:
-        orch.memory_store.semantic.reinforce(memory_id,confidence_boost)
+        await orch.executor.run(
+            "semantic",
+            orch.memory_store.semantic.reinforce,
+            memory_id,
+            confidence_boost
+        )
+        orch.memory_store.snapshots.invalidate_semantic()
         return{
             "memory_id": memory_id,
             "status": "reinforced"
@@ -180,10 +370,85 @@ async def reinforce_memory(
             detail=f"Reinforcement error: {str(e)}"
         )
     
+@app.post("/api/ingest/bulk")
+async def bulk_ingest(
+    request: Request,
+    concurrency: int = Query(4, ge=1, le=32),
+    batch_size: int = Query(32, ge=1, le=512),
+    checkpoint: Optional[str] = None,
+    orch:ContextOrchestrator=Depends(get_orchestrator)
+):
+    """Ingest an NDJSON body of conversation records; streams NDJSON progress"""
+    checkpoint_path = None
+    if checkpoint:
+        # Names of dots alone ("." / "..") would resolve to a directory
+        if not re.fullmatch(r"[A-Za-z0-9_.-]+" , checkpoint) or not checkpoint.strip("."):
+            raise HTTPException(status_code=400, detail="Invalid checkpoint name")
+        checkpoint_dir = os.getenv("INGEST_CHECKPOINT_DIR", "ingest_checkpoints")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint_path = os.path.join(checkpoint_dir, checkpoint)
+    ingestor = BulkIngestor(
+        orch,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        checkpoint_path=checkpoint_path
+    )
+
+    # The body is spooled before responding: the streaming response listens for
+    # client disconnects on the same receive channel the body arrives on.
+    # Spool file I/O runs on the executor, off the event loop
+    spool = tempfile.TemporaryFile()
+    try:
+        async for chunk in request.stream():
+            await orch.executor.run("ingest_spool", spool.write, chunk)
+        await orch.executor.run("ingest_spool", spool.seek, 0)
+    except Exception:
+        spool.close()
+        ingestor.close()
+        raise
+
+    async def spooled_lines():
+        while True:
+            lines = await orch.executor.run("ingest_spool", spool.readlines, 1024 * 1024)
+            if not lines:
+                return
+            for line in lines:
+                yield line
+
+    async def progress_lines():
+        try:
+            async for progress in ingestor.ingest(spooled_lines()):
+                yield progress.model_dump_json() + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Ingestion error: {str(e)}", "done": True}) + "\n"
+        finally:
+            ingestor.close()
+            spool.close()
+
+    return StreamingResponse(progress_lines(), media_type="application/x-ndjson")
+
+@app.get("/api/policy/rules")
+async def get_policy_rules(orch:ContextOrchestrator=Depends(get_orchestrator)):
+    return orch.policy_engine.rule_stats()
+
+@app.post("/api/policy/reload")
+async def reload_policy_rules(orch:ContextOrchestrator=Depends(get_orchestrator)):
+    if not orch.policy_engine.rules_path:
+        raise HTTPException(status_code=400, detail="No POLICY_RULES_PATH configured")
+    if not orch.policy_engine.reload_rules():
+        raise HTTPException(
+            status_code=500,
+            detail=f"Policy reload error: {orch.policy_engine.last_reload_error}"
+        )
+    return orch.policy_engine.rule_stats()
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup"""
     print("🧠 Agentic Memory Backend starting...")
+    if os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes"):
+        # Created eagerly so writes journaled before the last shutdown are replayed now
+        _create_orchestrator().start_write_behind()
     print("✓ Orchestrator ready")
     print("✓ Memory subsystems initialized")
 
@@ -192,6 +457,8 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("🧠 Agentic Memory Backend shutting down...")
+    if orchestrator is not None:
+        await orchestrator.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+"""Backfill memories from NDJSON conversation archives.
+
+Each line is either a ConversationInput object or a transcript with a
+``messages`` list of {"role", "content"} objects. A record ``timestamp``, or
+one on each message, dates the memories extracted from it:
+
+    python ingest.py exports.ndjson --checkpoint exports.ckpt
+
+Re-running with the same checkpoint file skips records already ingested.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from app import get_orchestrator
+from src.bulk_ingest import BulkIngestor
+
+async def _file_lines(paths):
+    for path in paths:
+        if path == "-":
+            for line in sys.stdin:
+                yield line
+            continue
+        with open(path , "r" , encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+async def _run(args) -> int:
+    orchestrator = get_orchestrator()
+    ingestor = BulkIngestor(
+        orchestrator,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint
+    )
+    progress = None
+    try:
+        async for progress in ingestor.ingest(_file_lines(args.paths)):
+            print(
+                f"read={progress.records_read} ingested={progress.records_ingested} "
+                f"skipped={progress.records_skipped} failed={progress.records_failed} "
+                f"units={progress.memory_units_stored}/{progress.memory_units_extracted} "
+                f"{progress.records_per_second:.1f} rec/s {progress.units_per_second:.1f} units/s",
+                file=sys.stderr
+            )
+    finally:
+        ingestor.close()
+        await orchestrator.shutdown()
+
+    if progress is not None:
+        print(progress.model_dump_json(indent=2))
+        for error in progress.errors:
+            print(f"error: {error}" , file=sys.stderr)
+        return 1 if progress.records_failed else 0
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest NDJSON conversation archives")
+    parser.add_argument("paths" , nargs="+" , help="NDJSON files, or - for stdin")
+    parser.add_argument("--checkpoint" , help="checkpoint file for resumable runs")
+    parser.add_argument("--concurrency" , type=int , default=4 , help="extraction calls in flight")
+    parser.add_argument("--batch-size" , type=int , default=32 , help="records per policy/write batch")
+    args = parser.parse_args()
+
+    if not os.getenv("GROQ_API_KEY"):
+        print("GROQ_API_KEY is not set" , file=sys.stderr)
+        return 2
+    return asyncio.run(_run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
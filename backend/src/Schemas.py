@@ -30,6 +30,8 @@ class MemoryUnit(BaseModel):
     confidence: float = Field(ge=0.0, le=1.0 , default=0.7)
     lifecycle: MemoryLifecycle = MemoryLifecycle.ACTIVE
     source_session:str
+    # Retrieval partition; None for memories created outside any project
+    project_id: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     embedding: Optional[List[float]] = None
@@ -38,6 +40,31 @@ class MemoryUnit(BaseModel):
     class Config:
         use_enum_values = True
 
+class ScoredMemory(BaseModel):
+    memory: MemoryUnit
+    score: float
+    retrieval_count: int = 0
+
+class SemanticCandidates(BaseModel):
+    # Over-fetched search lists of one query, before fusion and re-ranking;
+    # vector hits are scored by cosine similarity, lexical hits by BM25
+    query: str
+    query_embedding: Optional[List[float]] = None
+    mode: Literal["vector" , "lexical" , "hybrid"]
+    fetch_k: int
+    rrf_k: int = 60
+    vector_hits: List[ScoredMemory] = Field(default_factory=list)
+    lexical_hits: List[ScoredMemory] = Field(default_factory=list)
+
+class RankingWeights(BaseModel):
+    # Weights of the re-ranking features, each scaled to [0, 1]
+    similarity: float = Field(ge=0.0 , default=1.0)
+    recency: float = Field(ge=0.0 , default=0.3)
+    confidence: float = Field(ge=0.0 , default=0.2)
+    reinforcement: float = Field(ge=0.0 , default=0.1)
+    # Recency halves every half_life_hours since the last update
+    half_life_hours: float = Field(gt=0.0 , default=168.0)
+
 class WorkingMemoryEntry(BaseModel):
     memory_unit: MemoryUnit
     ttl_seconds: int = 3200
@@ -63,9 +90,15 @@ class PolicyDecision(BaseModel):
 
 class PolicyRule(BaseModel):
     name:str
-    condition: str
-    action: str
+    condition: str = ""
+    action: str = ""
     priority: int =0
+    # field -> value, list of values, or {operator: value}; empty matches every unit
+    when: dict = Field(default_factory=dict)
+    should_store: bool = True
+    target_store: Optional[Literal["working" , "episodic" , "semantic"]] = None
+    check_contradictions: bool = False
+    reason: str = ""
 
 class ConversationInput(BaseModel):
     session_id: str
@@ -114,6 +147,8 @@ class RenderRequest(BaseModel):
     context_state: ContextState
     provider: LLMProvider
     model: Optional[str] = None
+    # Tokens for rendered memories; the provider's default budget when unset
+    token_budget: Optional[int] = None
 
 class RenderResult(BaseModel):
     provider: LLMProvider
@@ -127,6 +162,12 @@ class ProcessConversationRequest(BaseModel):
     retrieve_context: bool = True
     target_provider: LLMProvider = LLMProvider.GROQ
     apply_policies: bool = True
+    # "incremental" only sends turns not extracted before; "full" reprocesses all
+    extraction_mode: Literal["full","incremental"] = "incremental"
+    # Re-ranking weights for this request; the server's defaults when unset
+    ranking_weights: Optional[RankingWeights] = None
+    # Respond with retrieved context only and extract/store after the response
+    defer_extraction: bool = False
 
 class ProcessConversationResponse(BaseModel):
     rendered_context: RenderResult
@@ -134,3 +175,40 @@ class ProcessConversationResponse(BaseModel):
     policy_decisions: List[PolicyDecision]
     metadata: dict = Field(default_factory=dict)
 
+class ContextRequest(BaseModel):
+    conversation_input: ConversationInput
+    target_provider: LLMProvider = LLMProvider.GROQ
+    ranking_weights: Optional[RankingWeights] = None
+
+class ContextResponse(BaseModel):
+    rendered_context: RenderResult
+    metadata: dict = Field(default_factory=dict)
+
+
+class BulkIngestRecord(BaseModel):
+    # Either a ConversationInput line, or an exported transcript as a list of
+    # {"role", "content"} messages, each optionally with a "timestamp"
+    id: Optional[str] = None
+    session_id: Optional[str] = None
+    project_id: Optional[str] = None
+    user_message: Optional[str] = None
+    conversation_history: List[dict] = Field(default_factory=list)
+    messages: Optional[List[dict]] = None
+    intent: Optional[str] = None
+    # When the conversation happened; stored memories take it as their creation time
+    timestamp: Optional[datetime] = None
+
+class BulkIngestProgress(BaseModel):
+    records_read: int = 0
+    records_ingested: int = 0
+    records_skipped: int = 0
+    records_failed: int = 0
+    extraction_calls: int = 0
+    memory_units_extracted: int = 0
+    memory_units_stored: int = 0
+    stored_by_store: dict = Field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+    records_per_second: float = 0.0
+    units_per_second: float = 0.0
+    errors: List[str] = Field(default_factory=list)
+    done: bool = False
@@ -0,0 +1,264 @@
+from typing import AsyncIterable , AsyncIterator , List , Optional , Set , Tuple , Union
+from datetime import datetime , timezone
+from pydantic import TypeAdapter
+import asyncio
+import hashlib
+import os
+import time
+
+from src.Schemas import (
+    BulkIngestRecord , BulkIngestProgress , ConversationInput , ExtractionResult
+)
+
+MAX_REPORTED_ERRORS = 20
+_DATETIME = TypeAdapter(datetime)
+
+class IngestCheckpoint:
+    """Append-only log of ingested record keys, one per line.
+
+    A torn last line from a crash only loses that record's key, so the record
+    is ingested again on resume.
+    """
+    def __init__(self , path: Optional[str] = None):
+        self.path = path
+        self._done: Set[str] = set()
+        self._file = None
+        if path:
+            if os.path.exists(path):
+                with open(path , "r" , encoding="utf-8") as f:
+                    self._done.update(line.strip() for line in f if line.strip())
+            self._file = open(path , "a" , encoding="utf-8")
+
+    def __contains__(self , key: str) -> bool:
+        return key in self._done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def mark(self , keys: List[str]):
+        self._done.update(keys)
+        if self._file is not None and keys:
+            self._file.write("".join(f"{key}\n" for key in keys))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def record_key(record: BulkIngestRecord , line: bytes) -> str:
+    return record.id or hashlib.sha1(line).hexdigest()
+
+def _message_timestamp(message: dict) -> Optional[datetime]:
+    value = message.get("timestamp" , message.get("created_at"))
+    if value is None:
+        return None
+    # ISO strings or Unix seconds; naive times are taken as UTC
+    timestamp = _DATETIME.validate_python(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def to_conversation_inputs(
+    record: BulkIngestRecord,
+    key: str,
+    window: int = 6
+) -> List[Tuple[ConversationInput , Optional[datetime]]]:
+    """Splits a record into extraction inputs, each with the time its
+    memories are stored as created (``None`` for now).
+
+    Transcript windows end at a user turn, which becomes the current
+    message. Each window's history is the previous window's last message,
+    flagged ``context_only`` so references across the boundary resolve,
+    followed by the messages since. The history holds at most ``window - 1``
+    messages, the prompt's history size. A longer run without a user turn,
+    or replies after the last one, go in windows with no current message.
+    """
+    session_id = record.session_id or record.id or f"ingest-{key[:16]}"
+    record_timestamp = record.timestamp
+    if record_timestamp is not None and record_timestamp.tzinfo is None:
+        record_timestamp = record_timestamp.replace(tzinfo=timezone.utc)
+    if record.messages is None:
+        if record.user_message is None:
+            raise ValueError("record needs either 'user_message' or 'messages'")
+        return [(
+            ConversationInput(
+                session_id=session_id,
+                project_id=record.project_id,
+                user_message=record.user_message,
+                conversation_history=record.conversation_history,
+                intent=record.intent
+            ),
+            record_timestamp
+        )]
+
+    messages = [
+        message for message in record.messages
+        if str(message.get("content") or "").strip()
+    ]
+    # New messages per window, leaving room for the overlap turn
+    room = max(1 , window - 2)
+    inputs: List[Tuple[ConversationInput , Optional[datetime]]] = []
+    previous: Optional[dict] = None
+    pending: List[dict] = []
+
+    def close_window(current: Optional[dict]):
+        shown = pending + ([current] if current is not None else [])
+        timestamps = [timestamp for timestamp in map(_message_timestamp , shown) if timestamp is not None]
+        history = ([{**previous , "context_only": True}] if previous is not None else []) + pending
+        inputs.append((
+            ConversationInput(
+                session_id=session_id,
+                project_id=record.project_id,
+                user_message=str(current.get("content")) if current is not None else "",
+                conversation_history=history,
+                intent=record.intent
+            ),
+            timestamps[-1] if timestamps else record_timestamp
+        ))
+
+    for message in messages:
+        if message.get("role" , "user") == "user":
+            close_window(message)
+            previous , pending = message , []
+            continue
+        if len(pending) == room:
+            close_window(None)
+            previous , pending = pending[-1] , []
+        pending.append(message)
+    if pending:
+        close_window(None)
+    return inputs
+
+class BulkIngestor:
+    """Backfills memories from NDJSON conversation records.
+
+    Records are read in batches of ``batch_size``; each batch is extracted
+    with at most ``concurrency`` LLM calls in flight, then evaluated and
+    written through ``ContextOrchestrator.store_memory_units`` so embeddings
+    are batched and each store gets one grouped write. A record's key goes
+    into the checkpoint only after its memories are written, and only if
+    every extraction call for it succeeded.
+    """
+    def __init__(
+        self,
+        orchestrator,
+        concurrency: int = 4,
+        batch_size: int = 32,
+        window: int = 6,
+        checkpoint_path: Optional[str] = None
+    ):
+        self.orchestrator = orchestrator
+        self.concurrency = max(1 , concurrency)
+        self.batch_size = max(1 , batch_size)
+        self.window = max(1 , window)
+        self.checkpoint = IngestCheckpoint(checkpoint_path)
+
+    async def ingest(
+        self,
+        lines: AsyncIterable[Union[str , bytes]]
+    ) -> AsyncIterator[BulkIngestProgress]:
+        """Yields progress after every batch, and once more when done."""
+        progress = BulkIngestProgress()
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        batch: List[Tuple[str , List[Tuple[ConversationInput , Optional[datetime]]]]] = []
+        batch_keys: Set[str] = set()
+
+        async for raw_line in lines:
+            line = raw_line.encode("utf-8") if isinstance(raw_line , str) else raw_line
+            line = line.strip()
+            if not line:
+                continue
+            progress.records_read += 1
+            try:
+                record = BulkIngestRecord.model_validate_json(line)
+                key = record_key(record , line)
+                inputs = to_conversation_inputs(record , key , self.window)
+            except ValueError as e:
+                self._fail(progress , f"record {progress.records_read}: {e}")
+                continue
+            if key in self.checkpoint or key in batch_keys:
+                progress.records_skipped += 1
+                continue
+            batch.append((key , inputs))
+            batch_keys.add(key)
+            if len(batch) >= self.batch_size:
+                await self._ingest_batch(batch , progress , semaphore)
+                batch , batch_keys = [] , set()
+                yield self._snapshot(progress , started)
+
+        if batch:
+            await self._ingest_batch(batch , progress , semaphore)
+        progress.done = True
+        yield self._snapshot(progress , started)
+
+    async def _extract(
+        self,
+        conversation_input: ConversationInput,
+        semaphore: asyncio.Semaphore
+    ) -> ExtractionResult:
+        async with semaphore:
+            async with self.orchestrator.executor.limit("extraction"):
+                return await self.orchestrator.extractor.extract_async(conversation_input)
+
+    async def _ingest_batch(
+        self,
+        batch: List[Tuple[str , List[Tuple[ConversationInput , Optional[datetime]]]]],
+        progress: BulkIngestProgress,
+        semaphore: asyncio.Semaphore
+    ):
+        results = await asyncio.gather(*(
+            self._extract(conversation_input , semaphore)
+            for _, inputs in batch
+            for conversation_input, _ in inputs
+        ))
+
+        memory_units = []
+        ingested_keys = []
+        position = 0
+        for key, inputs in batch:
+            record_results = results[position:position + len(inputs)]
+            position += len(inputs)
+            progress.extraction_calls += len(inputs)
+            errors = [
+                result.extraction_metadata["error"] for result in record_results
+                if "error" in result.extraction_metadata
+            ]
+            if errors:
+                # Left out of the checkpoint so a resumed run retries the whole record
+                self._fail(progress , f"record {key}: {errors[0]}")
+                continue
+            for result, (_, timestamp) in zip(record_results , inputs):
+                if timestamp is not None:
+                    # Archived history keeps its own age for recency ordering and ranking
+                    for memory_unit in result.memory_units:
+                        memory_unit.created_at = memory_unit.updated_at = timestamp
+                memory_units.extend(result.memory_units)
+            ingested_keys.append(key)
+
+        progress.memory_units_extracted += len(memory_units)
+        stored_memories , decisions = await self.orchestrator.store_memory_units(memory_units)
+        progress.memory_units_stored += len(stored_memories)
+        for decision in decisions:
+            if decision.should_store:
+                progress.stored_by_store[decision.target_store] = (
+                    progress.stored_by_store.get(decision.target_store , 0) + 1
+                )
+        self.checkpoint.mark(ingested_keys)
+        progress.records_ingested += len(ingested_keys)
+
+    def _fail(self , progress: BulkIngestProgress , message: str):
+        progress.records_failed += 1
+        if len(progress.errors) < MAX_REPORTED_ERRORS:
+            progress.errors.append(message)
+
+    def _snapshot(self , progress: BulkIngestProgress , started: float) -> BulkIngestProgress:
+        elapsed = time.monotonic() - started
+        progress.elapsed_seconds = round(elapsed , 3)
+        if elapsed > 0:
+            progress.records_per_second = round(progress.records_ingested / elapsed , 3)
+            progress.units_per_second = round(progress.memory_units_stored / elapsed , 3)
+        return progress.model_copy(deep=True)
+
+    def close(self):
+        self.checkpoint.close()
@@ -0,0 +1,72 @@
+from typing import Callable , Dict , Optional , TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import os
+
+T = TypeVar("T")
+
+# Per-stage caps on in-flight work. The qdrant local client is not thread-safe,
+# so semantic store calls are serialized unless a remote server is configured.
+DEFAULT_STAGE_LIMITS: Dict[str,int] = {
+    "extraction": 8,
+    "embedding": os.cpu_count() or 4,
+    "working": 8,
+    "episodic": 4,
+    "semantic": 1,
+}
+
+class StageExecutor:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        stage_limits: Optional[Dict[str,int]] = None
+    ):
+        self.max_workers = max_workers or min(32 , (os.cpu_count() or 4) + 4)
+        self.stage_limits = {**DEFAULT_STAGE_LIMITS , **(stage_limits or {})}
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="memory-stage"
+        )
+        self._semaphores: Dict[str,asyncio.Semaphore] = {}
+
+    def _semaphore(self , stage: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.stage_limits.get(stage , self.max_workers))
+            self._semaphores[stage] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def limit(self , stage: str):
+        async with self._semaphore(stage):
+            yield
+
+    async def run(self , stage: str , fn: Callable[... , T] , *args , **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(stage)
+        await semaphore.acquire()
+        try:
+            future = loop.run_in_executor(
+                self._pool,
+                functools.partial(fn , *args , **kwargs)
+            )
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(done: asyncio.Future):
+            semaphore.release()
+            if not done.cancelled():
+                # Retrieved here in case the caller stopped waiting
+                done.exception()
+
+        # The slot is held until the call returns, not until the caller stops
+        # waiting: a timed-out caller must not let a second call into a stage
+        # that is serialized for thread safety
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    def shutdown(self , wait: bool = True):
+        self._pool.shutdown(wait=wait)
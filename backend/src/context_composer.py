@@ -1,5 +1,6 @@
-from typing import List , Dict 
+from typing import List , Dict , Optional , Tuple
 from src.Schemas import ( MemoryUnit , ContextState , LLMProvider , RenderRequest , RenderResult )
+from src.token_budget import DEFAULT_TOKEN_BUDGETS , PackSection , TokenBudgetPacker , TokenCounter
 
 class ContextComposer:
     def compose(
@@ -31,7 +32,20 @@ class ContextComposer:
         )
     
 class ProviderRenderer:
-    def render(self,request: RenderRequest) -> RenderRequest:
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        token_budgets: Optional[Dict[str,int]] = None,
+        recency_half_life_hours: float = 168.0
+    ):
+        self.token_counter = token_counter or TokenCounter()
+        self.token_budgets = {**DEFAULT_TOKEN_BUDGETS , **(token_budgets or {})}
+        self.packer = TokenBudgetPacker(
+            self.token_counter,
+            recency_half_life_hours=recency_half_life_hours
+        )
+
+    def render(self,request: RenderRequest) -> RenderResult:
         renderer_map = {
             LLMProvider.CHATGPT:self._render_chatgpt,
             LLMProvider.CLAUDE:self._render_claude,
@@ -40,30 +54,56 @@ class ProviderRenderer:
         }
 
         renderer = renderer_map.get(request.provider,self._render_generic)
-        return renderer(request.context_state,request.model)
+        budget = request.token_budget
+        if budget is None:
+            budget = self.token_budgets.get(
+                getattr(request.provider , "value" , request.provider),
+                DEFAULT_TOKEN_BUDGETS[LLMProvider.GROQ.value]
+            )
+        return renderer(request.context_state,request.model,budget)
+
+    def _pack(
+        self,
+        budget: int,
+        sections: List[PackSection]
+    ) -> Tuple[Dict[str,List[MemoryUnit]] , dict]:
+        # Memories compete for one budget across sections instead of fixed per-section counts
+        return self.packer.pack(
+            [section for section in sections if section.memories],
+            budget
+        )
+
+    def _lines(self , selected: Dict[str,List[MemoryUnit]] , section: PackSection) -> List[str]:
+        # Rendered with the same formatter the packer counted
+        return [section.format_line(mem) for mem in selected.get(section.name , [])]
     
-    def _render_groq(self,context:ContextState,model:str=None ) -> RenderResult:
+    def _render_groq(self,context:ContextState,model:str=None,budget:int=None) -> RenderResult:
+        semantic = PackSection(
+            "semantic" , context.semantic_memory,
+            lambda mem: f"- [{mem.type.upper()}] {mem.content} (confidence: {mem.confidence:.2f})",
+            header="\n## Established Knowledge:" , ranked=True
+        )
+        episodic = PackSection(
+            "episodic" , context.episodic_memory,
+            lambda mem: f"- {mem.content}",
+            header="\n## Recent Decisions:" , weight=0.8
+        )
+        working = PackSection(
+            "working" , context.working_memory,
+            lambda mem: f"- {mem.content}",
+            header="\n## Current Session Context:"
+        )
+        selected , packing = self._pack(budget , [semantic , episodic , working])
         system_parts = [
             "You are an AI assistant with access to structured memory.",
             "",
             "# ACTIVE CONTEXT",
         ]
 
-        if context.semantic_memory:
-            system_parts.append("\n## Established Knowledge:")
-            for mem in context.semantic_memory:
-                system_parts.append(
-                    f"- [{mem.type.upper()}] {mem.content} "
-                    f"(confidence: {mem.confidence:.2f})"
-                )
-        if context.episodic_memory:
-            system_parts.append("\n## Recent Decisions:")
-            for mem in context.episodic_memory[-5:]:  # Last 5
-                system_parts.append(f"- {mem.content}")
-        if context.working_memory:
-            system_parts.append("\n## Current Session Context:")
-            for mem in context.working_memory:
-                system_parts.append(f"- {mem.content}")
+        for section in (semantic , episodic , working):
+            if selected.get(section.name):
+                system_parts.append(section.header)
+                system_parts.extend(self._lines(selected , section))
         
         system_parts.append("\nUse this context to inform your response.")
         system_prompt = "\n".join(system_parts)
@@ -77,14 +117,32 @@ class ProviderRenderer:
                 {"role": "user", "content": context.user_message}
             ],
             metadata={
-                "model": model or "llama-3.3-70b-versatile"
+                "model": model or "llama-3.3-70b-versatile",
+                "packing": packing
             }
         )
     def _render_claude(
         self,
         context: ContextState,
-        model: str = None
+        model: str = None,
+        budget: int = None
     ) -> RenderResult:
+        semantic = PackSection(
+            "semantic" , context.semantic_memory,
+            lambda mem: f"<{mem.type}>{mem.content}</{mem.type}>",
+            header="\n<semantic_knowledge>\n</semantic_knowledge>" , ranked=True
+        )
+        episodic = PackSection(
+            "episodic" , context.episodic_memory,
+            lambda mem: f"<event>{mem.content}</event>",
+            header="\n<decision_history>\n</decision_history>" , weight=0.8
+        )
+        working = PackSection(
+            "working" , context.working_memory,
+            lambda mem: f"<context>{mem.content}</context>",
+            header="\n<active_session>\n</active_session>"
+        )
+        selected , packing = self._pack(budget , [semantic , episodic , working])
         
         system_parts = [
             "You have access to structured memory across sessions.",
@@ -92,25 +150,13 @@ class ProviderRenderer:
             "<memory_context>"
         ]
         
-        if context.semantic_memory:
-            system_parts.append("\n<semantic_knowledge>")
-            for mem in context.semantic_memory:
-                system_parts.append(
-                    f"<{mem.type}>{mem.content}</{mem.type}>"
-                )
-            system_parts.append("</semantic_knowledge>")
-        
-        if context.episodic_memory:
-            system_parts.append("\n<decision_history>")
-            for mem in context.episodic_memory[-5:]:
-                system_parts.append(f"<event>{mem.content}</event>")
-            system_parts.append("</decision_history>")
-        
-        if context.working_memory:
-            system_parts.append("\n<active_session>")
-            for mem in context.working_memory:
-                system_parts.append(f"<context>{mem.content}</context>")
-            system_parts.append("</active_session>")
+        for section in (semantic , episodic , working):
+            if selected.get(section.name):
+                # The header is the section's opening and closing tags
+                opening , closing = section.header.rsplit("\n" , 1)
+                system_parts.append(opening)
+                system_parts.extend(self._lines(selected , section))
+                system_parts.append(closing)
         
         system_parts.append("</memory_context>")
         
@@ -125,36 +171,51 @@ class ProviderRenderer:
             ],
             metadata={
                 "model": model or "claude-3-5-sonnet-20241022",
-                "system": system_prompt
+                "system": system_prompt,
+                "packing": packing
             }
         )
     
     def _render_chatgpt(
         self,
         context: ContextState,
-        model: str = None
+        model: str = None,
+        budget: int = None
     ) -> RenderResult:
+        semantic = PackSection(
+            "semantic" , context.semantic_memory,
+            lambda mem: f"• {mem.content}",
+            header="Relevant knowledge:\n" , ranked=True
+        )
+        episodic = PackSection(
+            "episodic" , context.episodic_memory,
+            lambda mem: f"• {mem.content}",
+            header="Recent activity:\n" , weight=0.8
+        )
+        working = PackSection(
+            "working" , context.working_memory,
+            lambda mem: f"• {mem.content}",
+            header="Current context:"
+        )
+        selected , packing = self._pack(budget , [semantic , episodic , working])
         system_parts = [
             "You are an AI assistant with persistent memory across conversations.",
             ""
         ]
         
-        if context.semantic_memory:
+        if selected.get("semantic"):
             system_parts.append("Relevant knowledge:")
-            for mem in context.semantic_memory:
-                system_parts.append(f"• {mem.content}")
+            system_parts.extend(self._lines(selected , semantic))
             system_parts.append("")
         
-        if context.episodic_memory:
+        if selected.get("episodic"):
             system_parts.append("Recent activity:")
-            for mem in context.episodic_memory[-3:]:
-                system_parts.append(f"• {mem.content}")
+            system_parts.extend(self._lines(selected , episodic))
             system_parts.append("")
         
-        if context.working_memory:
+        if selected.get("working"):
             system_parts.append("Current context:")
-            for mem in context.working_memory:
-                system_parts.append(f"• {mem.content}")
+            system_parts.extend(self._lines(selected , working))
         
         system_prompt = "\n".join(system_parts)
         
@@ -167,28 +228,37 @@ class ProviderRenderer:
                 {"role": "user", "content": context.user_message}
             ],
             metadata={
-                "model": model or "gpt-4-turbo-preview"
+                "model": model or "gpt-4-turbo-preview",
+                "packing": packing
             }
         )
     
     def _render_gemini(
         self,
         context: ContextState,
-        model: str = None
+        model: str = None,
+        budget: int = None
     ) -> RenderResult:
+        # Gemini gets no working memory, and one shared header for both sections
+        semantic = PackSection(
+            "semantic" , context.semantic_memory,
+            lambda mem: f"- {mem.content}",
+            header="Based on our previous conversations:\n" , ranked=True
+        )
+        episodic = PackSection(
+            "episodic" , context.episodic_memory,
+            lambda mem: f"- {mem.content}",
+            header="" , weight=0.8
+        )
+        selected , packing = self._pack(budget , [semantic , episodic])
         
         parts = []
         
-        if context.semantic_memory or context.episodic_memory:
+        if selected.get("semantic") or selected.get("episodic"):
             parts.append("Based on our previous conversations:")
             
-            if context.semantic_memory:
-                for mem in context.semantic_memory[:3]:
-                    parts.append(f"- {mem.content}")
-            
-            if context.episodic_memory:
-                for mem in context.episodic_memory[-2:]:
-                    parts.append(f"- {mem.content}")
+            parts.extend(self._lines(selected , semantic))
+            parts.extend(self._lines(selected , episodic))
             
             parts.append("")
         
@@ -204,14 +274,16 @@ class ProviderRenderer:
                 {"role": "user", "content": user_prompt}
             ],
             metadata={
-                "model": model or "gemini-pro"
+                "model": model or "gemini-pro",
+                "packing": packing
             }
         )
     
     def _render_generic(
         self,
         context: ContextState,
-        model: str = None
+        model: str = None,
+        budget: int = None
     ) -> RenderResult:
         """Generic fallback renderer"""
-        return self._render_groq(context, model)
\ No newline at end of file
+        return self._render_groq(context, model, budget)
\ No newline at end of file
@@ -0,0 +1,226 @@
+from typing import Dict , FrozenSet , Iterable , List , Optional , Sequence , Tuple
+import numpy as np
+import threading
+import hashlib
+import zlib
+
+from src.Schemas import MemoryUnit
+
+# Mersenne prime 2^31 - 1 keeps a * h + b inside uint64 for 32-bit token hashes
+_PRIME = np.uint64((1 << 31) - 1)
+
+def _value(field) -> str:
+    return getattr(field , "value" , field)
+
+def tokenize(content: str) -> FrozenSet[str]:
+    # Same tokenization as MemoryPolicyEngine._semantic_overlap
+    return frozenset(content.lower().split())
+
+def jaccard(tokens1: FrozenSet[str] , tokens2: FrozenSet[str]) -> float:
+    if not tokens1 or not tokens2:
+        return 0.0
+    union = len(tokens1 | tokens2)
+    return len(tokens1 & tokens2) / union if union else 0.0
+
+class _Entry:
+    __slots__ = ("memory_id" , "tokens" , "confidence" , "band_keys" , "vector_row")
+
+    def __init__(self , memory_id , tokens , confidence , band_keys , vector_row):
+        self.memory_id = memory_id
+        self.tokens = tokens
+        self.confidence = confidence
+        self.band_keys = band_keys
+        self.vector_row = vector_row
+
+class _Bucket:
+    def __init__(self , bands: int):
+        self.entries: Dict[str,_Entry] = {}
+        self.bands: List[Dict[int,set]] = [dict() for _ in range(bands)]
+        # Row-capacity doubles on growth; only the first len(vector_ids) rows are live
+        self.vectors = np.zeros((0 , 0) , dtype=np.float32)
+        self.vector_ids: List[Optional[str]] = []
+
+    def append_vector(self , memory_id: str , vector: np.ndarray) -> int:
+        if self.vectors.shape[1] != vector.shape[0]:
+            # First vector (or a model change) fixes the dimension for the bucket
+            self.vectors = np.zeros((16 , vector.shape[0]) , dtype=np.float32)
+            self.vector_ids = []
+            for entry in self.entries.values():
+                entry.vector_row = None
+        row = len(self.vector_ids)
+        if row == self.vectors.shape[0]:
+            grown = np.zeros((row * 2 , self.vectors.shape[1]) , dtype=np.float32)
+            grown[:row] = self.vectors
+            self.vectors = grown
+        self.vectors[row] = vector
+        self.vector_ids.append(memory_id)
+        return row
+
+class ContradictionIndex:
+    """Candidate index for MemoryPolicyEngine contradiction checks.
+
+    Memories are bucketed by (type, scope), since only same-typed, same-scoped
+    memories can contradict each other. Within a bucket, MinHash-LSH over the
+    pre-tokenized content narrows lexical candidates before the exact Jaccard
+    check, and stored embeddings are matched with one vectorized dot product
+    when the caller passes the new unit's embedding.
+    With 21 bands of 3 rows a pair at the 0.7 Jaccard threshold is a
+    candidate with probability > 0.9998.
+    """
+    def __init__(
+        self,
+        overlap_threshold: float = 0.7,
+        semantic_threshold: float = 0.9,
+        bands: int = 21,
+        rows_per_band: int = 3,
+        seed: int = 7
+    ):
+        self.overlap_threshold = overlap_threshold
+        self.semantic_threshold = semantic_threshold
+        self.num_bands = bands
+        self.rows_per_band = rows_per_band
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows_per_band
+        self._a = rng.integers(1 , int(_PRIME) , size=num_perm , dtype=np.uint64)
+        self._b = rng.integers(0 , int(_PRIME) , size=num_perm , dtype=np.uint64)
+        self._buckets: Dict[Tuple[str,str],_Bucket] = {}
+        self._bucket_of: Dict[str,Tuple[str,str]] = {}
+        # Snapshot writes and policy lookups come from different threads
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_memories(cls , memories: Iterable[MemoryUnit] , **kwargs) -> "ContradictionIndex":
+        index = cls(**kwargs)
+        for memory in memories:
+            index.add(memory)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._bucket_of)
+
+    def _band_keys(self , tokens: FrozenSet[str]) -> Tuple[int,...]:
+        if not tokens:
+            return ()
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode("utf-8")) for token in tokens),
+            dtype=np.uint64,
+            count=len(tokens)
+        )
+        signature = ((np.outer(hashes , self._a) + self._b) % _PRIME).min(axis=0)
+        bands = signature.reshape(self.num_bands , self.rows_per_band)
+        # A keyed digest, not hash(): stable across processes and PYTHONHASHSEED
+        return tuple(
+            int.from_bytes(hashlib.blake2b(band.tobytes() , digest_size=8).digest() , "little")
+            for band in bands
+        )
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding , dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def add(self , memory_unit: MemoryUnit , embedding: Optional[Sequence[float]] = None):
+        with self._lock:
+            self._add(memory_unit , embedding)
+
+    def remove(self , memory_id: str):
+        with self._lock:
+            self._remove(memory_id)
+
+    def find_contradictions(
+        self,
+        memory_unit: MemoryUnit,
+        embedding: Optional[Sequence[float]] = None
+    ) -> List[str]:
+        with self._lock:
+            return self._find_contradictions(memory_unit , embedding)
+
+    def _add(self , memory_unit: MemoryUnit , embedding: Optional[Sequence[float]]):
+        if memory_unit.id in self._bucket_of:
+            self._remove(memory_unit.id)
+        key = (_value(memory_unit.type) , _value(memory_unit.scope))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.num_bands)
+
+        tokens = tokenize(memory_unit.content)
+        band_keys = self._band_keys(tokens)
+        for band, band_key in zip(bucket.bands , band_keys):
+            band.setdefault(band_key , set()).add(memory_unit.id)
+
+        vector_row = None
+        embedding = embedding if embedding is not None else memory_unit.embedding
+        vector = self._normalize(embedding) if embedding is not None else None
+        if vector is not None:
+            vector_row = bucket.append_vector(memory_unit.id , vector)
+
+        bucket.entries[memory_unit.id] = _Entry(
+            memory_unit.id , tokens , memory_unit.confidence , band_keys , vector_row
+        )
+        self._bucket_of[memory_unit.id] = key
+
+    def _remove(self , memory_id: str):
+        key = self._bucket_of.pop(memory_id , None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        entry = bucket.entries.pop(memory_id)
+        for band, band_key in zip(bucket.bands , entry.band_keys):
+            members = band.get(band_key)
+            if members is not None:
+                members.discard(memory_id)
+                if not members:
+                    del band[band_key]
+        if entry.vector_row is not None:
+            # Tombstone the row; a zero vector never clears the threshold
+            bucket.vectors[entry.vector_row] = 0.0
+            bucket.vector_ids[entry.vector_row] = None
+
+    def _find_contradictions(
+        self,
+        memory_unit: MemoryUnit,
+        embedding: Optional[Sequence[float]]
+    ) -> List[str]:
+        bucket = self._buckets.get((_value(memory_unit.type) , _value(memory_unit.scope)))
+        if bucket is None:
+            return []
+
+        matched = set()
+        tokens = tokenize(memory_unit.content)
+        candidates = set()
+        for band, band_key in zip(bucket.bands , self._band_keys(tokens)):
+            candidates.update(band.get(band_key , ()))
+        for memory_id in candidates:
+            if jaccard(tokens , bucket.entries[memory_id].tokens) > self.overlap_threshold:
+                matched.add(memory_id)
+
+        embedding = embedding if embedding is not None else memory_unit.embedding
+        if embedding is not None and len(bucket.vector_ids):
+            vector = self._normalize(embedding)
+            if vector is not None and vector.shape[0] == bucket.vectors.shape[1]:
+                scores = bucket.vectors[:len(bucket.vector_ids)] @ vector
+                for row in np.flatnonzero(scores >= self.semantic_threshold):
+                    memory_id = bucket.vector_ids[row]
+                    if memory_id is not None:
+                        matched.add(memory_id)
+
+        return [
+            memory_id for memory_id in matched
+            if memory_unit.confidence > bucket.entries[memory_id].confidence
+        ]
+
+class ContradictionIndexGroup:
+    def __init__(self , indexes: Sequence[ContradictionIndex]):
+        self.indexes = list(indexes)
+
+    def find_contradictions(
+        self,
+        memory_unit: MemoryUnit,
+        embedding: Optional[Sequence[float]] = None
+    ) -> List[str]:
+        found: Dict[str,None] = {}
+        for index in self.indexes:
+            for memory_id in index.find_contradictions(memory_unit , embedding):
+                found[memory_id] = None
+        return list(found)
@@ -0,0 +1,63 @@
+from typing import List , Optional
+import numpy as np
+import hashlib
+import re
+
+from src.Schemas import MemoryUnit , MemoryLifecycle
+
+# Lifecycles a new memory can be a duplicate of
+LIVE_LIFECYCLES = [MemoryLifecycle.ACTIVE.value , MemoryLifecycle.REINFORCED.value]
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_content(content: str) -> str:
+    # Case, punctuation and spacing differences between extractions of the same fact
+    return _WHITESPACE.sub(" " , _NON_WORD.sub(" " , content.lower())).strip()
+
+def content_hash(memory_unit: MemoryUnit) -> str:
+    # Keyed per project, so a repeat never reinforces another project's memory
+    memory_type = getattr(memory_unit.type , "value" , memory_unit.type)
+    key = f"{memory_type}\x00{normalize_content(memory_unit.content)}"
+    if memory_unit.project_id:
+        key = f"{memory_unit.project_id}\x00{key}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def batch_near_duplicates(
+    embeddings: List[List[float]],
+    memory_types: List[str],
+    min_similarity: float,
+    project_ids: Optional[List[Optional[str]]] = None
+) -> List[Optional[int]]:
+    """For each vector, the index of an earlier vector in the batch with the
+    same type and project and cosine similarity >= ``min_similarity``, else
+    ``None``. Indexes returned always point at vectors that are not
+    duplicates themselves."""
+    if not embeddings:
+        return []
+    vectors = np.asarray(embeddings , dtype=np.float32)
+    norms = np.linalg.norm(vectors , axis=1 , keepdims=True)
+    vectors = np.divide(vectors , norms , out=np.zeros_like(vectors) , where=norms > 0)
+    similarities = vectors @ vectors.T
+    if project_ids is None:
+        project_ids = [None] * len(embeddings)
+    # One integer per (type, project) partition, so a repeat never crosses projects
+    partitions: dict = {}
+    groups = np.asarray([
+        partitions.setdefault((memory_type , project_id) , len(partitions))
+        for memory_type, project_id in zip(memory_types , project_ids)
+    ])
+    same_partition = groups[:, None] == groups[None, :]
+
+    duplicate_of: List[Optional[int]] = [None] * len(embeddings)
+    kept: List[int] = []
+    for i in range(len(embeddings)):
+        if kept:
+            candidates = np.asarray(kept)
+            scores = np.where(same_partition[i , candidates] , similarities[i , candidates] , -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] >= min_similarity:
+                duplicate_of[i] = int(candidates[best])
+                continue
+        kept.append(i)
+    return duplicate_of
@@ -0,0 +1,71 @@
+from typing import Callable , List , Optional , Tuple
+import asyncio
+
+from src.concurrency import StageExecutor
+
+class EmbeddingMicroBatcher:
+    """Coalesces embedding calls from concurrent requests into shared ONNX batches.
+
+    A batch is flushed once it holds ``max_batch_size`` texts or the oldest
+    pending call has waited ``max_wait_ms``. A single call larger than the
+    batch size is never split.
+    """
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]] , List[List[float]]],
+        executor: StageExecutor,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0
+    ):
+        self.embed_fn = embed_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[List[str] , asyncio.Future]] = []
+        self._pending_count = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; these keep batches alive
+        self._batch_tasks: set = set()
+
+    async def embed(self , texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((list(texts) , future))
+        self._pending_count += len(texts)
+
+        if self._pending_count >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0 , self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending
+        self._pending = []
+        self._pending_count = 0
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self , batch: List[Tuple[List[str] , asyncio.Future]]):
+        texts = [text for batch_texts , _ in batch for text in batch_texts]
+        try:
+            embeddings = await self.executor.run("embedding" , self.embed_fn , texts)
+        except Exception as e:
+            for _ , future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for batch_texts , future in batch:
+            count = len(batch_texts)
+            if not future.done():
+                future.set_result(embeddings[offset:offset + count])
+            offset += count
@@ -0,0 +1,146 @@
+from typing import Dict , List , Optional , Sequence
+from collections import OrderedDict
+import numpy as np
+import unicodedata
+import threading
+import hashlib
+import sqlite3
+
+# Rough per-entry bookkeeping cost on top of the vector itself (key + dict slot)
+_ENTRY_OVERHEAD_BYTES = 160
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed on model name + normalized text hash.
+
+    The memory tier is an LRU bounded by ``max_bytes``. When ``persist_path``
+    is set, every computed vector is also written to a SQLite table so the
+    cache survives restarts; memory misses fall through to it.
+    """
+    def __init__(
+        self,
+        model_name: str,
+        max_bytes: int = 32 * 1024 * 1024,
+        persist_path: Optional[str] = None
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str,np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if persist_path:
+            self._conn = sqlite3.connect(persist_path , check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache(
+                    key TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFC" , " ".join(text.split()))
+
+    def key_for(self , text: str) -> str:
+        payload = f"{self.model_name}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self , texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        keys = [self.key_for(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        disk_lookup: Dict[str,List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    disk_lookup.setdefault(key , []).append(i)
+
+            if disk_lookup and self._conn is not None:
+                for key, vector in self._load_from_disk(list(disk_lookup)).items():
+                    self._insert(key , vector)
+                    for i in disk_lookup.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+
+            self.misses += sum(len(indices) for indices in disk_lookup.values())
+        return results
+
+    def put_many(self , texts: Sequence[str] , vectors: Sequence[Sequence[float]]):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts , vectors):
+                key = self.key_for(text)
+                array = np.asarray(vector , dtype=np.float32)
+                self._insert(key , array)
+                rows.append((key , array.shape[0] , array.tobytes()))
+
+            if rows and self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache(key , dim , vector) VALUES(? , ? , ?)",
+                    rows
+                )
+                self._conn.commit()
+
+    def _load_from_disk(self , keys: List[str]) -> Dict[str,np.ndarray]:
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0 , len(keys) , 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._conn.execute(
+                f"SELECT key , vector FROM embedding_cache WHERE key IN ({placeholders})",
+                chunk
+            )
+            for key, blob in cursor.fetchall():
+                found[key] = np.frombuffer(blob , dtype=np.float32)
+        return found
+
+    def _insert(self , key: str , vector: np.ndarray):
+        existing = self._entries.pop(key , None)
+        if existing is not None:
+            self._bytes -= existing.nbytes + _ENTRY_OVERHEAD_BYTES
+        self._entries[key] = vector
+        self._bytes += vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._entries:
+            _ , evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + _ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._conn is not None
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,177 @@
+from typing import List , Optional , Tuple
+from collections import OrderedDict
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+
+class ExtractionCache:
+    """Cache of parsed extraction artifacts keyed on the exact completion request.
+
+    Keys hash the model, the system prompt version and text, and the user
+    prompt, so any prompt change misses. Values are the validated artifact
+    dicts, not MemoryUnits: callers build fresh units (new ids, the caller's
+    session) from them on every hit. The memory tier is an LRU of at most
+    ``max_entries``; with ``persist_path`` entries are also kept in SQLite,
+    bounded to ``max_persisted_entries`` by least-recent use. Entries expire
+    after ``ttl_seconds`` in both tiers. Expired and excess rows are pruned
+    every ``prune_interval`` puts, so the table can briefly run over.
+
+    ``get_memory`` reads only the memory tier; ``get`` and ``put`` may touch
+    SQLite, so async callers run them off the event loop when ``persistent``.
+    """
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 24 * 3600,
+        persist_path: Optional[str] = None,
+        max_persisted_entries: int = 100000,
+        prune_interval: int = 256
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.max_persisted_entries = max_persisted_entries
+        self.prune_interval = max(1 , prune_interval)
+        self._puts_since_prune = 0
+        # key -> (expires_at wall-clock timestamp, artifacts, metadata)
+        self._entries: "OrderedDict[str,Tuple[float,List[dict],dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if persist_path:
+            self._conn = sqlite3.connect(persist_path , check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extraction_cache(
+                    key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    artifacts TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def key_for(model: str , prompt_version: str , system_prompt: str , user_prompt: str) -> str:
+        payload = "\x00".join((model , prompt_version , system_prompt , user_prompt))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def persistent(self) -> bool:
+        return self._conn is not None
+
+    def get_memory(self , key: str) -> Optional[Tuple[List[dict] , dict]]:
+        """Memory-tier lookup; a miss is not counted, since ``get`` follows."""
+        with self._lock:
+            return self._get_memory(key , time.time())
+
+    def _get_memory(self , key: str , now: float) -> Optional[Tuple[List[dict] , dict]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1] , entry[2]
+            del self._entries[key]
+        return None
+
+    def get(self , key: str) -> Optional[Tuple[List[dict] , dict]]:
+        now = time.time()
+        with self._lock:
+            cached = self._get_memory(key , now)
+            if cached is not None:
+                return cached
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT expires_at , artifacts , metadata FROM extraction_cache WHERE key = ?",
+                    (key ,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    artifacts , metadata = json.loads(row[1]) , json.loads(row[2])
+                    self._conn.execute(
+                        "UPDATE extraction_cache SET last_used = ? WHERE key = ?",
+                        (now , key)
+                    )
+                    self._conn.commit()
+                    self._insert(key , row[0] , artifacts , metadata)
+                    self.disk_hits += 1
+                    return artifacts , metadata
+
+            self.misses += 1
+            return None
+
+    def put(self , key: str , artifacts: List[dict] , metadata: dict):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._insert(key , expires_at , artifacts , metadata)
+            if self._conn is not None:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO extraction_cache(key , expires_at , last_used , artifacts , metadata)
+                    VALUES(? , ? , ? , ? , ?)
+                    """,
+                    (key , expires_at , now , json.dumps(artifacts) , json.dumps(metadata))
+                )
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= self.prune_interval:
+                    self._prune(now)
+                self._conn.commit()
+
+    def _prune(self , now: float):
+        self._puts_since_prune = 0
+        self._conn.execute("DELETE FROM extraction_cache WHERE expires_at <= ?" , (now ,))
+        self._conn.execute(
+            """
+            DELETE FROM extraction_cache WHERE key IN (
+                SELECT key FROM extraction_cache
+                ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_persisted_entries ,)
+        )
+
+    def _insert(self , key: str , expires_at: float , artifacts: List[dict] , metadata: dict):
+        self._entries.pop(key , None)
+        self._entries[key] = (expires_at , artifacts , metadata)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._conn is not None
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                if self._puts_since_prune:
+                    self._prune(time.time())
+                    self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,111 @@
+from typing import List , Optional , Set , Tuple
+from datetime import datetime , timezone
+import hashlib
+
+from src.Schemas import ConversationInput
+from src.sqlite_pool import SQLiteConnectionPool
+
+def turn_hash(message: dict , position: int) -> str:
+    # Exported messages carry stable ids; popup history only has role/content,
+    # so its turns are keyed by position too and a repeated "ok" is a new turn
+    if message.get("id"):
+        key = f"id\x00{message['id']}"
+    else:
+        key = f"{position}\x00{message.get('role' , 'user')}\x00{message.get('content' , '')}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def conversation_turns(conversation_input: ConversationInput) -> List[dict]:
+    # The current message is the user turn that later requests repeat in their history
+    return list(conversation_input.conversation_history) + [
+        {"role": "user" , "content": conversation_input.user_message}
+    ]
+
+def conversation_turn_hashes(conversation_input: ConversationInput) -> List[str]:
+    return [
+        turn_hash(message , position)
+        for position, message in enumerate(conversation_turns(conversation_input))
+    ]
+
+def incremental_input(
+    conversation_input: ConversationInput,
+    processed: Set[str],
+    history_window: int = 5
+) -> Tuple[Optional[ConversationInput] , List[str]]:
+    """Returns the input restricted to turns not yet extracted (``None`` when
+    there are none) and the hashes to mark once extraction succeeds.
+
+    The current message stays the user message. The history keeps the
+    newest of the new turns that fit the prompt's ``history_window``,
+    preceded by the turn before them flagged ``context_only`` so the LLM can
+    resolve references to it without extracting it. Only turns the prompt
+    shows are marked; older new turns stay unmarked.
+    """
+    turns = conversation_turns(conversation_input)
+    hashes = conversation_turn_hashes(conversation_input)
+    new_positions = [
+        position for position, digest in enumerate(hashes) if digest not in processed
+    ]
+    if not new_positions:
+        return None , []
+    current = len(turns) - 1
+    new_history = [position for position in new_positions if position != current]
+    sent = new_history[-history_window:] if history_window > 0 else []
+    if sent and sent[0] > 0 and len(sent) == history_window:
+        # Room for the context turn
+        sent = sent[1:]
+    first = sent[0] if sent else current
+    history = []
+    if first > 0 and history_window > 0:
+        history.append({**turns[first - 1] , "context_only": True})
+    history.extend(turns[position] for position in sent)
+    marked = sent + ([current] if current in new_positions else [])
+    return conversation_input.model_copy(update={
+        "conversation_history": history
+    }) , list(dict.fromkeys(hashes[position] for position in marked))
+
+class ExtractionWatermarkStore:
+    """Per-session hashes of conversation turns that have been extracted."""
+    def __init__(self , db_path: str = "episodic_memory.db" , pool_size: int = 2):
+        self.db_path = db_path
+        self._pool = SQLiteConnectionPool(db_path , pool_size=pool_size)
+        with self._pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_watermarks(
+                    session_id TEXT NOT NULL,
+                    message_hash TEXT NOT NULL,
+                    processed_at TIMESTAMP NOT NULL,
+                    PRIMARY KEY(session_id , message_hash)
+                ) WITHOUT ROWID
+            """)
+
+    def get_processed(self , session_id: str , hashes: List[str]) -> Set[str]:
+        processed = set()
+        with self._pool.connection() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0 , len(hashes) , 500):
+                chunk = hashes[start:start + 500]
+                cursor = conn.execute(
+                    f"""
+                    SELECT message_hash FROM extraction_watermarks
+                    WHERE session_id = ? AND message_hash IN ({",".join("?" * len(chunk))})
+                    """,
+                    [session_id , *chunk]
+                )
+                processed.update(row["message_hash"] for row in cursor.fetchall())
+        return processed
+
+    def mark_processed(self , session_id: str , hashes: List[str]):
+        if not hashes:
+            return
+        processed_at = datetime.now(timezone.utc).isoformat()
+        with self._pool.connection() as conn:
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO extraction_watermarks(session_id , message_hash , processed_at)
+                VALUES(? , ? , ?)
+                """,
+                [(session_id , digest , processed_at) for digest in hashes]
+            )
+
+    def close(self):
+        self._pool.close()
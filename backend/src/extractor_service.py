@@ -1,23 +1,23 @@
-from typing import List 
-from groq import Groq
-import json 
+from typing import AsyncIterator , Dict , List , Optional , Tuple
+from groq import Groq , AsyncGroq
+import asyncio
 import os
 
 from src.Schemas import (
     MemoryUnit , MemoryType , MemoryScope , MemoryLifecycle,
     ConversationInput , ExtractionResult
 )
+from src.concurrency import StageExecutor
+from src.embedding_cache import EmbeddingCache
+from src.extraction_cache import ExtractionCache
+from src.json_stream import JsonArrayStreamParser , parse_json_array
 from fastembed import TextEmbedding
 
-class MemoryExtractor:
-    def __init__(self , api_key: str = None):
-        self.client = Groq(api_key = api_key or os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"
-        self.embedding_model = TextEmbedding()
+# Bump when the prompt's meaning changes without its text changing (e.g. the
+# artifact validation rules), so cached extractions are not reused
+EXTRACTION_PROMPT_VERSION = "1"
 
-    def extract(self , conversation_input: ConversationInput) -> ExtractionResult:
-        extraction_prompt = self._build_extraction_prompt(conversation_input)
-        system_prompt = """You are a memory extraction agent. Your job is to identify discrete REASONING ARTIFACTS from conversations.
+EXTRACTION_SYSTEM_PROMPT = """You are a memory extraction agent. Your job is to identify discrete REASONING ARTIFACTS from conversations.
 
 Extract ONLY these types:
 1. DECISION - A choice that was made ("We decided to use PostgreSQL")
@@ -54,91 +54,342 @@ Example output:
     "confidence": 0.8
   }
 ]"""
-        try:
-            response = self.client.chat.completions.create(
-                model = self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": extraction_prompt
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=3000
-            )
-            content = response.choices[0].message.content
-            memory_units = self._parse_extraction_response(
-                content,
-                conversation_input.session_id
+
+class MemoryExtractor:
+    def __init__(
+        self ,
+        api_key: str = None,
+        embedding_cache_max_bytes: int = 32 * 1024 * 1024,
+        embedding_cache_path: Optional[str] = None,
+        extraction_cache_max_entries: int = 1024,
+        extraction_cache_ttl_seconds: float = 24 * 3600,
+        extraction_cache_path: Optional[str] = None,
+        executor: Optional[StageExecutor] = None
+    ):
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        # Without a key only embeddings are available, e.g. to replay journaled writes
+        self.client = Groq(api_key = api_key) if api_key else None
+        self.async_client = AsyncGroq(api_key = api_key) if api_key else None
+        self.model = "llama-3.3-70b-versatile"
+        # History turns the extraction prompt shows, before the current message
+        self.history_window = 5
+        self.embedding_model = TextEmbedding()
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if embedding_cache_max_bytes > 0:
+            self.embedding_cache = EmbeddingCache(
+                model_name=self.embedding_model.model_name,
+                max_bytes=embedding_cache_max_bytes,
+                persist_path=embedding_cache_path
             )
-            return ExtractionResult(
-                memory_units=memory_units,
-                extraction_metadata={
-                    "model":self.model,
-                    "tokens_used":response.usage.total_tokens
-                }
+        self.extraction_cache: Optional[ExtractionCache] = None
+        if extraction_cache_max_entries > 0:
+            self.extraction_cache = ExtractionCache(
+                max_entries=extraction_cache_max_entries,
+                ttl_seconds=extraction_cache_ttl_seconds,
+                persist_path=extraction_cache_path
             )
+        # Runs the extraction cache's SQLite tier off the event loop in async paths
+        self.executor = executor
+        # Completions in flight by cache key; identical concurrent requests await the first
+        self._inflight: Dict[str , asyncio.Future] = {}
+
+    def extract(self , conversation_input: ConversationInput) -> ExtractionResult:
+        completion_kwargs = self._build_completion_kwargs(conversation_input)
+        key = self._cache_key(completion_kwargs)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return self._to_extraction_result(*cached , conversation_input , "hit")
+        try:
+            response = self.client.chat.completions.create(**completion_kwargs)
+            artifacts , metadata = self._read_response(response)
         except Exception as e:
             return ExtractionResult(
                 memory_units=[],
                 extraction_metadata={"error":str(e)}
             )
+        self._cache_put(key , artifacts , metadata)
+        return self._to_extraction_result(artifacts , metadata , conversation_input , "miss")
+
+    async def extract_async(self , conversation_input: ConversationInput) -> ExtractionResult:
+        completion_kwargs = self._build_completion_kwargs(conversation_input)
+        key = self._cache_key(completion_kwargs)
+        cached = await self._cache_get_async(key)
+        if cached is not None:
+            return self._to_extraction_result(*cached , conversation_input , "hit")
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                artifacts , metadata = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leader's request was cancelled, not this one: join a new
+                # leader or become it
+                continue
+            return self._to_extraction_result(artifacts , metadata , conversation_input , "shared")
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                response = await self.async_client.chat.completions.create(**completion_kwargs)
+                artifacts , metadata = self._read_response(response)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                # Waiters share the failure; errors are never cached
+                artifacts , metadata = [] , {"error":str(e)}
+            future.set_result((artifacts , metadata))
+            if "error" not in metadata:
+                # Still registered meanwhile, so identical requests keep joining
+                await self._cache_put_async(key , artifacts , metadata)
+        finally:
+            self._inflight.pop(key , None)
+        return self._to_extraction_result(artifacts , metadata , conversation_input , "miss")
+
+    async def extract_stream(
+        self,
+        conversation_input: ConversationInput,
+        metadata: Optional[dict] = None
+    ) -> AsyncIterator[MemoryUnit]:
+        """Yields memory units as their JSON objects close in the streamed
+        completion. Extraction metadata (or the error) is written to ``metadata``.
+        Cache hits are replayed without a completion call."""
+        metadata = metadata if metadata is not None else {}
+        metadata["model"] = self.model
+        completion_kwargs = self._build_completion_kwargs(conversation_input)
+        key = self._cache_key(completion_kwargs)
+        cached = await self._cache_get_async(key)
+        if cached is not None:
+            metadata.update(tokens_used=0 , cache="hit")
+            for memory_unit in self._materialize(cached[0] , conversation_input.session_id , conversation_input.project_id):
+                yield memory_unit
+            return
+
+        metadata["cache"] = "miss"
+        parser = JsonArrayStreamParser()
+        artifacts = []
+        try:
+            stream = await self.async_client.chat.completions.create(
+                **completion_kwargs,
+                stream=True
+            )
+            async for chunk in stream:
+                usage = getattr(getattr(chunk , "x_groq" , None) , "usage" , None)
+                if usage is not None:
+                    metadata["tokens_used"] = usage.total_tokens
+                if not chunk.choices or parser.done:
+                    continue
+                for artifact in parser.feed(chunk.choices[0].delta.content or ""):
+                    artifact = self._normalize_artifact(artifact)
+                    if artifact is None:
+                        continue
+                    artifacts.append(artifact)
+                    yield self._artifact_to_memory_unit(
+                        artifact,
+                        conversation_input.session_id,
+                        conversation_input.project_id
+                    )
+        except Exception as e:
+            metadata["error"] = str(e)
+            return
+        await self._cache_put_async(key , artifacts , {
+            "model": self.model,
+            "tokens_used": metadata.get("tokens_used" , 0)
+        })
+
+    def _build_completion_kwargs(self , conversation_input: ConversationInput) -> dict:
+        extraction_prompt = self._build_extraction_prompt(conversation_input)
+        return dict(
+            model = self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": EXTRACTION_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": extraction_prompt
+                }
+            ],
+            temperature=0.2,
+            max_tokens=3000
+        )
+
+    def _cache_key(self , completion_kwargs: dict) -> str:
+        system_message , user_message = completion_kwargs["messages"]
+        return ExtractionCache.key_for(
+            completion_kwargs["model"],
+            EXTRACTION_PROMPT_VERSION,
+            system_message["content"],
+            user_message["content"]
+        )
+
+    def _cache_get(self , key: str) -> Optional[Tuple[List[dict] , dict]]:
+        if self.extraction_cache is None:
+            return None
+        return self.extraction_cache.get(key)
+
+    def _cache_put(self , key: str , artifacts: List[dict] , metadata: dict):
+        if self.extraction_cache is not None:
+            self.extraction_cache.put(key , artifacts , metadata)
+
+    async def _cache_get_async(self , key: str) -> Optional[Tuple[List[dict] , dict]]:
+        cache = self.extraction_cache
+        if cache is None or not cache.persistent or self.executor is None:
+            return self._cache_get(key)
+        # Memory hits skip the thread hop; only a disk lookup leaves the loop
+        cached = cache.get_memory(key)
+        if cached is not None:
+            return cached
+        return await self.executor.run("extraction_cache" , cache.get , key)
+
+    async def _cache_put_async(self , key: str , artifacts: List[dict] , metadata: dict):
+        cache = self.extraction_cache
+        try:
+            if cache is None or not cache.persistent or self.executor is None:
+                self._cache_put(key , artifacts , metadata)
+            else:
+                await self.executor.run("extraction_cache" , cache.put , key , artifacts , metadata)
+        except Exception as e:
+            # The extraction itself succeeded; only later repeats miss
+            print(f"Extraction cache write failed: {e}")
+
+    def _read_response(self , response) -> Tuple[List[dict] , dict]:
+        artifacts = self._parse_artifacts(response.choices[0].message.content)
+        return artifacts , {
+            "model":self.model,
+            "tokens_used":response.usage.total_tokens
+        }
+
+    def _to_extraction_result(
+        self,
+        artifacts: List[dict],
+        metadata: dict,
+        conversation_input: ConversationInput,
+        cache_status: str
+    ) -> ExtractionResult:
+        extraction_metadata = dict(metadata)
+        if "error" not in extraction_metadata:
+            extraction_metadata["cache"] = cache_status
+            if cache_status != "miss":
+                # Only the request that made the completion call is billed for it
+                extraction_metadata["tokens_used"] = 0
+        return ExtractionResult(
+            memory_units=self._materialize(
+                artifacts,
+                conversation_input.session_id,
+                conversation_input.project_id
+            ),
+            extraction_metadata=extraction_metadata
+        )
         
     def _build_extraction_prompt(self, conv_input: ConversationInput) -> str:
         context=""
         if conv_input.conversation_history:
             history_text = "\n".join([
-                f"{msg.get('role', 'user')}: {msg.get('content', '')}"
-                for msg in conv_input.conversation_history[-5:]  # Last 5 messages
+                f"{msg.get('role', 'user')}"
+                # Already extracted; only there so later turns can refer to it
+                f"{' (context only, do not extract)' if msg.get('context_only') else ''}"
+                f": {msg.get('content', '')}"
+                for msg in conv_input.conversation_history[-self.history_window:]
             ])
             context = f"Recent conversation:\n{history_text}\n\n"
         
-        return f"""{context}Current message: {conv_input.user_message}
-Extract memory artifacts from this conversation. Return ONLY a JSON array."""
+        # Bulk transcript windows of assistant turns alone have no current message
+        current = f"Current message: {conv_input.user_message}\n" if conv_input.user_message else ""
+        return f"""{context}{current}Extract memory artifacts from this conversation. Return ONLY a JSON array."""
     
     def _parse_extraction_response(
         self,
         llm_response:str,
-        session_id:str
+        session_id:str,
+        project_id: Optional[str] = None
+    ) -> List[MemoryUnit]:
+        return self._materialize(self._parse_artifacts(llm_response) , session_id , project_id)
+
+    def _parse_artifacts(self , llm_response: str) -> List[dict]:
+        # Bracket-aware, so "]" inside content no longer truncates the array
+        artifacts = []
+        for artifact in parse_json_array(llm_response):
+            artifact = self._normalize_artifact(artifact)
+            if artifact is not None:
+                artifacts.append(artifact)
+        return artifacts
+
+    def _normalize_artifact(self , artifact) -> Optional[dict]:
+        try:
+            return {
+                "type": MemoryType(artifact['type']).value,
+                "content": str(artifact['content']),
+                "scope": MemoryScope(artifact['scope']).value,
+                "confidence": float(artifact.get('confidence',0.7))
+            }
+        except (KeyError , ValueError , TypeError , AttributeError):
+            return None
+
+    def _materialize(
+        self,
+        artifacts: List[dict],
+        session_id: str,
+        project_id: Optional[str] = None
     ) -> List[MemoryUnit]:
+        # Fresh units (new ids and timestamps) on every call, so cached or shared
+        # artifacts never alias memories already stored for another request
+        memory_units = []
+        for artifact in artifacts:
+            memory_unit = self._artifact_to_memory_unit(artifact , session_id , project_id)
+            if memory_unit is not None:
+                memory_units.append(memory_unit)
+        return memory_units
+
+    def _artifact_to_memory_unit(
+        self,
+        artifact: dict,
+        session_id: str,
+        project_id: Optional[str] = None
+    ) -> Optional[MemoryUnit]:
         try:
-            json_start = llm_response.find('[')
-            json_end = llm_response.find(']') + 1
-
-            if json_start == -1 or json_end ==0:
-                return[]
-
-            json_str = llm_response[json_start:json_end]
-            artifacts = json.loads(json_str)
-
-            memory_units = []
-            for artifact in artifacts:
-                try:
-                    memory_unit = MemoryUnit(
-                        type = MemoryType(artifact['type']),
-                        content = artifact['content'],
-                        scope = MemoryScope(artifact['scope']),
-                        confidence=float(artifact.get('confidence',0.7)),
-                        lifecycle=MemoryLifecycle.ACTIVE,
-                        source_session=session_id
-                    )
-                    memory_units.append(memory_unit)
-                except (KeyError , ValueError) as e:
-                    continue
-            return memory_units
-        except json.JSONDecodeError:
-            return []
+            return MemoryUnit(
+                type = MemoryType(artifact['type']),
+                content = artifact['content'],
+                scope = MemoryScope(artifact['scope']),
+                confidence=float(artifact.get('confidence',0.7)),
+                lifecycle=MemoryLifecycle.ACTIVE,
+                source_session=session_id,
+                project_id=project_id
+            )
+        except (KeyError , ValueError , TypeError):
+            return None
     
     def generate_embedding(self,text:str) -> List[float]:
-        embeddings = list(self.embedding_model.embed([text]))
-        embedding = embeddings[0]
-        # embedding = self.embedding_model.encode(
-        #     text,
-        #     normalize_embeddings=True
-        # )
-        return embedding.tolist()
+        return self.generate_embeddings([text])[0]
+
+    def generate_embeddings(self , texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            return [embedding.tolist() for embedding in self._embed_batch(texts)]
+
+        vectors = self.embedding_cache.get_many(texts)
+        missing = list(dict.fromkeys(
+            texts[i] for i, vector in enumerate(vectors) if vector is None
+        ))
+        if missing:
+            computed = self._embed_batch(missing)
+            self.embedding_cache.put_many(missing , computed)
+            by_text = dict(zip(missing , computed))
+            vectors = [
+                vector if vector is not None else by_text[text]
+                for text, vector in zip(texts , vectors)
+            ]
+        return [vector.tolist() for vector in vectors]
+
+    def _embed_batch(self , texts: List[str]) -> list:
+        # One ONNX invocation for the whole batch instead of one per text
+        return list(self.embedding_model.embed(texts , batch_size=max(len(texts) , 1)))
 
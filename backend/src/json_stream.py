@@ -0,0 +1,94 @@
+from typing import Any , List
+import json
+
+class JsonArrayStreamParser:
+    """Incrementally parses the objects of a JSON array from text chunks.
+
+    Text before the array (preamble, markdown fences) is skipped. ``feed``
+    returns each top-level object of the array as soon as its closing brace
+    arrives; brackets and braces inside strings are ignored. An array that
+    closes without yielding any object is treated as prose and the search
+    moves on to the next ``[``. Objects that fail to decode are dropped.
+    """
+    def __init__(self):
+        self.done = False
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._objects_found = 0
+        self._current: List[str] = []
+
+    def feed(self , text: str) -> List[Any]:
+        objects = []
+        if self.done or not text:
+            return objects
+
+        position = 0
+        length = len(text)
+        while position < length and not self.done:
+            if not self._in_array:
+                start = text.find("[" , position)
+                if start < 0:
+                    return objects
+                self._in_array = True
+                self._depth = 0
+                self._objects_found = 0
+                position = start + 1
+                continue
+
+            # Copy runs of ordinary characters in one slice
+            run_start = position
+            while position < length:
+                char = text[position]
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif char == "\\":
+                        self._escaped = True
+                    elif char == '"':
+                        self._in_string = False
+                    position += 1
+                    continue
+                if char in '"{}[]':
+                    break
+                position += 1
+            if self._depth > 0:
+                self._current.append(text[run_start:position])
+            if position >= length:
+                break
+
+            char = text[position]
+            position += 1
+            if char == '"':
+                self._in_string = True
+                if self._depth > 0:
+                    self._current.append(char)
+            elif char in "{[":
+                self._depth += 1
+                self._current.append(char)
+            elif char in "}]":
+                if self._depth == 0:
+                    # The outer array closed
+                    if char == "]":
+                        if self._objects_found:
+                            self.done = True
+                        else:
+                            self._in_array = False
+                    continue
+                self._depth -= 1
+                self._current.append(char)
+                if self._depth == 0:
+                    fragment = "".join(self._current)
+                    self._current = []
+                    # Only object elements are emitted; nested arrays and scalars are skipped
+                    if fragment.startswith("{"):
+                        try:
+                            objects.append(json.loads(fragment))
+                            self._objects_found += 1
+                        except json.JSONDecodeError:
+                            pass
+        return objects
+
+def parse_json_array(text: str) -> List[Any]:
+    return JsonArrayStreamParser().feed(text)
@@ -0,0 +1,263 @@
+from typing import Dict , Iterable , List , Optional , Sequence , Tuple
+from collections import Counter
+import math
+import re
+
+from src.sqlite_pool import SQLiteConnectionPool
+
+_IDENTIFIER = re.compile(r"[A-Za-z0-9_]+(?:[.\-/:][A-Za-z0-9_]+)*")
+_PATH_SEPARATORS = re.compile(r"[.\-/:]+")
+_WORD_SEPARATORS = re.compile(r"_+|(?<=[a-z0-9])(?=[A-Z])")
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the
+this to was we were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms, keeping identifiers whole.
+
+    ``user_accounts.created_at`` yields the full identifier, its dotted
+    pieces ``user_accounts`` and ``created_at``, and their words; camelCase
+    names like ``getUserById`` also yield their words. Stop words are
+    dropped unless they are part of an identifier.
+    """
+    terms = []
+    for match in _IDENTIFIER.finditer(text):
+        identifier = match.group()
+        pieces = [piece for piece in _PATH_SEPARATORS.split(identifier) if piece]
+        expanded = [identifier] if len(pieces) > 1 else []
+        for piece in pieces:
+            words = [word for word in _WORD_SEPARATORS.split(piece) if word]
+            expanded.append(piece)
+            if len(words) > 1:
+                expanded.extend(words)
+        if len(expanded) == 1 and expanded[0].lower() in STOP_WORDS:
+            continue
+        terms.extend(term.lower() for term in expanded)
+    return terms
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]] , k: int = 60) -> List[Tuple[str , float]]:
+    """Fuses ranked id lists by sum of 1 / (k + rank); best first."""
+    scores: Dict[str,float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking , start=1):
+            scores[doc_id] = scores.get(doc_id , 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items() , key=lambda item: -item[1])
+
+class LexicalIndex:
+    """BM25 inverted index persisted as SQLite postings.
+
+    Documents get a compact integer key; postings are (term, doc_key, tf)
+    rows in a WITHOUT ROWID table clustered by term, so a query reads only
+    the postings of its own terms. Document count and total length are kept
+    in a meta table, so nothing is rebuilt or rescanned at startup. Each
+    document row remembers its terms, which lets ``remove_many`` delete its
+    postings by primary key, and its project and scope, which ``search``
+    filters on before cutting the ranking to ``top_k``.
+    """
+    def __init__(
+        self,
+        db_path: str = "episodic_memory.db",
+        pool_size: int = 2,
+        k1: float = 1.2,
+        b: float = 0.75
+    ):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self._pool = SQLiteConnectionPool(db_path , pool_size=pool_size)
+        with self._pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_docs(
+                    doc_key INTEGER PRIMARY KEY,
+                    doc_id TEXT UNIQUE NOT NULL,
+                    length INTEGER NOT NULL,
+                    terms TEXT NOT NULL,
+                    project_id TEXT,
+                    scope TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(lexical_docs)")}
+            if "project_id" not in columns:
+                # Postings from before projects were recorded can't be filtered;
+                # dropping them lets the owner re-index from its store
+                conn.execute("ALTER TABLE lexical_docs ADD COLUMN project_id TEXT")
+                conn.execute("ALTER TABLE lexical_docs ADD COLUMN scope TEXT")
+                conn.execute("DELETE FROM lexical_docs")
+                conn.execute("DELETE FROM lexical_postings")
+                conn.execute("DELETE FROM lexical_meta")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lexical_docs_project ON lexical_docs(project_id)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_postings(
+                    term TEXT NOT NULL,
+                    doc_key INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY(term , doc_key)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_meta(
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO lexical_meta(key , value) VALUES('doc_count' , 0) , ('total_length' , 0)"
+            )
+
+    def add_many(self , documents: Iterable[Tuple[str , str , Optional[str] , str]]):
+        """Indexes (doc_id, text, project_id, scope) tuples, replacing
+        documents already indexed."""
+        documents = list(documents)
+        if not documents:
+            return
+        with self._pool.connection() as conn:
+            self._remove(conn , [document[0] for document in documents])
+            added_length = 0
+            for doc_id, text, project_id, scope in documents:
+                terms = tokenize(text)
+                counts = Counter(terms)
+                cursor = conn.execute(
+                    """
+                    INSERT INTO lexical_docs(doc_id , length , terms , project_id , scope)
+                    VALUES(? , ? , ? , ? , ?)
+                    """,
+                    (doc_id , len(terms) , " ".join(counts) , project_id , scope)
+                )
+                doc_key = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO lexical_postings(term , doc_key , tf) VALUES(? , ? , ?)",
+                    [(term , doc_key , tf) for term, tf in counts.items()]
+                )
+                added_length += len(terms)
+            self._adjust_meta(conn , len(documents) , added_length)
+
+    def remove_many(self , doc_ids: Iterable[str]):
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        with self._pool.connection() as conn:
+            self._remove(conn , doc_ids)
+
+    def _remove(self , conn , doc_ids: List[str]):
+        removed = 0
+        removed_length = 0
+        for start in range(0 , len(doc_ids) , 500):
+            chunk = doc_ids[start:start + 500]
+            rows = conn.execute(
+                f"""
+                SELECT doc_key , length , terms FROM lexical_docs
+                WHERE doc_id IN ({",".join("?" * len(chunk))})
+                """,
+                chunk
+            ).fetchall()
+            if not rows:
+                continue
+            conn.executemany(
+                "DELETE FROM lexical_postings WHERE term = ? AND doc_key = ?",
+                [(term , row["doc_key"]) for row in rows for term in row["terms"].split()]
+            )
+            conn.executemany(
+                "DELETE FROM lexical_docs WHERE doc_key = ?",
+                [(row["doc_key"] ,) for row in rows]
+            )
+            removed += len(rows)
+            removed_length += sum(row["length"] for row in rows)
+        if removed:
+            self._adjust_meta(conn , -removed , -removed_length)
+
+    def _adjust_meta(self , conn , doc_delta: int , length_delta: int):
+        conn.executemany(
+            "UPDATE lexical_meta SET value = value + ? WHERE key = ?",
+            [(doc_delta , "doc_count") , (length_delta , "total_length")]
+        )
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> List[Tuple[str , float]]:
+        """(doc_id, BM25 score) pairs for the best ``top_k`` documents.
+        ``project_id`` restricts them to that project, plus global-scope
+        documents when ``include_global``; term statistics stay corpus-wide."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        project_clause = ""
+        project_params: List[str] = []
+        if project_id is not None:
+            project_clause = "AND (d.project_id = ? OR d.scope = 'global')" if include_global else "AND d.project_id = ?"
+            project_params = [project_id]
+        with self._pool.connection() as conn:
+            idf , average_length = self._statistics(conn , terms)
+            if not idf:
+                return []
+            postings = conn.execute(
+                f"""
+                SELECT p.term , p.tf , d.doc_id , d.length
+                FROM lexical_postings p JOIN lexical_docs d ON d.doc_key = p.doc_key
+                WHERE p.term IN ({placeholders}) {project_clause}
+                """,
+                terms + project_params
+            ).fetchall()
+
+        scores: Dict[str,float] = {}
+        for term, tf, doc_id, length in postings:
+            scores[doc_id] = scores.get(doc_id , 0.0) + self._term_score(idf[term] , tf , length , average_length)
+        return sorted(scores.items() , key=lambda item: -item[1])[:top_k]
+
+    def score_texts(self , query: str , texts: Sequence[str]) -> List[float]:
+        """BM25 score of each of ``texts`` under the index's statistics, on
+        the scale of ``search``, whether or not the text is indexed."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not texts:
+            return [0.0] * len(texts)
+        with self._pool.connection() as conn:
+            idf , average_length = self._statistics(conn , terms)
+        scores = []
+        for text in texts:
+            document_terms = tokenize(text)
+            counts = Counter(document_terms)
+            scores.append(sum(
+                self._term_score(idf.get(term , 0.0) , counts[term] , len(document_terms) , average_length)
+                for term in terms if counts[term]
+            ))
+        return scores
+
+    def _statistics(self , conn , terms: List[str]) -> Tuple[Dict[str,float] , float]:
+        """IDF of each of ``terms`` and the average document length; no IDF
+        at all when the index is empty."""
+        meta = dict(conn.execute("SELECT key , value FROM lexical_meta").fetchall())
+        doc_count = meta.get("doc_count" , 0)
+        if doc_count <= 0:
+            return {} , 1.0
+        document_frequency = dict(conn.execute(
+            f"""
+            SELECT term , COUNT(*) FROM lexical_postings
+            WHERE term IN ({",".join("?" * len(terms))}) GROUP BY term
+            """,
+            terms
+        ).fetchall())
+        idf = {
+            term: math.log(1.0 + (doc_count - document_frequency.get(term , 0) + 0.5) / (document_frequency.get(term , 0) + 0.5))
+            for term in terms
+        }
+        return idf , max(meta.get("total_length" , 0) / doc_count , 1.0)
+
+    def _term_score(self , idf: float , tf: int , length: int , average_length: float) -> float:
+        norm = self.k1 * (1.0 - self.b + self.b * length / average_length)
+        return idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+    def count(self) -> int:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT value FROM lexical_meta WHERE key = 'doc_count'").fetchone()
+            return row[0] if row else 0
+
+    def close(self):
+        self._pool.close()
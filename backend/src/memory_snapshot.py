@@ -0,0 +1,171 @@
+from typing import Callable , Dict , List , Optional , Tuple
+from collections import OrderedDict
+import threading
+import time
+
+from src.Schemas import MemoryUnit , MemoryScope , MemoryLifecycle
+from src.contradiction_index import ContradictionIndex
+
+class SessionSnapshot:
+    def __init__(self , working: List[MemoryUnit] , episodic: List[MemoryUnit]):
+        # memory_id -> (unit, monotonic expiry or None when unknown)
+        self.working: Dict[str,Tuple[MemoryUnit,Optional[float]]] = {
+            memory.id: (memory , None) for memory in working
+        }
+        self.episodic: Dict[str,MemoryUnit] = {memory.id: memory for memory in episodic}
+        self.index = ContradictionIndex.from_memories(working + episodic)
+        self.loaded_at = time.monotonic()
+
+    def memories(self , now: float) -> List[MemoryUnit]:
+        active_working = [
+            memory for memory, expires_at in self.working.values()
+            if expires_at is None or expires_at > now
+        ]
+        return active_working + list(self.episodic.values())
+
+class MemorySnapshotCache:
+    """Per-session view of the memories the policy engine compares against.
+
+    Mirrors ``MemoryStoreManager.get_all_memories``: a session's active working
+    memories and episodic timeline, plus the session-scoped semantic memories
+    (which are shared by all sessions). Writes and deprecations are applied
+    incrementally, to the memory lists and to the contradiction indexes the
+    policy engine queries; ``ttl_seconds`` bounds staleness from writes made
+    by other processes. A load that races with a write to the same session is
+    served but not cached.
+    """
+    def __init__(self , max_sessions: int = 1024 , ttl_seconds: float = 60.0):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str,SessionSnapshot]" = OrderedDict()
+        self._semantic: Optional[Dict[str,MemoryUnit]] = None
+        self._semantic_index: Optional[ContradictionIndex] = None
+        self._semantic_loaded_at = 0.0
+        self._loading: Dict[str,int] = {}
+        self._dirty: set = set()
+        self._semantic_loading = 0
+        self._semantic_dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_session(
+        self,
+        session_id: str,
+        loader: Callable[[] , Tuple[List[MemoryUnit] , List[MemoryUnit]]]
+    ) -> Tuple[List[MemoryUnit] , ContradictionIndex]:
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._sessions.get(session_id)
+            if snapshot is not None and now - snapshot.loaded_at < self.ttl_seconds:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return snapshot.memories(now) , snapshot.index
+            self.misses += 1
+            self._loading[session_id] = self._loading.get(session_id , 0) + 1
+
+        snapshot = None
+        try:
+            working , episodic = loader()
+            snapshot = SessionSnapshot(list(working) , list(episodic))
+        finally:
+            with self._lock:
+                dirty = session_id in self._dirty
+                remaining = self._loading[session_id] - 1
+                if remaining:
+                    self._loading[session_id] = remaining
+                else:
+                    del self._loading[session_id]
+                    self._dirty.discard(session_id)
+                if snapshot is not None and not dirty:
+                    self._sessions[session_id] = snapshot
+                    self._sessions.move_to_end(session_id)
+                    while len(self._sessions) > self.max_sessions:
+                        self._sessions.popitem(last=False)
+        return snapshot.memories(time.monotonic()) , snapshot.index
+
+    def get_semantic(
+        self,
+        loader: Callable[[] , List[MemoryUnit]]
+    ) -> Tuple[List[MemoryUnit] , ContradictionIndex]:
+        now = time.monotonic()
+        with self._lock:
+            if self._semantic is not None and now - self._semantic_loaded_at < self.ttl_seconds:
+                return list(self._semantic.values()) , self._semantic_index
+            self._semantic_loading += 1
+
+        memories = None
+        index = None
+        try:
+            memories = list(loader())
+            index = ContradictionIndex.from_memories(memories)
+        finally:
+            with self._lock:
+                dirty = self._semantic_dirty
+                self._semantic_loading -= 1
+                if not self._semantic_loading:
+                    self._semantic_dirty = False
+                if memories is not None and not dirty:
+                    self._semantic = {memory.id: memory for memory in memories}
+                    self._semantic_index = index
+                    self._semantic_loaded_at = time.monotonic()
+        return memories , index
+
+    def record_write(
+        self,
+        memory_unit: MemoryUnit,
+        target_store: str,
+        ttl_seconds: Optional[int] = None,
+        embedding: Optional[List[float]] = None
+    ):
+        memory = memory_unit.model_copy()
+        with self._lock:
+            if target_store == "semantic":
+                if self._semantic_loading:
+                    self._semantic_dirty = True
+                if (self._semantic is not None and
+                    memory.scope == MemoryScope.SESSION and
+                    memory.lifecycle == MemoryLifecycle.ACTIVE):
+                    self._semantic[memory.id] = memory
+                    self._semantic_index.add(memory , embedding)
+                return
+
+            session_id = memory.source_session
+            if session_id in self._loading:
+                self._dirty.add(session_id)
+            snapshot = self._sessions.get(session_id)
+            if snapshot is None:
+                return
+            if target_store == "working":
+                if memory.lifecycle == MemoryLifecycle.ACTIVE:
+                    expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+                    snapshot.working[memory.id] = (memory , expires_at)
+                    snapshot.index.add(memory)
+            elif target_store == "episodic":
+                snapshot.episodic[memory.id] = memory
+                snapshot.index.add(memory)
+
+    def record_deprecation(self , memory_id: str):
+        # Deprecation only touches the semantic store, whose scope query skips non-active points
+        with self._lock:
+            if self._semantic_loading:
+                self._semantic_dirty = True
+            if self._semantic is not None:
+                self._semantic.pop(memory_id , None)
+                self._semantic_index.remove(memory_id)
+
+    def invalidate_semantic(self):
+        with self._lock:
+            if self._semantic_loading:
+                self._semantic_dirty = True
+            self._semantic = None
+            self._semantic_index = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "hits": self.hits,
+                "misses": self.misses
+            }
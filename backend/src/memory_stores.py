@@ -1,81 +1,221 @@
-from typing import Optional , List , Dict
+from typing import Optional , List , Dict , Iterator , Tuple
+from abc import ABC , abstractmethod
 from datetime import datetime , timezone , timedelta
-from collections import defaultdict
+from collections import Counter , defaultdict
 from contextlib import contextmanager
 import numpy as np
+import grpc
+import threading
+import heapq
 import sqlite3
+import time
 import json
 from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException , UnexpectedResponse
 from qdrant_client.models import (
     Distance , VectorParams , PointStruct,
-    Filter , FieldCondition , MatchValue , Range
+    Filter , FieldCondition , MatchValue , MatchAny , Range,
+    SetPayload , SetPayloadOperation , PayloadSchemaType , QueryRequest,
+    KeywordIndexParams , KeywordIndexType , IsEmptyCondition , PayloadField
 )
 
 
+from src.sqlite_pool import SQLiteConnectionPool
+from src.memory_snapshot import MemorySnapshotCache
+from src.contradiction_index import ContradictionIndex , ContradictionIndexGroup
+from src.extraction_watermarks import ExtractionWatermarkStore
+from src.dedup import LIVE_LIFECYCLES , content_hash
+from src.lexical_index import LexicalIndex , reciprocal_rank_fusion
+from src.reranker import RelevanceReranker
 from src.Schemas import(
     MemoryUnit , MemoryScope , MemoryType , MemoryLifecycle,
-    WorkingMemoryEntry , EpisodicMemoryEntry , SemanticMemoryEntry
+    WorkingMemoryEntry , EpisodicMemoryEntry , SemanticMemoryEntry , ScoredMemory,
+    RankingWeights , SemanticCandidates
 )
 import os
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 os.environ["HF_HUB_DISABLE_SYMLINKS"] = "1"
 
 
-class WorkingMemoryStore:
-    def __init__(self):
+class BaseWorkingMemoryStore(ABC):
+    backend_name: str = "memory"
+
+    @abstractmethod
+    def add(self , memory_unit: MemoryUnit , ttl_seconds: int = 3600):
+        ...
+
+    def add_many(self , entries: List[Tuple[MemoryUnit , int]]):
+        for memory_unit, ttl_seconds in entries:
+            self.add(memory_unit , ttl_seconds=ttl_seconds)
+
+    @abstractmethod
+    def get_active(self , session_id: str) -> List[MemoryUnit]:
+        ...
+
+    @abstractmethod
+    def cleanup_expired(self):
+        ...
+
+    @abstractmethod
+    def get_by_id(self , memory_id: str) -> Optional[MemoryUnit]:
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": self.backend_name}
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+class WorkingMemoryStore(BaseWorkingMemoryStore):
+    def __init__(self , max_entries: int = 10000 , sweep_interval: float = 60.0):
         self._store: Dict[str,WorkingMemoryEntry] = {}
+        # session_id -> {memory_id: entry}, so lookups only touch one session
+        self._sessions: Dict[str,Dict[str,WorkingMemoryEntry]] = {}
+        # Min-heap of (expires_at timestamp, memory_id); stale pairs are skipped lazily
+        self._expiry_heap: List[Tuple[float,str]] = []
+        self._expiry: Dict[str,float] = {}
+        self._lock = threading.RLock()
+        self.max_entries = max_entries
+        self.evictions = 0
+
+        self._stop_sweeper = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop,
+                args=(sweep_interval,),
+                name="working-memory-sweeper",
+                daemon=True
+            )
+            self._sweeper.start()
     
     def add(self , memory_unit: MemoryUnit , ttl_seconds: int = 3600):
-        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
-        entry = WorkingMemoryEntry(
-            memory_unit=memory_unit,
-            ttl_seconds=ttl_seconds,
-            expires_at = expires_at
-        )
+        self.add_many([(memory_unit , ttl_seconds)])
+
+    def add_many(self , entries: List[Tuple[MemoryUnit , int]]):
+        now = datetime.now(timezone.utc)
+        prepared = [
+            WorkingMemoryEntry(
+                memory_unit=memory_unit,
+                ttl_seconds=ttl_seconds,
+                expires_at=now + timedelta(seconds=ttl_seconds)
+            )
+            for memory_unit, ttl_seconds in entries
+        ]
+        with self._lock:
+            for entry in prepared:
+                self._insert(entry)
+            while len(self._store) > self.max_entries:
+                self._evict_one()
+
+    def _insert(self , entry: WorkingMemoryEntry):
+        memory_unit = entry.memory_unit
+        previous = self._store.get(memory_unit.id)
+        if previous and previous.memory_unit.source_session != memory_unit.source_session:
+            self._remove(memory_unit.id)
         self._store[memory_unit.id] = entry
+        self._sessions.setdefault(memory_unit.source_session , {})[memory_unit.id] = entry
+        expires_ts = entry.expires_at.timestamp()
+        self._expiry[memory_unit.id] = expires_ts
+        heapq.heappush(self._expiry_heap , (expires_ts , memory_unit.id))
     
     def get_active(self, session_id: str) -> List[MemoryUnit]:
         now = datetime.now(timezone.utc)
-        active = []
-
-        for entry in self._store.values():
-            if(entry.memory_unit.source_session == session_id and 
-               entry.expires_at > now and
-               entry.memory_unit.lifecycle == MemoryLifecycle.ACTIVE ):
-                active.append(entry.memory_unit)
-            
-        return active
+        with self._lock:
+            self._expire(now.timestamp())
+            bucket = self._sessions.get(session_id)
+            if not bucket:
+                return []
+            return [
+                entry.memory_unit for entry in bucket.values()
+                if (entry.expires_at > now and
+                    entry.memory_unit.lifecycle == MemoryLifecycle.ACTIVE)
+            ]
     
     def cleanup_expired(self):
-        now = datetime.now(timezone.utc)
-        expired_ids = [
-            uid for uid, entry in self._store.items()
-            if entry.expires_at <= now
-        ]
-        for uid in expired_ids:
-            del self._store[uid]
+        with self._lock:
+            self._expire(datetime.now(timezone.utc).timestamp())
         
     def get_by_id(self, memory_id: str) -> Optional[MemoryUnit]:
-        entry = self._store.get(memory_id)
-        return entry.memory_unit if entry else None
+        with self._lock:
+            entry = self._store.get(memory_id)
+            if entry is None or entry.expires_at <= datetime.now(timezone.utc):
+                return None
+            return entry.memory_unit
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend_name,
+                "entries": len(self._store),
+                "sessions": len(self._sessions),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        self._stop_sweeper.set()
+
+    def _expire(self , now_ts: float):
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now_ts:
+            expires_ts, memory_id = heapq.heappop(heap)
+            if self._expiry.get(memory_id) == expires_ts:
+                self._remove(memory_id)
+
+    def _evict_one(self):
+        # Entries closest to expiry are the cheapest to lose
+        heap = self._expiry_heap
+        while heap:
+            expires_ts, memory_id = heapq.heappop(heap)
+            if self._expiry.get(memory_id) == expires_ts:
+                self._remove(memory_id)
+                self.evictions += 1
+                return
+
+    def _remove(self , memory_id: str):
+        entry = self._store.pop(memory_id , None)
+        self._expiry.pop(memory_id , None)
+        if entry is None:
+            return
+        session_id = entry.memory_unit.source_session
+        bucket = self._sessions.get(session_id)
+        if bucket is not None:
+            bucket.pop(memory_id , None)
+            if not bucket:
+                del self._sessions[session_id]
+
+    def _sweep_loop(self , interval: float):
+        while not self._stop_sweeper.wait(interval):
+            self.cleanup_expired()
     
 class EpisodicMemoryStore :
-    def __init__(self, db_path:str = "episodic_memory.db"):
+    # Kept as constants so sqlite3's per-connection statement cache reuses them.
+    # Ignoring known ids makes a replayed write-behind batch a no-op.
+    _INSERT_EVENT_SQL = """
+                INSERT OR IGNORE INTO episodic_events(
+                    id , event_type , memory_type , content , scope ,
+                    confidence , lifecycle , source_session ,
+                    created_at , updated_at , metadata , content_hash ,
+                    project_id
+                ) VALUES(? , ? , ? , ? , ? , ? , ? , ? , ? , ? , ? , ? , ?)
+            """
+
+    def __init__(self, db_path:str = "episodic_memory.db" , pool_size:int = 4):
         self.db_path = db_path
+        self._pool = SQLiteConnectionPool(db_path , pool_size=pool_size)
         self._initialize_db()
 
     @contextmanager
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
+        with self._pool.connection() as conn:
             yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+
+    def close(self):
+        self._pool.close()
     
     def _initialize_db(self):
         with self._get_connection() as conn:
@@ -93,10 +233,50 @@ class EpisodicMemoryStore :
                     source_session TEXT NOT NULL,
                     created_at TIMESTAMP NOT NULL,
                     updated_at TIMESTAMP NOT NULL,
-                    metadata TEXT
+                    metadata TEXT,
+                    content_hash TEXT,
+                    project_id TEXT,
+                    repeat_count INTEGER NOT NULL DEFAULT 0,
+                    last_repeated_at TIMESTAMP
                 )
 """
             )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(episodic_events)")}
+            if "content_hash" not in columns:
+                # Databases created before write-path dedup: add and backfill the column
+                conn.execute("ALTER TABLE episodic_events ADD COLUMN content_hash TEXT")
+                rows = conn.execute("SELECT id , memory_type , content , scope , source_session FROM episodic_events").fetchall()
+                conn.executemany(
+                    "UPDATE episodic_events SET content_hash = ? WHERE id = ?",
+                    [
+                        (content_hash(MemoryUnit(
+                            id=row["id"],
+                            type=MemoryType(row["memory_type"]),
+                            content=row["content"],
+                            scope=MemoryScope(row["scope"]),
+                            source_session=row["source_session"]
+                        )) , row["id"])
+                        for row in rows
+                    ]
+                )
+            if "project_id" not in columns:
+                # Events logged before project partitions belong to no project
+                conn.execute("ALTER TABLE episodic_events ADD COLUMN project_id TEXT")
+            if "repeat_count" not in columns:
+                conn.execute("ALTER TABLE episodic_events ADD COLUMN repeat_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE episodic_events ADD COLUMN last_repeated_at TIMESTAMP")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_project_created
+                ON episodic_events(project_id , created_at)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_scope_created
+                ON episodic_events(scope , created_at)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_content_hash
+                ON episodic_events(content_hash)
+            """)
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_memory_id 
                 ON episodic_events(id)
@@ -120,26 +300,74 @@ class EpisodicMemoryStore :
     def add(self , memory_unit: MemoryUnit , event_type:str = "decision"):
         with self._get_connection() as conn :
             conn.execute(
-                """
-                INSERT INTO episodic_events(
-                    id , event_type , memory_type , content , scope ,
-                    confidence , lifecycle , source_session ,
-                    created_at , updated_at , metadata
-                ) VALUES(? , ? , ? , ? , ? , ? , ? , ? , ? , ? , ?)
-            """ , (
-                memory_unit.id ,
-                event_type,
-                memory_unit.type,
-                memory_unit.content ,
-                memory_unit.scope,
-                memory_unit.confidence , 
-                memory_unit.lifecycle ,
-                memory_unit.source_session ,
-                memory_unit.created_at.isoformat(),
-                memory_unit.updated_at.isoformat(),
-                json.dumps(memory_unit.metadata)
+                self._INSERT_EVENT_SQL,
+                self._memory_unit_to_row(memory_unit , event_type)
             )
+
+    def add_many(self , events: List[Tuple[MemoryUnit , str]]):
+        if not events:
+            return
+        # Single transaction for the whole batch
+        with self._get_connection() as conn :
+            conn.executemany(
+                self._INSERT_EVENT_SQL,
+                [
+                    self._memory_unit_to_row(memory_unit , event_type)
+                    for memory_unit, event_type in events
+                ]
             )
+
+    def add_repeats(self , memory_ids: List[str]):
+        """Counts a repeat of each event in ``memory_ids`` (once per
+        occurrence) instead of logging its content again."""
+        if not memory_ids:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        with self._get_connection() as conn :
+            conn.executemany(
+                """
+                UPDATE episodic_events
+                SET repeat_count = repeat_count + ? , last_repeated_at = ?
+                WHERE id = ?
+                """,
+                [(count , now , memory_id) for memory_id, count in Counter(memory_ids).items()]
+            )
+
+    def _memory_unit_to_row(self , memory_unit: MemoryUnit , event_type: str) -> tuple:
+        return (
+            memory_unit.id ,
+            event_type,
+            memory_unit.type,
+            memory_unit.content ,
+            memory_unit.scope,
+            memory_unit.confidence , 
+            memory_unit.lifecycle ,
+            memory_unit.source_session ,
+            memory_unit.created_at.isoformat(),
+            memory_unit.updated_at.isoformat(),
+            json.dumps(memory_unit.metadata),
+            content_hash(memory_unit),
+            memory_unit.project_id
+        )
+
+    def find_by_content_hashes(self , hashes: List[str]) -> Dict[str,str]:
+        """Maps each hash that is already logged to the id of its first event."""
+        found = {}
+        with self._get_connection() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0 , len(hashes) , 500):
+                chunk = hashes[start:start + 500]
+                cursor = conn.execute(
+                    f"""
+                    -- SQLite takes the bare id column from the MIN(sequence_number) row
+                    SELECT content_hash , id , MIN(sequence_number) FROM episodic_events
+                    WHERE content_hash IN ({",".join("?" * len(chunk))})
+                    GROUP BY content_hash
+                    """,
+                    chunk
+                )
+                found.update((row["content_hash"] , row["id"]) for row in cursor.fetchall())
+        return found
     
     def get_session_timeline(self, session_id:str) -> List[MemoryUnit]:
         with self._get_connection() as conn :
@@ -152,16 +380,49 @@ class EpisodicMemoryStore :
             )
             return [self._row_to_memory_unit(row) for row in cursor.fetchall()]
     
-    def get_recent(self , limit :int = 10) -> List[MemoryUnit]:
+    def get_recent(
+        self,
+        limit :int = 10,
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> List[MemoryUnit]:
+        """Latest events, newest first. With ``project_id`` only that
+        project's partition is read (plus global-scope events when
+        ``include_global``), each through its (key, created_at) index."""
         with self._get_connection() as conn :
-            cursor = conn.execute(
+            if project_id is None:
+                cursor = conn.execute(
+                    """
+                    SELECT * FROM episodic_events 
+                    ORDER BY created_at DESC , sequence_number DESC 
+                    LIMIT ?
+                """ , (limit,)
+                )
+                return [self._row_to_memory_unit(row) for row in cursor.fetchall()]
+
+            rows = conn.execute(
                 """
-                SELECT * FROM episodic_events 
-                ORDER BY sequence_number DESC 
+                SELECT * FROM episodic_events
+                WHERE project_id = ?
+                ORDER BY created_at DESC
                 LIMIT ?
-            """ , (limit,)
-            )
-            return [self._row_to_memory_unit(row) for row in cursor.fetchall()]
+            """ , (project_id , limit)
+            ).fetchall()
+            if include_global:
+                # Two index range scans merged here; an OR would scan the table
+                rows += [
+                    row for row in conn.execute(
+                        """
+                        SELECT * FROM episodic_events
+                        WHERE scope = ?
+                        ORDER BY created_at DESC
+                        LIMIT ?
+                    """ , (MemoryScope.GLOBAL.value , limit)
+                    ).fetchall()
+                    if row["project_id"] != project_id
+                ]
+                rows.sort(key=lambda row: (row["created_at"] , row["sequence_number"]) , reverse=True)
+            return [self._row_to_memory_unit(row) for row in rows[:limit]]
     
     def get_by_type(self , event_type: str , limit: int = 50) -> List[MemoryUnit]:
         with self._get_connection() as conn :
@@ -187,6 +448,10 @@ class EpisodicMemoryStore :
             return [self._row_to_memory_unit(row) for row in cursor.fetchall()]
     
     def _row_to_memory_unit(self, row: sqlite3.Row)-> MemoryUnit:
+        metadata = json.loads(row['metadata']) if row['metadata'] else {}
+        if row['repeat_count']:
+            metadata["repeat_count"] = row['repeat_count']
+            metadata["last_repeated_at"] = row['last_repeated_at']
         return MemoryUnit(
             id=row['id'],
             type=MemoryType(row['memory_type']),
@@ -195,39 +460,180 @@ class EpisodicMemoryStore :
             confidence=row['confidence'],
             lifecycle=MemoryLifecycle(row['lifecycle']),
             source_session=row['source_session'],
+            project_id=row['project_id'],
             created_at=datetime.fromisoformat(row['created_at']),
             updated_at=datetime.fromisoformat(row['updated_at']),
-            metadata=json.loads(row['metadata']) if row['metadata'] else {}
+            metadata=metadata
         )
 
+# Clients are shared per connection config: an on-disk local path can only be
+# opened once per process, and remote clients keep their connection pools warm.
+_QDRANT_CLIENTS: Dict[tuple,QdrantClient] = {}
+_QDRANT_CLIENTS_LOCK = threading.Lock()
+
+def get_qdrant_client(
+    mode: str = "memory",
+    host: str = "localhost",
+    port: int = 6333,
+    grpc_port: int = 6334,
+    url: Optional[str] = None,
+    path: Optional[str] = None,
+    api_key: Optional[str] = None,
+    timeout: int = 10
+) -> QdrantClient:
+    if mode == "memory":
+        # Each in-memory store gets its own private database
+        return QdrantClient(":memory:")
+
+    key = (mode , host , port , grpc_port , url , path , api_key , timeout)
+    with _QDRANT_CLIENTS_LOCK:
+        client = _QDRANT_CLIENTS.get(key)
+        if client is None:
+            if mode == "local":
+                client = QdrantClient(path=path or "qdrant_data")
+            elif mode in ("http" , "grpc"):
+                location = {"url": url} if url else {"host": host , "port": port}
+                client = QdrantClient(
+                    **location,
+                    grpc_port=grpc_port,
+                    prefer_grpc=(mode == "grpc"),
+                    api_key=api_key,
+                    timeout=timeout
+                )
+            else:
+                raise ValueError(f"Unknown qdrant mode: {mode}")
+            _QDRANT_CLIENTS[key] = client
+        return client
+
 class SemanticMemoryStore:
+    INDEXED_PAYLOAD_FIELDS = {
+        "lifecycle": PayloadSchemaType.KEYWORD,
+        "scope": PayloadSchemaType.KEYWORD,
+        "type": PayloadSchemaType.KEYWORD,
+        "confidence": PayloadSchemaType.FLOAT,
+        "content_hash": PayloadSchemaType.KEYWORD,
+        # Tenant index: the server co-locates each project's points
+        "project_id": KeywordIndexParams(type=KeywordIndexType.KEYWORD , is_tenant=True),
+    }
+
     def __init__(
         self,
         qdrant_host: str = "localhost",
         qdrant_port: int = 6333,
         collection_name: str = "semantic_memory",
-        vector_size: int = 384
+        vector_size: int = 384,
+        retrieval_flush_interval: float = 5.0,
+        retrieval_flush_threshold: int = 256,
+        qdrant_mode: str = "memory",
+        qdrant_grpc_port: int = 6334,
+        qdrant_url: Optional[str] = None,
+        qdrant_path: Optional[str] = None,
+        qdrant_api_key: Optional[str] = None,
+        qdrant_timeout: int = 10,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2
     ):
-        # self.client = QdrantClient(host=qdrant_host,port=qdrant_port)
-        self.client = QdrantClient(":memory:")
+        self.mode = qdrant_mode
+        self.client = get_qdrant_client(
+            mode=qdrant_mode,
+            host=qdrant_host,
+            port=qdrant_port,
+            grpc_port=qdrant_grpc_port,
+            url=qdrant_url,
+            path=qdrant_path,
+            api_key=qdrant_api_key,
+            timeout=qdrant_timeout
+        )
         self.collection_name = collection_name
         self.vector_size = vector_size
+        # Only remote servers have transient failures worth retrying
+        self.max_retries = max_retries if qdrant_mode in ("http" , "grpc") else 0
+        self.retry_backoff = retry_backoff
         self._initialize_collection()
+
+        # Retrieval stats are buffered in-process and written back in batches
+        self.retrieval_flush_interval = retrieval_flush_interval
+        self.retrieval_flush_threshold = retrieval_flush_threshold
+        self._retrieval_buffer: Dict[str,list] = {}
+        self._retrieval_lock = threading.Lock()
+        self._last_retrieval_flush = time.monotonic()
     
     def _initialize_collection(self):
-        collections = self.client.get_collections().collections
+        collections = self._call(self.client.get_collections).collections
         collection_names = [c.name for c in collections]
 
         if self.collection_name not in collection_names:
-            self.client.create_collection(
+            self._call(
+                self.client.create_collection,
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size = self.vector_size,
                     distance=Distance.COSINE
                 )
             )
+        # Local mode has no payload indexes; on a server these keep the
+        # filters built in search() from degrading into full scans.
+        if self.mode in ("http" , "grpc"):
+            for field_name, field_schema in self.INDEXED_PAYLOAD_FIELDS.items():
+                self._call(
+                    self.client.create_payload_index,
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+
+    def _call(self , fn , *args , **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args , **kwargs)
+            except (ResponseHandlingException , UnexpectedResponse , grpc.RpcError ,
+                    ConnectionError , TimeoutError) as e:
+                if isinstance(e , grpc.RpcError):
+                    retryable = e.code() in (
+                        grpc.StatusCode.UNAVAILABLE,
+                        grpc.StatusCode.DEADLINE_EXCEEDED,
+                        grpc.StatusCode.RESOURCE_EXHAUSTED
+                    )
+                else:
+                    status_code = getattr(e , "status_code" , None)
+                    retryable = status_code is None or status_code == 429 or status_code >= 500
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+
+    def ping(self) -> bool:
+        self._call(self.client.get_collections)
+        return True
+
+    def count(self) -> int:
+        return self._call(
+            self.client.count,
+            collection_name=self.collection_name,
+            exact=False
+        ).count
+
+    # Qdrant's own optimizer reclaims deleted points
+    def compaction_due(self) -> bool:
+        return False
     
     def add(self,memory_unit:MemoryUnit, embedding:List[float]):
+        self.add_many([(memory_unit , embedding)])
+
+    def add_many(self , items: List[Tuple[MemoryUnit , List[float]]]):
+        if not items:
+            return
+        self._call(
+            self.client.upsert,
+            collection_name=self.collection_name,
+            points=[
+                self._memory_unit_to_point(memory_unit , embedding)
+                for memory_unit, embedding in items
+            ]
+        )
+
+    def _memory_unit_to_point(self , memory_unit: MemoryUnit , embedding: List[float]) -> PointStruct:
         # Fixed: removed .value calls since enums are already strings
         payload = {
             "id":memory_unit.id,
@@ -240,32 +646,58 @@ class SemanticMemoryStore:
             "created_at": memory_unit.created_at.isoformat(),
             "updated_at": memory_unit.updated_at.isoformat(),
             "retrieval_count": 0,
-            "metadata": memory_unit.metadata
+            "metadata": memory_unit.metadata,
+            "content_hash": content_hash(memory_unit),
+            "project_id": memory_unit.project_id
         }
 
-        point = PointStruct(
+        return PointStruct(
             id = memory_unit.id,
             vector=embedding,
             payload=payload
         )
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points = [point]
-        )
     
     def search(
         self,
         query_embedding: List[float],
         top_k: int = 10 ,
         scope_filter: Optional[List[MemoryScope]] = None ,
-        type_filter: Optional[List[MemoryScope]] = None ,
-        min_confidence: float = 0.5
+        type_filter: Optional[List[MemoryType]] = None ,
+        min_confidence: float = 0.5,
+        project_id: Optional[str] = None,
+        include_global: bool = False
     ) -> List[MemoryUnit]:
+        hits = self.search_scored(
+            query_embedding,
+            top_k=top_k,
+            scope_filter=scope_filter,
+            type_filter=type_filter,
+            min_confidence=min_confidence,
+            project_id=project_id,
+            include_global=include_global
+        )
+        self.record_retrievals([hit.memory.id for hit in hits])
+        return [hit.memory for hit in hits]
+
+    def search_scored(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10 ,
+        scope_filter: Optional[List[MemoryScope]] = None ,
+        type_filter: Optional[List[MemoryType]] = None ,
+        min_confidence: float = 0.5,
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> List[ScoredMemory]:
+        """Hits with their cosine similarity and retrieval count, best
+        first. Unlike ``search`` this records no retrievals, so callers that
+        over-fetch can record only what they keep."""
         must_conditions = []
+        # Reinforced memories are live; only deprecated ones are filtered out
         must_conditions.append(
             FieldCondition(
                 key ="lifecycle",
-                match=MatchValue(value = MemoryLifecycle.ACTIVE.value)
+                match=MatchAny(any=LIVE_LIFECYCLES)
             )
         )
         must_conditions.append(
@@ -278,8 +710,8 @@ class SemanticMemoryStore:
             must_conditions.append(
                 FieldCondition(
                     key="scope",
-                    match=MatchValue(
-                        any=[scope.value for scope in scope_filter]
+                    match=MatchAny(
+                        any=[MemoryScope(scope).value for scope in scope_filter]
                     )
                 )
             )
@@ -287,16 +719,19 @@ class SemanticMemoryStore:
             must_conditions.append(
                 FieldCondition(
                     key="type",
-                    match=MatchValue(
-                        any = [mem_type.value for mem_type in type_filter]
+                    match=MatchAny(
+                        any = [MemoryType(mem_type).value for mem_type in type_filter]
                     )
                 )
             )
+        if project_id is not None:
+            must_conditions.append(self._project_condition(project_id , include_global))
         query_filter = Filter(must=must_conditions) if must_conditions else None
         
         # Use query() instead of search() for compatibility with different qdrant-client versions
         try:
-            search_result = self.client.query_points(
+            search_result = self._call(
+                self.client.query_points,
                 collection_name = self.collection_name,
                 query = query_embedding,
                 query_filter=query_filter,
@@ -304,22 +739,40 @@ class SemanticMemoryStore:
             ).points
         except AttributeError:
             # Fallback for older versions
-            search_result = self.client.search(
+            search_result = self._call(
+                self.client.search,
                 collection_name = self.collection_name,
                 query_vector = query_embedding,
                 query_filter=query_filter,
                 limit=top_k
             )
         
-        memories = []
-        for hit in search_result:
-            memory = self._payload_to_memory_unit(hit.payload)
-            memories.append(memory)
-            self._update_retrieval_stats(hit.id)
-        return memories
+        pending = self._pending_retrievals([hit.id for hit in search_result])
+        return [
+            ScoredMemory(
+                memory=self._payload_to_memory_unit(hit.payload),
+                score=hit.score,
+                retrieval_count=hit.payload.get("retrieval_count" , 0) + pending.get(str(hit.id) , 0)
+            )
+            for hit in search_result
+        ]
     
-    def get_by_scope(self,scope: MemoryScope) -> List[MemoryUnit]:
-        search_result = self.client.scroll(
+    def _project_condition(self , project_id: str , include_global: bool):
+        in_project = FieldCondition(key="project_id" , match=MatchValue(value=project_id))
+        if not include_global:
+            return in_project
+        return Filter(should=[
+            in_project,
+            FieldCondition(key="scope" , match=MatchValue(value=MemoryScope.GLOBAL.value))
+        ])
+
+    def get_by_scope(
+        self,
+        scope: MemoryScope,
+        include_embeddings: bool = False
+    ) -> List[MemoryUnit]:
+        search_result = self._call(
+            self.client.scroll,
             collection_name=self.collection_name,
             scroll_filter=Filter(
                 must=[
@@ -329,57 +782,281 @@ class SemanticMemoryStore:
                     ),
                     FieldCondition(
                         key="lifecycle",
-                        match=MatchValue(value=MemoryLifecycle.ACTIVE.value)
+                        match=MatchAny(any=LIVE_LIFECYCLES)
                     )
                 ]
             ),
-            limit=1000
+            limit=1000,
+            with_vectors=include_embeddings
         )
-        return [self._payload_to_memory_unit(point.payload) for  point in search_result[0]]
+        memories = []
+        for point in search_result[0]:
+            memory = self._payload_to_memory_unit(point.payload)
+            if include_embeddings:
+                memory.embedding = point.vector
+            memories.append(memory)
+        return memories
     
     def deprecate(self,memory_id: str):
-        self.client.set_payload(
+        self.deprecate_many([memory_id])
+
+    def deprecate_many(self , memory_ids: List[str]):
+        if not memory_ids:
+            return
+        self._call(
+            self.client.set_payload,
             collection_name=self.collection_name,
             payload = {
                 "lifecycle":MemoryLifecycle.DEPRECATED.value,
                 "updated_at":datetime.now(timezone.utc).isoformat()
             },
-            points = [memory_id]
+            points = list(memory_ids)
         )
     
     def reinforce(self,memory_id: str,confidence_boost:float=0.1):
-        points = self.client.retrieve(
+        self.reinforce_many([memory_id] , confidence_boost)
+
+    def reinforce_many(self , memory_ids: List[str] , confidence_boost: float = 0.1):
+        # An id listed n times is boosted n times, in one retrieve and one batch update
+        if not memory_ids:
+            return
+        boosts: Dict[str,int] = {}
+        for memory_id in memory_ids:
+            boosts[str(memory_id)] = boosts.get(str(memory_id) , 0) + 1
+        points = self._call(
+            self.client.retrieve,
             collection_name=self.collection_name,
-            ids=[memory_id]
+            ids=list(boosts),
+            with_payload=["confidence"],
+            with_vectors=False
         )
-        if points:
-            current_confidence = points[0].payload.get('confidence',0.7)
-            new_confidence = min(1.0 , current_confidence +confidence_boost)
-            self.client.set_payload(
+        if not points:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        self._call(
+            self.client.batch_update_points,
+            collection_name=self.collection_name,
+            update_operations=[
+                SetPayloadOperation(
+                    set_payload=SetPayload(
+                        payload={
+                            "confidence": min(
+                                1.0,
+                                (point.payload or {}).get('confidence',0.7) + confidence_boost * boosts[str(point.id)]
+                            ),
+                            "lifecycle":MemoryLifecycle.REINFORCED.value,
+                            "updated_at":now
+                        },
+                        points=[point.id]
+                    )
+                )
+                for point in points
+            ]
+        )
+
+    def get_many(self , memory_ids: List[str]) -> List[MemoryUnit]:
+        """Live memories among ``memory_ids``, in the order given."""
+        if not memory_ids:
+            return []
+        points = self._call(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=list(memory_ids),
+            with_payload=True,
+            with_vectors=False
+        )
+        by_id = {
+            str(point.id): point.payload for point in points
+            if point.payload and point.payload.get("lifecycle") in LIVE_LIFECYCLES
+        }
+        return [
+            self._payload_to_memory_unit(by_id[str(memory_id)])
+            for memory_id in memory_ids if str(memory_id) in by_id
+        ]
+
+    def retrieval_counts(self , memory_ids: List[str]) -> Dict[str,int]:
+        """Retrieval count of each known id, including unflushed retrievals."""
+        if not memory_ids:
+            return {}
+        points = self._call(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=list(memory_ids),
+            with_payload=["retrieval_count"],
+            with_vectors=False
+        )
+        pending = self._pending_retrievals(memory_ids)
+        return {
+            str(point.id): (point.payload or {}).get("retrieval_count" , 0) + pending.get(str(point.id) , 0)
+            for point in points
+        }
+
+    def iter_contents(
+        self,
+        batch_size: int = 512
+    ) -> Iterator[List[Tuple[str , str , Optional[str] , str]]]:
+        """(id, content, project_id, scope) of every live memory, in batches."""
+        offset = None
+        while True:
+            points , offset = self._call(
+                self.client.scroll,
                 collection_name=self.collection_name,
-                payload={
-                    "confidence": new_confidence,
-                    "lifecycle":MemoryLifecycle.REINFORCED.value,
-                    "updated_at":datetime.now(timezone.utc).isoformat()
-                },
-                points=[memory_id]
+                scroll_filter=Filter(
+                    must=[FieldCondition(key="lifecycle" , match=MatchAny(any=LIVE_LIFECYCLES))]
+                ),
+                limit=batch_size,
+                offset=offset,
+                with_payload=["id" , "content" , "project_id" , "scope"],
+                with_vectors=False
             )
-    
-    def _update_retrieval_stats(self,memory_id:str):
-        points = self.client.retrieve(
+            if points:
+                yield [
+                    (
+                        point.payload["id"],
+                        point.payload["content"],
+                        point.payload.get("project_id"),
+                        point.payload["scope"]
+                    )
+                    for point in points
+                ]
+            if offset is None:
+                return
+
+    def find_by_content_hashes(self , hashes: List[str]) -> Dict[str,str]:
+        """Maps each hash held by a live memory to that memory's id."""
+        if not hashes:
+            return {}
+        found = {}
+        points , _ = self._call(
+            self.client.scroll,
+            collection_name=self.collection_name,
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(key="content_hash" , match=MatchAny(any=list(hashes))),
+                    FieldCondition(key="lifecycle" , match=MatchAny(any=LIVE_LIFECYCLES))
+                ]
+            ),
+            limit=len(hashes) * 4,
+            with_payload=["id" , "content_hash"],
+            with_vectors=False
+        )
+        for point in points:
+            found.setdefault(point.payload["content_hash"] , point.payload["id"])
+        return found
+
+    def find_nearest(
+        self,
+        embeddings: List[List[float]],
+        memory_types: List[MemoryType],
+        min_similarity: float,
+        project_ids: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[ScoredMemory]]:
+        """The most similar live memory of the same type (and project, when
+        ``project_ids`` is given) for each embedding, if its cosine
+        similarity is at least ``min_similarity``."""
+        if not embeddings:
+            return []
+        requests = []
+        for index, (embedding, memory_type) in enumerate(zip(embeddings , memory_types)):
+            must = [
+                FieldCondition(key="type" , match=MatchValue(value=MemoryType(memory_type).value)),
+                FieldCondition(key="lifecycle" , match=MatchAny(any=LIVE_LIFECYCLES))
+            ]
+            if project_ids is not None:
+                if project_ids[index]:
+                    must.append(FieldCondition(key="project_id" , match=MatchValue(value=project_ids[index])))
+                else:
+                    # Matches both a null and a missing (pre-partition) project_id
+                    must.append(IsEmptyCondition(is_empty=PayloadField(key="project_id")))
+            requests.append(QueryRequest(
+                query=embedding,
+                filter=Filter(must=must),
+                limit=1,
+                score_threshold=min_similarity,
+                with_payload=True
+            ))
+        # One round trip for the whole batch
+        responses = self._call(
+            self.client.query_batch_points,
             collection_name=self.collection_name,
-            ids=[memory_id]
+            requests=requests
         )
-        if points:
-            current_count = points[0].payload.get('retrieval_count',0)
-            self.client.set_payload(
+        return [
+            ScoredMemory(
+                memory=self._payload_to_memory_unit(response.points[0].payload),
+                score=response.points[0].score
+            ) if response.points else None
+            for response in responses
+        ]
+    
+    def _pending_retrievals(self , memory_ids: List[str]) -> Dict[str,int]:
+        with self._retrieval_lock:
+            return {
+                str(memory_id): self._retrieval_buffer[str(memory_id)][0]
+                for memory_id in memory_ids if str(memory_id) in self._retrieval_buffer
+            }
+
+    def record_retrievals(self , memory_ids: List[str]):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._retrieval_lock:
+            for memory_id in memory_ids:
+                pending = self._retrieval_buffer.setdefault(str(memory_id) , [0 , now])
+                pending[0] += 1
+                pending[1] = now
+
+    def retrieval_flush_due(self) -> bool:
+        with self._retrieval_lock:
+            if not self._retrieval_buffer:
+                return False
+            return (
+                len(self._retrieval_buffer) >= self.retrieval_flush_threshold or
+                time.monotonic() - self._last_retrieval_flush >= self.retrieval_flush_interval
+            )
+
+    def flush_retrieval_stats(self):
+        with self._retrieval_lock:
+            pending = self._retrieval_buffer
+            self._retrieval_buffer = {}
+            self._last_retrieval_flush = time.monotonic()
+        if not pending:
+            return
+
+        try:
+            points = self._call(
+                self.client.retrieve,
                 collection_name=self.collection_name,
-                payload={
-                    "retrieval_count":current_count + 1,
-                    "last_retrieved":datetime.now(timezone.utc).isoformat()
-                },
-                points=[memory_id]
+                ids=list(pending),
+                with_payload=["retrieval_count"],
+                with_vectors=False
             )
+            operations = []
+            for point in points:
+                count, last_retrieved = pending[str(point.id)]
+                operations.append(
+                    SetPayloadOperation(
+                        set_payload=SetPayload(
+                            payload={
+                                "retrieval_count": (point.payload or {}).get('retrieval_count',0) + count,
+                                "last_retrieved": last_retrieved
+                            },
+                            points=[point.id]
+                        )
+                    )
+                )
+            if operations:
+                self._call(
+                    self.client.batch_update_points,
+                    collection_name=self.collection_name,
+                    update_operations=operations
+                )
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._retrieval_lock:
+                for memory_id, (count, last_retrieved) in pending.items():
+                    buffered = self._retrieval_buffer.setdefault(memory_id , [0 , last_retrieved])
+                    buffered[0] += count
+                    buffered[1] = max(buffered[1] , last_retrieved)
+            raise
     
     def _payload_to_memory_unit(self,payload:Dict) -> MemoryUnit:
         return MemoryUnit(
@@ -388,8 +1065,9 @@ class SemanticMemoryStore:
             content=payload['content'],
             scope=MemoryScope(payload['scope']),
             confidence=payload['confidence'],
-            lifecycle=MemoryLifecycle.ACTIVE,
+            lifecycle=MemoryLifecycle(payload.get('lifecycle' , MemoryLifecycle.ACTIVE.value)),
             source_session=payload['source_session'],
+            project_id=payload.get('project_id'),
             created_at=datetime.fromisoformat(payload['created_at']),
             updated_at=datetime.fromisoformat(payload['updated_at']),
             metadata=payload.get('metadata',{})
@@ -399,23 +1077,382 @@ class MemoryStoreManager:
         def __init__(
             self,
             sqlite_db_path:str = "episodic_memory.db",
+            sqlite_pool_size:int = 4,
             qdrant_host : str = "localhost",
             qdrant_port : int = 6333,
             qdrant_collection : str = "semantic_memory",
-            vector_size : int = 384
+            vector_size : int = 384,
+            retrieval_flush_interval : float = 5.0,
+            retrieval_flush_threshold : int = 256,
+            working_backend : str = "memory",
+            working_max_entries : int = 10000,
+            working_sweep_interval : float = 60.0,
+            redis_url : str = "redis://localhost:6379/0",
+            qdrant_mode : str = "memory",
+            qdrant_grpc_port : int = 6334,
+            qdrant_url : Optional[str] = None,
+            qdrant_path : Optional[str] = None,
+            qdrant_api_key : Optional[str] = None,
+            qdrant_timeout : int = 10,
+            qdrant_max_retries : int = 3,
+            semantic_backend : str = "qdrant",
+            numpy_index_path : Optional[str] = None,
+            snapshot_max_sessions : int = 1024,
+            snapshot_ttl_seconds : float = 60.0,
+            lexical_index_enabled : bool = True,
+            rerank_enabled : bool = True,
+            ranking_weights : Optional[RankingWeights] = None,
+            rerank_overfetch : int = 3
         ):
-            self.working = WorkingMemoryStore()
-            self.episodic = EpisodicMemoryStore(db_path=sqlite_db_path)
-            self.semantic = SemanticMemoryStore(
-                qdrant_host=qdrant_host,
-                qdrant_port=qdrant_port,
-                collection_name=qdrant_collection,
-                vector_size=vector_size
+            self.working: BaseWorkingMemoryStore
+            if working_backend == "redis":
+                from src.redis_working_memory import RedisWorkingMemoryStore
+                self.working = RedisWorkingMemoryStore(redis_url=redis_url)
+            elif working_backend == "memory":
+                self.working = WorkingMemoryStore(
+                    max_entries=working_max_entries,
+                    sweep_interval=working_sweep_interval
+                )
+            else:
+                raise ValueError(f"Unknown working memory backend: {working_backend}")
+            self.episodic = EpisodicMemoryStore(
+                db_path=sqlite_db_path,
+                pool_size=sqlite_pool_size
+            )
+            self.watermarks = ExtractionWatermarkStore(db_path=sqlite_db_path)
+            if semantic_backend == "numpy":
+                from src.numpy_vector_store import NumpySemanticMemoryStore
+                self.semantic = NumpySemanticMemoryStore(
+                    vector_size=vector_size,
+                    path=numpy_index_path
+                )
+            elif semantic_backend == "qdrant":
+                self.semantic = SemanticMemoryStore(
+                    qdrant_host=qdrant_host,
+                    qdrant_port=qdrant_port,
+                    collection_name=qdrant_collection,
+                    vector_size=vector_size,
+                    retrieval_flush_interval=retrieval_flush_interval,
+                    retrieval_flush_threshold=retrieval_flush_threshold,
+                    qdrant_mode=qdrant_mode,
+                    qdrant_grpc_port=qdrant_grpc_port,
+                    qdrant_url=qdrant_url,
+                    qdrant_path=qdrant_path,
+                    qdrant_api_key=qdrant_api_key,
+                    qdrant_timeout=qdrant_timeout,
+                    max_retries=qdrant_max_retries
+                )
+            else:
+                raise ValueError(f"Unknown semantic memory backend: {semantic_backend}")
+            self.snapshots = MemorySnapshotCache(
+                max_sessions=snapshot_max_sessions,
+                ttl_seconds=snapshot_ttl_seconds
             )
+            self.lexical: Optional[LexicalIndex] = None
+            if lexical_index_enabled:
+                # The postings live as long as the semantic store they index
+                persistent = (
+                    numpy_index_path is not None if semantic_backend == "numpy"
+                    else qdrant_mode != "memory"
+                )
+                self.lexical = LexicalIndex(db_path=sqlite_db_path if persistent else ":memory:")
+                if self.lexical.count() == 0:
+                    # First start against an existing store; later starts reuse the postings
+                    for batch in self.semantic.iter_contents():
+                        self.lexical.add_many(batch)
+            self.reranker = RelevanceReranker(ranking_weights) if rerank_enabled else None
+            self.rerank_overfetch = max(1 , rerank_overfetch)
         
         def get_all_memories(self , session_id:str) -> List[MemoryUnit]:
-            all_memories = []
-            all_memories.extend(self.working.get_active(session_id))
-            all_memories.extend(self.episodic.get_session_timeline(session_id))
-            all_memories.extend(self.semantic.get_by_scope(MemoryScope.SESSION))
-            return all_memories
\ No newline at end of file
+            return self.get_policy_snapshot(session_id)[0]
+
+        def get_policy_snapshot(
+            self,
+            session_id:str
+        ) -> Tuple[List[MemoryUnit] , ContradictionIndexGroup]:
+            session_memories , session_index = self.get_session_snapshot(session_id)
+            semantic_memories , semantic_index = self.get_semantic_snapshot()
+            return (
+                session_memories + semantic_memories,
+                ContradictionIndexGroup([session_index , semantic_index])
+            )
+
+        # The two halves of the policy snapshot, for callers that run each
+        # under its own store's stage
+
+        def get_session_snapshot(self , session_id: str) -> Tuple[List[MemoryUnit] , ContradictionIndex]:
+            return self.snapshots.get_session(
+                session_id,
+                lambda: (
+                    self.working.get_active(session_id),
+                    self.episodic.get_session_timeline(session_id)
+                )
+            )
+
+        def get_semantic_snapshot(self) -> Tuple[List[MemoryUnit] , ContradictionIndex]:
+            return self.snapshots.get_semantic(
+                lambda: self.semantic.get_by_scope(MemoryScope.SESSION , include_embeddings=True)
+            )
+
+        # Grouped writes: one store call per batch, mirrored into the snapshots
+
+        def write_working(self , entries: List[Tuple[MemoryUnit , int]]):
+            self.working.add_many(entries)
+            for memory_unit, ttl_seconds in entries:
+                self.snapshots.record_write(memory_unit , "working" , ttl_seconds=ttl_seconds)
+
+        def write_episodic(self , events: List[Tuple[MemoryUnit , str]]):
+            self.episodic.add_many(events)
+            for memory_unit, _ in events:
+                self.snapshots.record_write(memory_unit , "episodic")
+
+        def write_semantic(self , items: List[Tuple[MemoryUnit , List[float]]]):
+            self.semantic.add_many(items)
+            if self.lexical is not None:
+                self.lexical.add_many(
+                    (memory_unit.id , memory_unit.content , memory_unit.project_id , memory_unit.scope)
+                    for memory_unit, _ in items
+                )
+            for memory_unit, embedding in items:
+                self.snapshots.record_write(memory_unit , "semantic" , embedding=embedding)
+
+        def repeat_episodic(self , memory_ids: List[str]):
+            self.episodic.add_repeats(memory_ids)
+
+        def reinforce_semantic(self , memory_ids: List[str]):
+            # Cached copies keep their old confidence; the lifecycle change keeps them live
+            self.semantic.reinforce_many(memory_ids)
+
+        def deprecate_semantic(self , memory_ids: List[str]):
+            self.semantic.deprecate_many(memory_ids)
+            if self.lexical is not None:
+                self.lexical.remove_many(memory_ids)
+            for memory_id in memory_ids:
+                self.snapshots.record_deprecation(memory_id)
+
+        def compact_semantic(self):
+            if self.semantic.compaction_due():
+                self.semantic.compact()
+
+        def search_semantic(
+            self,
+            query: str,
+            query_embedding: Optional[List[float]],
+            top_k: int = 10,
+            mode: str = "hybrid",
+            scope_filter: Optional[List[MemoryScope]] = None,
+            type_filter: Optional[List[MemoryType]] = None,
+            min_confidence: float = 0.5,
+            rrf_k: int = 60,
+            project_id: Optional[str] = None,
+            include_global: bool = False,
+            ranking_weights: Optional[RankingWeights] = None
+        ) -> List[MemoryUnit]:
+            """Semantic retrieval by ``mode``: "vector" (dense search),
+            "lexical" (BM25 over the inverted index) or "hybrid" (both lists
+            fused by reciprocal rank). Each list is over-fetched so the fused
+            top ``top_k`` can draw from either. ``project_id`` restricts
+            results to that project, plus global-scope memories when
+            ``include_global``. With re-ranking on, candidates are re-ordered
+            by ``ranking_weights`` (the manager's defaults when unset)."""
+            return self.search_semantic_candidates(
+                query,
+                query_embedding,
+                top_k=top_k,
+                mode=mode,
+                scope_filter=scope_filter,
+                type_filter=type_filter,
+                min_confidence=min_confidence,
+                rrf_k=rrf_k,
+                project_id=project_id,
+                include_global=include_global,
+                ranking_weights=ranking_weights
+            )[0]
+
+        def search_semantic_candidates(
+            self,
+            query: str,
+            query_embedding: Optional[List[float]],
+            top_k: int = 10,
+            mode: str = "hybrid",
+            scope_filter: Optional[List[MemoryScope]] = None,
+            type_filter: Optional[List[MemoryType]] = None,
+            min_confidence: float = 0.5,
+            rrf_k: int = 60,
+            project_id: Optional[str] = None,
+            include_global: bool = False,
+            ranking_weights: Optional[RankingWeights] = None
+        ) -> Tuple[List[MemoryUnit] , SemanticCandidates]:
+            """``search_semantic``, also returning the candidate lists the
+            results were ranked from, for ``rank_semantic``."""
+            if mode not in ("vector" , "lexical" , "hybrid"):
+                raise ValueError(f"Unknown retrieval mode: {mode}")
+            if self.lexical is None or (mode == "hybrid" and not query):
+                mode = "vector"
+            if query_embedding is None:
+                if mode == "vector":
+                    return [] , SemanticCandidates(query=query , mode=mode , fetch_k=0 , rrf_k=rrf_k)
+                mode = "lexical"
+            # Fusion and re-ranking both choose from an over-fetched candidate list
+            overfetch = self.rerank_overfetch if self.reranker is not None else 1
+            fetch_k = top_k * max(overfetch , 1 if mode == "vector" else 3)
+
+            vector_hits: List[ScoredMemory] = []
+            if mode in ("vector" , "hybrid"):
+                vector_hits = self.semantic.search_scored(
+                    query_embedding,
+                    top_k=fetch_k,
+                    scope_filter=scope_filter,
+                    type_filter=type_filter,
+                    min_confidence=min_confidence,
+                    project_id=project_id,
+                    include_global=include_global
+                )
+
+            lexical_hits: List[ScoredMemory] = []
+            if mode != "vector":
+                lexical_scores = self.lexical.search(
+                    query,
+                    top_k=fetch_k,
+                    project_id=project_id,
+                    include_global=include_global
+                )
+                known = {hit.memory.id: hit for hit in vector_hits}
+                # Lexical hits are resolved through the store, which also applies the filters
+                scopes = {MemoryScope(scope).value for scope in scope_filter} if scope_filter else None
+                types = {MemoryType(mem_type).value for mem_type in type_filter} if type_filter else None
+                missing = [doc_id for doc_id, _ in lexical_scores if doc_id not in known]
+                counts = self.semantic.retrieval_counts(missing) if self.reranker is not None else {}
+                for memory in self.semantic.get_many(missing):
+                    if (memory.confidence >= min_confidence and
+                        (scopes is None or memory.scope in scopes) and
+                        (types is None or memory.type in types) and
+                        (project_id is None or memory.project_id == project_id or
+                         (include_global and memory.scope == MemoryScope.GLOBAL.value))):
+                        known[memory.id] = ScoredMemory(
+                            memory=memory,
+                            score=0.0,
+                            retrieval_count=counts.get(memory.id , 0)
+                        )
+                lexical_hits = [
+                    ScoredMemory(
+                        memory=known[doc_id].memory,
+                        score=score,
+                        retrieval_count=known[doc_id].retrieval_count
+                    )
+                    for doc_id, score in lexical_scores if doc_id in known
+                ]
+
+            candidates = SemanticCandidates(
+                query=query,
+                query_embedding=query_embedding,
+                mode=mode,
+                fetch_k=fetch_k,
+                rrf_k=rrf_k,
+                vector_hits=vector_hits,
+                lexical_hits=lexical_hits
+            )
+            results = self._rank_candidates(candidates , top_k , ranking_weights)
+            self.semantic.record_retrievals([memory.id for memory in results])
+            return results , candidates
+
+        def rank_semantic(
+            self,
+            candidates: SemanticCandidates,
+            top_k: int = 10,
+            extra: Optional[List[Tuple[MemoryUnit , List[float]]]] = None,
+            exclude_ids: Optional[set] = None,
+            ranking_weights: Optional[RankingWeights] = None
+        ) -> List[MemoryUnit]:
+            """Ranks ``candidates`` again with ``extra`` (memory, embedding)
+            pairs inserted into each list by their own cosine similarity or
+            BM25 score, so memories the search could not see compete on the
+            scale of its hits; ``exclude_ids`` are left out."""
+            exclude_ids = exclude_ids or set()
+            vector_hits = [hit for hit in candidates.vector_hits if hit.memory.id not in exclude_ids]
+            lexical_hits = [hit for hit in candidates.lexical_hits if hit.memory.id not in exclude_ids]
+            # Copied: re-ranking sets the relevance score on the memories it ranks
+            extra = [
+                (memory.model_copy() , embedding)
+                for memory, embedding in extra or [] if memory.id not in exclude_ids
+            ]
+            if extra and candidates.mode != "lexical" and candidates.query_embedding is not None:
+                vectors = np.asarray([embedding for _, embedding in extra] , dtype=np.float32)
+                query_vector = np.asarray(candidates.query_embedding , dtype=np.float32)
+                norms = np.linalg.norm(vectors , axis=1) * np.linalg.norm(query_vector)
+                similarities = np.divide(
+                    vectors @ query_vector , norms,
+                    out=np.zeros(len(extra) , dtype=np.float32) , where=norms > 0
+                )
+                vector_hits += [
+                    ScoredMemory(memory=memory , score=float(similarity))
+                    for (memory, _), similarity in zip(extra , similarities)
+                ]
+            if extra and candidates.mode != "vector" and self.lexical is not None:
+                scores = self.lexical.score_texts(candidates.query , [memory.content for memory, _ in extra])
+                # Only documents sharing a query term make the lexical list
+                lexical_hits += [
+                    ScoredMemory(memory=memory , score=score)
+                    for (memory, _), score in zip(extra , scores) if score > 0
+                ]
+            # Stable, so ties keep retrieved hits ahead of the inserted ones
+            candidates = candidates.model_copy(update={
+                "vector_hits": sorted(vector_hits , key=lambda hit: -hit.score),
+                "lexical_hits": sorted(lexical_hits , key=lambda hit: -hit.score)
+            })
+            return self._rank_candidates(candidates , top_k , ranking_weights)
+
+        def _rank_candidates(
+            self,
+            candidates: SemanticCandidates,
+            top_k: int,
+            ranking_weights: Optional[RankingWeights]
+        ) -> List[MemoryUnit]:
+            if candidates.mode == "vector":
+                fused_hits = candidates.vector_hits
+            else:
+                hits = {hit.memory.id: hit for hit in candidates.vector_hits + candidates.lexical_hits}
+                rankings = [[hit.memory.id for hit in candidates.lexical_hits]]
+                if candidates.mode == "hybrid":
+                    rankings.insert(0 , [hit.memory.id for hit in candidates.vector_hits])
+                # Fused scores over the best possible (first in every list), so 1.0 tops the scale
+                best_fused = len(rankings) / (candidates.rrf_k + 1)
+                fused_hits = [
+                    ScoredMemory(
+                        memory=hits[doc_id].memory,
+                        score=fused / best_fused,
+                        retrieval_count=hits[doc_id].retrieval_count
+                    )
+                    for doc_id, fused in reciprocal_rank_fusion(rankings , k=candidates.rrf_k)[:candidates.fetch_k]
+                ]
+
+            if self.reranker is not None:
+                results = self.reranker.rerank(fused_hits , top_k , weights=ranking_weights)
+            else:
+                results = fused_hits[:top_k]
+            return [hit.memory for hit in results]
+
+        def close(self):
+            self.working.close()
+            self.semantic.flush_retrieval_stats()
+            self.episodic.close()
+            self.watermarks.close()
+            if self.lexical is not None:
+                self.lexical.close()
+
+        def health_check(self) -> Dict[str,bool]:
+            try:
+                health = {"working": self.working.ping()}
+            except Exception:
+                health = {"working": False}
+            try:
+                with self.episodic._get_connection() as conn:
+                    conn.execute("SELECT 1")
+                health["episodic"] = True
+            except Exception:
+                health["episodic"] = False
+            try:
+                health["semantic"] = self.semantic.ping()
+            except Exception:
+                health["semantic"] = False
+            return health
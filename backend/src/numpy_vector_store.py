@@ -0,0 +1,640 @@
+from typing import Optional , List , Dict , Iterator , Tuple
+from datetime import datetime , timezone
+import numpy as np
+import threading
+import json
+import os
+
+from src.dedup import LIVE_LIFECYCLES , content_hash
+from src.Schemas import (
+    MemoryUnit , MemoryScope , MemoryType , MemoryLifecycle , ScoredMemory
+)
+
+SCOPE_CODES = {scope.value: code for code, scope in enumerate(MemoryScope)}
+TYPE_CODES = {mem_type.value: code for code, mem_type in enumerate(MemoryType)}
+LIFECYCLE_CODES = {lifecycle.value: code for code, lifecycle in enumerate(MemoryLifecycle)}
+SCOPES = list(MemoryScope)
+TYPES = list(MemoryType)
+LIFECYCLES = list(MemoryLifecycle)
+LIVE_LIFECYCLE_CODES = [LIFECYCLE_CODES[lifecycle] for lifecycle in LIVE_LIFECYCLES]
+
+COLUMN_DTYPE = np.dtype([
+    ("confidence" , "<f4"),
+    ("scope" , "u1"),
+    ("type" , "u1"),
+    ("lifecycle" , "u1"),
+    ("created_at" , "<f8"),
+    ("updated_at" , "<f8"),
+    ("retrieval_count" , "<u4"),
+    ("last_retrieved" , "<f8"),
+])
+
+def _timestamp(value: datetime) -> float:
+    return value.timestamp()
+
+def _datetime(value: float) -> datetime:
+    return datetime.fromtimestamp(float(value) , tz=timezone.utc)
+
+class NumpySemanticMemoryStore:
+    """Single-node semantic store backed by a contiguous float32 matrix.
+
+    Row ``i`` of the (memory-mapped) vector matrix and of the structured
+    column array describe the same memory; text payloads live in an
+    append-only JSONL sidecar. Search is one matmul plus ``argpartition``
+    over boolean filter masks; when the filters (typically a project
+    partition) leave a small share of rows, only those rows are scored.
+    Project ids are interned to int32 codes (0 for none) in an in-memory
+    column rebuilt from the payloads. ``deprecate`` is a soft delete; deprecated
+    rows are dropped by ``compact``, a maintenance step the caller runs off
+    the write path once ``compaction_due`` reports they make up
+    ``compaction_ratio`` of the index.
+
+    On disk, ``meta.json`` names the current generation of the three data
+    files. Compaction writes a new generation and switches to it by
+    replacing ``meta.json``, so a crash leaves one whole generation.
+    """
+    def __init__(
+        self,
+        vector_size: int = 384,
+        path: Optional[str] = None,
+        initial_capacity: int = 1024,
+        compaction_ratio: float = 0.25,
+        min_compaction_rows: int = 256
+    ):
+        self.vector_size = vector_size
+        self.path = path
+        self.compaction_ratio = compaction_ratio
+        self.min_compaction_rows = min_compaction_rows
+        self._lock = threading.RLock()
+        self._count = 0
+        self._deprecated = 0
+        self._ids: List[str] = []
+        self._payloads: List[dict] = []
+        self._row_of: Dict[str,int] = {}
+        # content hash -> latest row written with it (may since be deprecated)
+        self._row_of_hash: Dict[str,int] = {}
+        self._project_codes: Dict[str,int] = {}
+        self._generation = 0
+
+        if path:
+            os.makedirs(path , exist_ok=True)
+            self._load(initial_capacity)
+        else:
+            self._capacity = initial_capacity
+            self._vectors = np.zeros((initial_capacity , vector_size) , dtype=np.float32)
+            self._columns = np.zeros(initial_capacity , dtype=COLUMN_DTYPE)
+            self._projects = np.zeros(initial_capacity , dtype=np.int32)
+
+    # -- persistence ---------------------------------------------------
+
+    def _file(self , name: str) -> str:
+        return os.path.join(self.path , name)
+
+    def _data_file(self , name: str , generation: Optional[int] = None) -> str:
+        # Generation 0 keeps the unversioned names of indexes from before compaction swaps
+        generation = self._generation if generation is None else generation
+        if generation == 0:
+            return self._file(name)
+        stem , extension = name.split(".")
+        return self._file(f"{stem}.{generation}.{extension}")
+
+    def _open_memmaps(self):
+        self._vectors = np.memmap(
+            self._data_file("vectors.f32") , dtype=np.float32 , mode="r+",
+            shape=(self._capacity , self.vector_size)
+        )
+        self._columns = np.memmap(
+            self._data_file("columns.bin") , dtype=COLUMN_DTYPE , mode="r+",
+            shape=(self._capacity,)
+        )
+
+    def _size_files(self , capacity: int , generation: Optional[int] = None):
+        with open(self._data_file("vectors.f32" , generation) , "ab") as f:
+            f.truncate(capacity * self.vector_size * 4)
+        with open(self._data_file("columns.bin" , generation) , "ab") as f:
+            f.truncate(capacity * COLUMN_DTYPE.itemsize)
+
+    def _remove_other_generations(self):
+        # Old generations after a compaction, or a new one a crash left unreferenced
+        for name in os.listdir(self.path):
+            parts = name.split(".")
+            if (len(parts) == 3 and parts[0] in ("vectors" , "columns" , "payloads")
+                    and parts[1].isdigit() and int(parts[1]) != self._generation):
+                os.remove(self._file(name))
+        if self._generation != 0:
+            for name in ("vectors.f32" , "columns.bin" , "payloads.jsonl"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+
+    def _load(self , initial_capacity: int):
+        meta_path = self._file("meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("vector_size" , self.vector_size) != self.vector_size:
+                raise ValueError(
+                    f"Index at {self.path} has vector size {meta['vector_size']}, "
+                    f"expected {self.vector_size}"
+                )
+        self._generation = meta.get("generation" , 0)
+        if meta.get("count" , 0) and not all(
+            os.path.exists(self._data_file(name))
+            for name in ("vectors.f32" , "columns.bin" , "payloads.jsonl")
+        ):
+            raise ValueError(
+                f"Index at {self.path} is missing data files of generation {self._generation}"
+            )
+        self._remove_other_generations()
+
+        payloads_path = self._data_file("payloads.jsonl")
+        if os.path.exists(payloads_path):
+            with open(payloads_path , encoding="utf-8") as f:
+                self._payloads = [json.loads(line) for line in f if line.strip()]
+
+        # A crash between the payload append and the meta write leaves extra lines
+        self._count = min(meta.get("count" , 0) , len(self._payloads))
+        if len(self._payloads) > self._count:
+            self._payloads = self._payloads[:self._count]
+            with open(payloads_path , "w" , encoding="utf-8") as f:
+                for payload in self._payloads:
+                    f.write(json.dumps(payload) + "\n")
+        self._ids = [payload["id"] for payload in self._payloads]
+        self._row_of = {memory_id: row for row, memory_id in enumerate(self._ids)}
+        self._index_hashes()
+
+        self._capacity = max(meta.get("capacity" , 0) , initial_capacity , self._count)
+        self._size_files(self._capacity)
+        self._open_memmaps()
+        self._projects = np.zeros(self._capacity , dtype=np.int32)
+        self._index_projects()
+        lifecycle = self._columns["lifecycle"][:self._count]
+        self._deprecated = int(np.count_nonzero(
+            lifecycle == LIFECYCLE_CODES[MemoryLifecycle.DEPRECATED.value]
+        ))
+
+    def _index_hashes(self):
+        # Payloads written before write-path dedup carry no hash
+        self._row_of_hash = {
+            payload["content_hash"]: row
+            for row, payload in enumerate(self._payloads)
+            if payload.get("content_hash")
+        }
+
+    def _project_code(self , project_id: Optional[str]) -> int:
+        if not project_id:
+            return 0
+        code = self._project_codes.get(project_id)
+        if code is None:
+            code = self._project_codes[project_id] = len(self._project_codes) + 1
+        return code
+
+    def _index_projects(self):
+        # Payloads written before project partitions carry no project
+        self._projects[:self._count] = [
+            self._project_code(payload.get("project_id")) for payload in self._payloads
+        ]
+
+    def _write_meta(self):
+        if not self.path:
+            return
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path , "w") as f:
+            json.dump({
+                "count": self._count,
+                "capacity": self._capacity,
+                "vector_size": self.vector_size,
+                "generation": self._generation
+            } , f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path , self._file("meta.json"))
+
+    def flush(self):
+        with self._lock:
+            if self.path:
+                self._vectors.flush()
+                self._columns.flush()
+                self._write_meta()
+
+    def _grow(self , needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        if self.path:
+            self._vectors.flush()
+            self._columns.flush()
+            del self._vectors , self._columns
+            self._size_files(capacity)
+            self._capacity = capacity
+            self._open_memmaps()
+        else:
+            vectors = np.zeros((capacity , self.vector_size) , dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            columns = np.zeros(capacity , dtype=COLUMN_DTYPE)
+            columns[:self._count] = self._columns[:self._count]
+            self._vectors , self._columns , self._capacity = vectors , columns , capacity
+        projects = np.zeros(capacity , dtype=np.int32)
+        projects[:self._count] = self._projects[:self._count]
+        self._projects = projects
+
+    # -- writes --------------------------------------------------------
+
+    def add(self , memory_unit: MemoryUnit , embedding: List[float]):
+        self.add_many([(memory_unit , embedding)])
+
+    def add_many(self , items: List[Tuple[MemoryUnit , List[float]]]):
+        if not items:
+            return
+        vectors = np.asarray([embedding for _, embedding in items] , dtype=np.float32)
+        norms = np.linalg.norm(vectors , axis=1 , keepdims=True)
+        vectors = np.divide(vectors , norms , out=vectors , where=norms > 0)
+        payloads = [
+            {
+                "id": memory_unit.id,
+                "content": memory_unit.content,
+                "source_session": memory_unit.source_session,
+                "project_id": memory_unit.project_id,
+                "metadata": memory_unit.metadata,
+                "content_hash": content_hash(memory_unit)
+            }
+            for memory_unit, _ in items
+        ]
+
+        with self._lock:
+            self._grow(self._count + len(items))
+            start = self._count
+            for offset, (memory_unit, _) in enumerate(items):
+                previous_row = self._row_of.get(memory_unit.id)
+                if previous_row is not None:
+                    # Upserts soft-delete the old row so the payload log stays append-only
+                    self._soft_delete(previous_row)
+                row = start + offset
+                self._ids.append(memory_unit.id)
+                self._payloads.append(payloads[offset])
+                self._row_of[memory_unit.id] = row
+                self._row_of_hash[payloads[offset]["content_hash"]] = row
+                self._projects[row] = self._project_code(memory_unit.project_id)
+                self._columns[row] = (
+                    memory_unit.confidence,
+                    SCOPE_CODES[MemoryScope(memory_unit.scope).value],
+                    TYPE_CODES[MemoryType(memory_unit.type).value],
+                    LIFECYCLE_CODES[MemoryLifecycle(memory_unit.lifecycle).value],
+                    _timestamp(memory_unit.created_at),
+                    _timestamp(memory_unit.updated_at),
+                    0,
+                    0.0
+                )
+            self._vectors[start:start + len(items)] = vectors
+            self._count += len(items)
+            if self.path:
+                with open(self._data_file("payloads.jsonl") , "a" , encoding="utf-8") as f:
+                    f.writelines(json.dumps(payload) + "\n" for payload in payloads)
+                # Rows reach disk before the meta count that covers them
+                self._vectors.flush()
+                self._columns.flush()
+            self._write_meta()
+
+    def deprecate(self , memory_id: str):
+        self.deprecate_many([memory_id])
+
+    def deprecate_many(self , memory_ids: List[str]):
+        now = datetime.now(timezone.utc).timestamp()
+        with self._lock:
+            for memory_id in memory_ids:
+                row = self._row_of.get(memory_id)
+                if row is None:
+                    continue
+                self._soft_delete(row)
+                self._columns["updated_at"][row] = now
+
+    def compaction_due(self) -> bool:
+        # Two counter reads, so callers on the event loop don't wait on the lock
+        return (
+            self._count >= self.min_compaction_rows and
+            self._deprecated >= self.compaction_ratio * self._count
+        )
+
+    def _soft_delete(self , row: int):
+        deprecated_code = LIFECYCLE_CODES[MemoryLifecycle.DEPRECATED.value]
+        if self._columns["lifecycle"][row] != deprecated_code:
+            self._columns["lifecycle"][row] = deprecated_code
+            self._deprecated += 1
+
+    def reinforce(self , memory_id: str , confidence_boost: float = 0.1):
+        self.reinforce_many([memory_id] , confidence_boost)
+
+    def reinforce_many(self , memory_ids: List[str] , confidence_boost: float = 0.1):
+        now = datetime.now(timezone.utc).timestamp()
+        with self._lock:
+            for memory_id in memory_ids:
+                row = self._row_of.get(memory_id)
+                if row is None:
+                    continue
+                if self._columns["lifecycle"][row] == LIFECYCLE_CODES[MemoryLifecycle.DEPRECATED.value]:
+                    self._deprecated -= 1
+                self._columns["confidence"][row] = min(1.0 , float(self._columns["confidence"][row]) + confidence_boost)
+                self._columns["lifecycle"][row] = LIFECYCLE_CODES[MemoryLifecycle.REINFORCED.value]
+                self._columns["updated_at"][row] = now
+
+    def compact(self):
+        with self._lock:
+            n = self._count
+            keep = self._columns["lifecycle"][:n] != LIFECYCLE_CODES[MemoryLifecycle.DEPRECATED.value]
+            kept_rows = np.flatnonzero(keep)
+            new_count = len(kept_rows)
+            if new_count == n:
+                return
+
+            vectors = np.array(self._vectors[kept_rows])
+            columns = np.array(self._columns[kept_rows])
+            projects = self._projects[kept_rows]
+            payloads = [self._payloads[row] for row in kept_rows]
+
+            if self.path:
+                self._write_generation(self._generation + 1 , vectors , columns , payloads)
+            else:
+                self._vectors[:new_count] = vectors
+                self._columns[:new_count] = columns
+            self._projects[:new_count] = projects
+            self._payloads = payloads
+            self._ids = [payload["id"] for payload in self._payloads]
+            self._row_of = {memory_id: row for row, memory_id in enumerate(self._ids)}
+            self._index_hashes()
+            self._count = new_count
+            self._deprecated = 0
+            if self.path:
+                self._write_meta()
+                self._remove_other_generations()
+
+    def _write_generation(
+        self,
+        generation: int,
+        vectors: np.ndarray,
+        columns: np.ndarray,
+        payloads: List[dict]
+    ):
+        """Writes the compacted rows to the data files of ``generation`` and
+        maps them. The caller's meta write is what makes it current."""
+        self._size_files(self._capacity , generation)
+        new_vectors = np.memmap(
+            self._data_file("vectors.f32" , generation) , dtype=np.float32 , mode="r+",
+            shape=(self._capacity , self.vector_size)
+        )
+        new_columns = np.memmap(
+            self._data_file("columns.bin" , generation) , dtype=COLUMN_DTYPE , mode="r+",
+            shape=(self._capacity,)
+        )
+        new_vectors[:len(vectors)] = vectors
+        new_columns[:len(columns)] = columns
+        new_vectors.flush()
+        new_columns.flush()
+        with open(self._data_file("payloads.jsonl" , generation) , "w" , encoding="utf-8") as f:
+            f.writelines(json.dumps(payload) + "\n" for payload in payloads)
+            f.flush()
+            os.fsync(f.fileno())
+        del self._vectors , self._columns
+        self._vectors , self._columns = new_vectors , new_columns
+        self._generation = generation
+
+    # -- reads ---------------------------------------------------------
+
+    def _filter_mask(
+        self,
+        min_confidence: float,
+        scope_filter: Optional[list],
+        type_filter: Optional[list],
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> np.ndarray:
+        columns = self._columns[:self._count]
+        mask = np.isin(columns["lifecycle"] , LIVE_LIFECYCLE_CODES)
+        if project_id is not None:
+            code = self._project_codes.get(project_id , -1)
+            partition = self._projects[:self._count] == code
+            if include_global:
+                partition |= columns["scope"] == SCOPE_CODES[MemoryScope.GLOBAL.value]
+            mask &= partition
+        mask &= columns["confidence"] >= np.float32(min_confidence)
+        if scope_filter:
+            codes = [SCOPE_CODES[MemoryScope(scope).value] for scope in scope_filter]
+            mask &= np.isin(columns["scope"] , codes)
+        if type_filter:
+            codes = [TYPE_CODES[MemoryType(mem_type).value] for mem_type in type_filter]
+            mask &= np.isin(columns["type"] , codes)
+        return mask
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10 ,
+        scope_filter: Optional[List[MemoryScope]] = None ,
+        type_filter: Optional[List[MemoryType]] = None ,
+        min_confidence: float = 0.5,
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> List[MemoryUnit]:
+        hits = self.search_scored(
+            query_embedding,
+            top_k=top_k,
+            scope_filter=scope_filter,
+            type_filter=type_filter,
+            min_confidence=min_confidence,
+            project_id=project_id,
+            include_global=include_global
+        )
+        self.record_retrievals([hit.memory.id for hit in hits])
+        return [hit.memory for hit in hits]
+
+    def search_scored(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10 ,
+        scope_filter: Optional[List[MemoryScope]] = None ,
+        type_filter: Optional[List[MemoryType]] = None ,
+        min_confidence: float = 0.5,
+        project_id: Optional[str] = None,
+        include_global: bool = False
+    ) -> List[ScoredMemory]:
+        """Hits with their cosine similarity and retrieval count, best
+        first. Unlike ``search`` this records no retrievals."""
+        query = np.asarray(query_embedding , dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        with self._lock:
+            if self._count == 0 or top_k <= 0:
+                return []
+            mask = self._filter_mask(
+                min_confidence , scope_filter , type_filter , project_id , include_global
+            )
+            candidates = int(np.count_nonzero(mask))
+            if candidates == 0:
+                return []
+
+            k = min(top_k , candidates)
+            if candidates * 4 <= self._count:
+                # Small partition: gather and score only its rows
+                rows = np.flatnonzero(mask)
+                scores = self._vectors[rows] @ query
+                top = np.argpartition(-scores , k - 1)[:k]
+                top = top[np.argsort(-scores[top] , kind="stable")]
+                top_scores , top = scores[top] , rows[top]
+            else:
+                scores = self._vectors[:self._count] @ query
+                scores = np.where(mask , scores , -np.inf)
+                top = np.argpartition(-scores , k - 1)[:k]
+                top = top[np.argsort(-scores[top] , kind="stable")]
+                top_scores = scores[top]
+
+            counts = self._columns["retrieval_count"][top]
+            return [
+                ScoredMemory(
+                    memory=self._row_to_memory_unit(int(row)),
+                    score=float(score),
+                    retrieval_count=int(count)
+                )
+                for row, score, count in zip(top , top_scores , counts)
+            ]
+
+    def record_retrievals(self , memory_ids: List[str]):
+        now = datetime.now(timezone.utc).timestamp()
+        with self._lock:
+            rows = [self._row_of[memory_id] for memory_id in memory_ids if memory_id in self._row_of]
+            self._columns["retrieval_count"][rows] += 1
+            self._columns["last_retrieved"][rows] = now
+
+    def retrieval_counts(self , memory_ids: List[str]) -> Dict[str,int]:
+        with self._lock:
+            return {
+                memory_id: int(self._columns["retrieval_count"][self._row_of[memory_id]])
+                for memory_id in memory_ids if memory_id in self._row_of
+            }
+
+    def get_by_scope(
+        self,
+        scope: MemoryScope,
+        include_embeddings: bool = False
+    ) -> List[MemoryUnit]:
+        with self._lock:
+            mask = self._filter_mask(0.0 , [scope] , None)
+            rows = np.flatnonzero(mask)[:1000]
+            memories = [self._row_to_memory_unit(int(row)) for row in rows]
+            if include_embeddings:
+                for memory, row in zip(memories , rows):
+                    memory.embedding = self._vectors[row].tolist()
+            return memories
+
+    def get_many(self , memory_ids: List[str]) -> List[MemoryUnit]:
+        """Live memories among ``memory_ids``, in the order given."""
+        with self._lock:
+            memories = []
+            for memory_id in memory_ids:
+                row = self._row_of.get(memory_id)
+                if row is not None and self._columns["lifecycle"][row] in LIVE_LIFECYCLE_CODES:
+                    memories.append(self._row_to_memory_unit(row))
+            return memories
+
+    def iter_contents(
+        self,
+        batch_size: int = 512
+    ) -> Iterator[List[Tuple[str , str , Optional[str] , str]]]:
+        """(id, content, project_id, scope) of every live memory, in batches."""
+        with self._lock:
+            rows = np.flatnonzero(np.isin(self._columns["lifecycle"][:self._count] , LIVE_LIFECYCLE_CODES))
+            contents = [
+                (
+                    self._ids[row],
+                    self._payloads[row]["content"],
+                    self._payloads[row].get("project_id"),
+                    SCOPES[self._columns["scope"][row]].value
+                )
+                for row in rows
+            ]
+        for start in range(0 , len(contents) , batch_size):
+            yield contents[start:start + batch_size]
+
+    def find_by_content_hashes(self , hashes: List[str]) -> Dict[str,str]:
+        """Maps each hash held by a live memory to that memory's id."""
+        found = {}
+        with self._lock:
+            for digest in hashes:
+                row = self._row_of_hash.get(digest)
+                if row is not None and self._columns["lifecycle"][row] in LIVE_LIFECYCLE_CODES:
+                    found[digest] = self._ids[row]
+        return found
+
+    def find_nearest(
+        self,
+        embeddings: List[List[float]],
+        memory_types: List[MemoryType],
+        min_similarity: float,
+        project_ids: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[ScoredMemory]]:
+        """The most similar live memory of the same type (and project, when
+        ``project_ids`` is given) for each embedding, if its cosine
+        similarity is at least ``min_similarity``."""
+        if not embeddings:
+            return []
+        queries = np.asarray(embeddings , dtype=np.float32)
+        norms = np.linalg.norm(queries , axis=1 , keepdims=True)
+        queries = np.divide(queries , norms , out=queries , where=norms > 0)
+        type_codes = np.asarray([TYPE_CODES[MemoryType(memory_type).value] for memory_type in memory_types])
+
+        with self._lock:
+            if self._count == 0:
+                return [None] * len(embeddings)
+            columns = self._columns[:self._count]
+            live = np.isin(columns["lifecycle"] , LIVE_LIFECYCLE_CODES)
+            # One matmul for the whole batch, masked to live rows of each query's type
+            scores = queries @ self._vectors[:self._count].T
+            mask = live[None, :] & (columns["type"][None, :] == type_codes[:, None])
+            if project_ids is not None:
+                project_codes = np.asarray([
+                    self._project_codes.get(project_id , -1) if project_id else 0
+                    for project_id in project_ids
+                ])
+                mask &= self._projects[:self._count][None, :] == project_codes[:, None]
+            scores = np.where(mask , scores , -np.inf)
+            best = np.argmax(scores , axis=1)
+            best_scores = scores[np.arange(len(embeddings)) , best]
+            return [
+                ScoredMemory(memory=self._row_to_memory_unit(int(row)) , score=float(score))
+                if score >= min_similarity else None
+                for row, score in zip(best , best_scores)
+            ]
+
+    def _row_to_memory_unit(self , row: int) -> MemoryUnit:
+        columns = self._columns[row]
+        payload = self._payloads[row]
+        return MemoryUnit(
+            id=payload['id'],
+            type=TYPES[columns['type']],
+            content=payload['content'],
+            scope=SCOPES[columns['scope']],
+            # Undo float32 noise so 0.9 reads back as 0.9
+            confidence=min(1.0 , max(0.0 , round(float(columns['confidence']) , 6))),
+            lifecycle=LIFECYCLES[columns['lifecycle']],
+            source_session=payload['source_session'],
+            project_id=payload.get('project_id'),
+            created_at=_datetime(columns['created_at']),
+            updated_at=_datetime(columns['updated_at']),
+            metadata=payload.get('metadata',{})
+        )
+
+    # Retrieval stats are written straight into the column array
+    def retrieval_flush_due(self) -> bool:
+        return False
+
+    def flush_retrieval_stats(self):
+        self.flush()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count - self._deprecated
+
+    def ping(self) -> bool:
+        return True
@@ -1,112 +1,291 @@
-from typing import List , Optional
+from typing import List , Optional , Dict , Tuple
 from datetime import datetime , timezone
 import traceback
+import asyncio
 
 from src.Schemas import (
     ConversationInput, MemoryLifecycle, ProcessConversationResponse,
     ContextState, LLMProvider, RenderRequest,
-    PolicyDecision, MemoryUnit, MemoryType
+    PolicyDecision, MemoryUnit, MemoryType, ExtractionResult, RankingWeights,
+    RenderResult, ContextResponse, SemanticCandidates
 )
 from src.memory_stores import MemoryStoreManager
 from src.policy_engine import MemoryPolicyEngine
 from src.extractor_service import MemoryExtractor
 from src.context_composer import ContextComposer, ProviderRenderer
+from src.concurrency import StageExecutor
+from src.embedding_batcher import EmbeddingMicroBatcher
+from src.extraction_watermarks import conversation_turn_hashes , incremental_input
+from src.dedup import batch_near_duplicates , content_hash
+from src.token_budget import TokenCounter
+from src.write_behind import WriteBehindQueue
+from src.contradiction_index import ContradictionIndexGroup
+
+# Per-store retrieval timeouts in seconds; semantic includes embedding the query
+DEFAULT_RETRIEVAL_TIMEOUTS: Dict[str,float] = {
+    "working": 1.0,
+    "episodic": 2.0,
+    "semantic": 10.0,
+}
 
 class ContextOrchestrator:
     def __init__(
         self,
         groq_api_key: str = None,
         sqlite_db_path: str = "episodic_memory.db",
+        sqlite_pool_size: int = 4,
         # Qdrant config
         qdrant_host: str = "localhost",
         qdrant_port: int = 6333,
         qdrant_collection: str = "semantic_memory",
-        vector_size: int = 384
+        vector_size: int = 384,
+        qdrant_mode: str = "memory",
+        qdrant_grpc_port: int = 6334,
+        qdrant_url: Optional[str] = None,
+        qdrant_path: Optional[str] = None,
+        qdrant_api_key: Optional[str] = None,
+        qdrant_timeout: int = 10,
+        qdrant_max_retries: int = 3,
+        semantic_backend: str = "qdrant",
+        numpy_index_path: Optional[str] = None,
+        snapshot_max_sessions: int = 1024,
+        snapshot_ttl_seconds: float = 60.0,
+        retrieval_flush_interval: float = 5.0,
+        retrieval_flush_threshold: int = 256,
+        working_backend: str = "memory",
+        working_max_entries: int = 10000,
+        working_sweep_interval: float = 60.0,
+        redis_url: str = "redis://localhost:6379/0",
+        # Execution config
+        executor_max_workers: Optional[int] = None,
+        stage_limits: Optional[Dict[str,int]] = None,
+        # Cross-request embedding micro-batching (disabled when max wait is 0)
+        embedding_batch_max_size: int = 64,
+        embedding_batch_max_wait_ms: float = 0.0,
+        # Embedding cache config (max bytes of 0 disables the cache)
+        embedding_cache_max_bytes: int = 32 * 1024 * 1024,
+        embedding_cache_path: Optional[str] = None,
+        # Extraction cache config (max entries of 0 disables the cache)
+        extraction_cache_max_entries: int = 1024,
+        extraction_cache_ttl_seconds: float = 24 * 3600,
+        extraction_cache_path: Optional[str] = None,
+        # Policy rules file (JSON/YAML); the built-in rules are used when unset
+        policy_rules_path: Optional[str] = None,
+        policy_reload_interval: float = 1.0,
+        # Stream the extraction completion and store units as they are parsed
+        extraction_streaming: bool = False,
+        # Write-path dedup: repeats reinforce the stored memory instead of adding one
+        dedup_enabled: bool = True,
+        dedup_similarity_threshold: float = 0.95,
+        # Context packing: tokenizer (hub name or local tokenizer.json) and
+        # per-provider token budgets; counts fall back to a heuristic
+        tokenizer_name: Optional[str] = None,
+        tokenizer_path: Optional[str] = None,
+        token_budgets: Optional[Dict[str,int]] = None,
+        # Semantic retrieval: "vector", "lexical" (BM25) or "hybrid" (rank-fused)
+        retrieval_mode: str = "hybrid",
+        # Project-scoped retrieval also returns global-scope memories of other projects
+        include_global_scope: bool = True,
+        # Semantic hits are re-ranked by similarity, recency, confidence and
+        # reinforcement, from rerank_overfetch x top_k candidates
+        rerank_enabled: bool = True,
+        ranking_weights: Optional[RankingWeights] = None,
+        rerank_overfetch: int = 3,
+        # Seconds each store's retrieval may take before the context is
+        # rendered without it; 0 waits indefinitely
+        retrieval_timeouts: Optional[Dict[str,float]] = None,
+        # Durable write-behind: writes are journaled (in write_behind_path,
+        # default the SQLite db) and applied in batches by a background worker
+        write_behind_enabled: bool = False,
+        write_behind_path: Optional[str] = None,
+        write_behind_batch_size: int = 256,
+        write_behind_max_attempts: int = 8
     ):
         self.memory_store = MemoryStoreManager(
             sqlite_db_path=sqlite_db_path,
+            sqlite_pool_size=sqlite_pool_size,
             qdrant_host=qdrant_host,
             qdrant_port=qdrant_port,
             qdrant_collection=qdrant_collection,
-            vector_size=vector_size
+            vector_size=vector_size,
+            retrieval_flush_interval=retrieval_flush_interval,
+            retrieval_flush_threshold=retrieval_flush_threshold,
+            working_backend=working_backend,
+            working_max_entries=working_max_entries,
+            working_sweep_interval=working_sweep_interval,
+            redis_url=redis_url,
+            qdrant_mode=qdrant_mode,
+            qdrant_grpc_port=qdrant_grpc_port,
+            qdrant_url=qdrant_url,
+            qdrant_path=qdrant_path,
+            qdrant_api_key=qdrant_api_key,
+            qdrant_timeout=qdrant_timeout,
+            qdrant_max_retries=qdrant_max_retries,
+            semantic_backend=semantic_backend,
+            numpy_index_path=numpy_index_path,
+            snapshot_max_sessions=snapshot_max_sessions,
+            snapshot_ttl_seconds=snapshot_ttl_seconds,
+            rerank_enabled=rerank_enabled,
+            ranking_weights=ranking_weights,
+            rerank_overfetch=rerank_overfetch
+        )
+        self.token_counter = TokenCounter(
+            tokenizer_name=tokenizer_name,
+            tokenizer_path=tokenizer_path
+        )
+        self.policy_engine = MemoryPolicyEngine(
+            rules_path=policy_rules_path,
+            reload_interval=policy_reload_interval,
+            token_counter=self.token_counter
+        )
+        stage_limits = dict(stage_limits or {})
+        if semantic_backend == "numpy" or qdrant_mode in ("http" , "grpc"):
+            # A remote server or the locked numpy index handle concurrent calls;
+            # the local qdrant client does not
+            stage_limits.setdefault("semantic" , 8)
+        self.executor = StageExecutor(
+            max_workers=executor_max_workers,
+            stage_limits=stage_limits
         )
-        self.policy_engine = MemoryPolicyEngine()
-        self.extractor = MemoryExtractor(api_key=groq_api_key)
+        self.extractor = MemoryExtractor(
+            api_key=groq_api_key,
+            embedding_cache_max_bytes=embedding_cache_max_bytes,
+            embedding_cache_path=embedding_cache_path,
+            extraction_cache_max_entries=extraction_cache_max_entries,
+            extraction_cache_ttl_seconds=extraction_cache_ttl_seconds,
+            extraction_cache_path=extraction_cache_path,
+            executor=self.executor
+        )
+        self.extraction_streaming = extraction_streaming
+        if retrieval_mode not in ("vector" , "lexical" , "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+        self.retrieval_mode = retrieval_mode
+        self.include_global_scope = include_global_scope
+        self.retrieval_timeouts = {**DEFAULT_RETRIEVAL_TIMEOUTS , **(retrieval_timeouts or {})}
+        self.dedup_enabled = dedup_enabled
+        self.dedup_similarity_threshold = dedup_similarity_threshold
+        self.dedup_stats = {"semantic_reinforced": 0 , "episodic_repeated": 0}
         self.composer = ContextComposer()
-        self.renderer = ProviderRenderer()
+        self.renderer = ProviderRenderer(
+            token_counter=self.token_counter,
+            token_budgets=token_budgets
+        )
+        self._background_tasks: set = set()
+        self._compaction_task: Optional[asyncio.Future] = None
+        self.write_behind: Optional[WriteBehindQueue] = None
+        if write_behind_enabled:
+            self.write_behind = WriteBehindQueue(
+                memory_store=self.memory_store,
+                executor=self.executor,
+                journal_path=write_behind_path or sqlite_db_path,
+                batch_size=write_behind_batch_size,
+                max_attempts=write_behind_max_attempts
+            )
+        self.embedding_batcher: Optional[EmbeddingMicroBatcher] = None
+        if embedding_batch_max_wait_ms > 0:
+            self.embedding_batcher = EmbeddingMicroBatcher(
+                embed_fn=self.extractor.generate_embeddings,
+                executor=self.executor,
+                max_batch_size=embedding_batch_max_size,
+                max_wait_ms=embedding_batch_max_wait_ms
+            )
+
+    def schedule_retrieval_flush(self):
+        # Write buffered retrieval stats back outside the request's critical path
+        if not self.memory_store.semantic.retrieval_flush_due():
+            return
+        task = asyncio.ensure_future(
+            self.executor.run("semantic" , self.memory_store.semantic.flush_retrieval_stats)
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def schedule_compaction(self):
+        # Deprecations only leave rows behind; dropping them rewrites the
+        # semantic index, so it runs in the background, one at a time
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return
+        if not self.memory_store.semantic.compaction_due():
+            return
+        self._compaction_task = asyncio.ensure_future(
+            self.executor.run("semantic" , self.memory_store.compact_semantic)
+        )
+        self._compaction_task.add_done_callback(self._compaction_done)
+
+    def _compaction_done(self , task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Semantic store compaction failed: {task.exception()}")
+
+    async def embed_texts(self , texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.embedding_batcher is not None:
+            return await self.embedding_batcher.embed(texts)
+        return await self.executor.run(
+            "embedding",
+            self.extractor.generate_embeddings,
+            texts
+        )
 
     async def process_conversation(
         self,
         conversation_input:ConversationInput,
         target_provider:LLMProvider = LLMProvider.GROQ,
         apply_polices:bool = True,
-        retrieve_context: bool = True
+        retrieve_context: bool = True,
+        extraction_mode: str = "incremental",
+        ranking_weights: Optional[RankingWeights] = None
     ) -> ProcessConversationResponse:
-        stored_memories : List[MemoryUnit] = []
-        policy_decisions : List[PolicyDecision] = []
-
         try:
-            print("DEBUG: Starting extraction...")
-            extraction_result = self.extractor.extract(conversation_input)
-            print(f"DEBUG: Extracted {len(extraction_result.memory_units)} memory units")
-            
-            if apply_polices and extraction_result.memory_units:
-                print("DEBUG: Getting existing memories...")
-                existing_memories = self.memory_store.get_all_memories(conversation_input.session_id)
-                
-                for i, memory_unit in enumerate(extraction_result.memory_units):
-                    print(f"DEBUG: Processing memory unit {i+1}/{len(extraction_result.memory_units)}")
-                    print(f"  Type: {memory_unit.type}, Type class: {type(memory_unit.type)}")
-                    print(f"  Content: {memory_unit.content[:50]}...")
-                    
-                    decision = self.policy_engine.evaluate(
-                        memory_unit,
-                        existing_memories
-                    )
-                    policy_decisions.append(decision)
-                    
-                    if decision.should_store:
-                        print(f"  Storing in: {decision.target_store}")
-                        self._store_memory(memory_unit,decision)
-                        stored_memories.append(memory_unit)
-                    
-                    for deprecated_id in decision.deprecate_existing:
-                        self.memory_store.semantic.deprecate(deprecated_id)
-                        memory_unit.lifecycle = MemoryLifecycle.DEPRECATED
-                        memory_unit.metadata["deprecated_reason"] = decision.reason
+            retrieval_task = None
+            if retrieve_context:
+                # Retrieval only reads memory as it was before this turn, so it
+                # runs alongside extraction and storage; this turn's writes are
+                # merged into its results afterwards
+                retrieval_task = asyncio.ensure_future(
+                    self._retrieve_context(conversation_input , ranking_weights)
+                )
+            try:
+                extraction_result , stored_memories , policy_decisions = await self.extract_and_store(
+                    conversation_input,
+                    apply_polices=apply_polices,
+                    extraction_mode=extraction_mode
+                )
+            except BaseException:
+                if retrieval_task is not None:
+                    retrieval_task.cancel()
+                raise
             
             working_memories = []
             episodic_memories = []
             semantic_memories = []
+            retrieval_metadata = {}
 
-            if retrieve_context :
-                print("DEBUG: Retrieving context...")
-                working_memories = self.memory_store.working.get_active(
-                    conversation_input.session_id
+            if retrieval_task is not None:
+                (working_memories , episodic_memories , semantic_memories ,
+                 semantic_candidates , degraded) = await retrieval_task
+                working_memories , episodic_memories , semantic_memories , merged = (
+                    await self._merge_stored(
+                        extraction_result.memory_units,
+                        policy_decisions,
+                        stored_memories,
+                        working_memories,
+                        episodic_memories,
+                        semantic_memories,
+                        semantic_candidates,
+                        ranking_weights
+                    )
                 )
-                episodic_memories = self.memory_store.episodic.get_recent(limit=10)
-
-                if conversation_input.user_message:
-                    query_embedding = self.extractor.generate_embedding(conversation_input.user_message)
-                    semantic_memories = self.memory_store.semantic.search(query_embedding,top_k=10)
-            
-            print("DEBUG: Composing context...")
-            context_state = self.composer.compose(
-                session_id=conversation_input.session_id,
-                user_message=conversation_input.user_message,
-                working_memories=working_memories,
-                episodic_memories=episodic_memories,
-                semantic_memories=semantic_memories
-            )
+                retrieval_metadata = {"degraded": degraded , "merged_from_this_turn": merged}
             
-            print("DEBUG: Rendering context...")
-            render_request = RenderRequest(
-                context_state=context_state,
-                provider=target_provider
+            rendered_context , context_state = self._render_context(
+                conversation_input,
+                target_provider,
+                working_memories,
+                episodic_memories,
+                semantic_memories
             )
-            rendered_context = self.renderer.render(render_request)
 
-            print("DEBUG: Process completed successfully")
             return ProcessConversationResponse(
                 rendered_context=rendered_context,
                 stored_memories=stored_memories,
@@ -114,63 +293,678 @@ class ContextOrchestrator:
                 metadata={
                     "extraction_metadata": extraction_result.extraction_metadata,
                     "total_memories_stored": len(stored_memories),
+                    # Extracted units not stored as new memories, by the id they repeat
+                    "deduplicated": {
+                        memory_unit.id: memory_unit.metadata["duplicate_of"]
+                        for memory_unit in extraction_result.memory_units
+                        if "duplicate_of" in memory_unit.metadata
+                    },
                     "context_composed": True,
-                    "memory_breakdown": context_state.metadata.get("memory_breakdown", {})
+                    "memory_breakdown": context_state.metadata.get("memory_breakdown", {}),
+                    "retrieval": retrieval_metadata
                 }
             )
-        except Exception as e:
-            print(f"DEBUG: ERROR occurred!")
-            print(f"Error type: {type(e)}")
-            print(f"Error message: {str(e)}")
-            print("Full traceback:")
+        except Exception:
             traceback.print_exc()
             raise
     
-    def _store_memory(self,memory_unit: MemoryUnit , decision:PolicyDecision):
+    async def get_context(
+        self,
+        conversation_input: ConversationInput,
+        target_provider: LLMProvider = LLMProvider.GROQ,
+        ranking_weights: Optional[RankingWeights] = None
+    ) -> ContextResponse:
+        """Retrieval, composition and rendering only: no extraction call and
+        no writes, so latency is that of the slowest store read."""
         try:
-            print(f"    _store_memory called for: {decision.target_store}")
-            if decision.target_store == "working":
-                ttl = self.policy_engine.get_ttl_for_scope(memory_unit.scope)
-                self.memory_store.working.add(memory_unit , ttl_seconds=ttl)
-            elif decision.target_store == "episodic":
-                # Check type
-                print(f"    memory_unit.type = {memory_unit.type}")
-                print(f"    type(memory_unit.type) = {type(memory_unit.type)}")
-                print(f"    MemoryType.DECISION = {MemoryType.DECISION}")
-                print(f"    Comparison result: {memory_unit.type == MemoryType.DECISION}")
-                
-                event_type = "decision" if memory_unit.type == MemoryType.DECISION else "event"
-                print(f"    event_type = {event_type}")
-                self.memory_store.episodic.add(memory_unit , event_type=event_type)
-            elif decision.target_store == "semantic":
-                embedding = self.extractor.generate_embedding(memory_unit.content)
-                self.memory_store.semantic.add(memory_unit , embedding)
-            
-            if decision.confidence_override is not None:
-                memory_unit.confidence = decision.confidence_override
-            
-            print(f"    _store_memory completed successfully")
-        except Exception as e:
-            print(f"    ERROR in _store_memory: {e}")
+            working_memories , episodic_memories , semantic_memories , _ , degraded = (
+                await self._retrieve_context(conversation_input , ranking_weights)
+            )
+            rendered_context , context_state = self._render_context(
+                conversation_input,
+                target_provider,
+                working_memories,
+                episodic_memories,
+                semantic_memories
+            )
+            return ContextResponse(
+                rendered_context=rendered_context,
+                metadata={
+                    "context_composed": True,
+                    "memory_breakdown": context_state.metadata.get("memory_breakdown", {}),
+                    "retrieval": {"degraded": degraded}
+                }
+            )
+        except Exception:
             traceback.print_exc()
             raise
+
+    async def extract_and_store(
+        self,
+        conversation_input: ConversationInput,
+        apply_polices: bool = True,
+        extraction_mode: str = "incremental"
+    ) -> Tuple[ExtractionResult , List[MemoryUnit] , List[PolicyDecision]]:
+        """Extraction, policy evaluation and writes for one conversation,
+        without retrieval or rendering. Returns the extraction result, the
+        stored memories and the policy decisions."""
+        stored_memories : List[MemoryUnit] = []
+        policy_decisions : List[PolicyDecision] = []
+        extraction_input , turn_hashes = await self._extraction_input(
+            conversation_input,
+            extraction_mode
+        )
+        if extraction_input is None:
+            # Every turn was extracted by an earlier call; no LLM round trip
+            extraction_result = ExtractionResult(
+                memory_units=[],
+                extraction_metadata={"skipped": "no new conversation turns"}
+            )
+        elif self.extraction_streaming:
+            extraction_result , stored_memories , policy_decisions = (
+                await self._extract_and_store_streaming(extraction_input , apply_polices)
+            )
+        else:
+            async with self.executor.limit("extraction"):
+                extraction_result = await self.extractor.extract_async(extraction_input)
+
+            evaluated = []
+            if apply_polices and extraction_result.memory_units:
+                existing_memories , contradiction_index = await self._policy_snapshot(
+                    conversation_input.session_id
+                )
+                policy_decisions = await self._evaluate_policies(
+                    extraction_result.memory_units,
+                    existing_memories,
+                    contradiction_index
+                )
+                evaluated = list(zip(extraction_result.memory_units , policy_decisions))
+
+            # Every unit that needs a vector in this request is embedded in one batch
+            semantic_units = [
+                memory_unit for memory_unit, decision in evaluated
+                if decision.should_store and decision.target_store == "semantic"
+            ]
+            embeddings = await self.embed_texts([memory_unit.content for memory_unit in semantic_units])
+            unit_embeddings = {
+                memory_unit.id: embedding
+                for memory_unit, embedding in zip(semantic_units , embeddings)
+            }
+
+            stored_memories = await self._store_grouped(evaluated , unit_embeddings)
+
+        if (turn_hashes and apply_polices and
+            "error" not in extraction_result.extraction_metadata):
+            await self.executor.run(
+                "episodic",
+                self.memory_store.watermarks.mark_processed,
+                conversation_input.session_id,
+                turn_hashes
+            )
+        extraction_result.extraction_metadata["extraction_mode"] = extraction_mode
+        return extraction_result , stored_memories , policy_decisions
+
+    def _render_context(
+        self,
+        conversation_input: ConversationInput,
+        target_provider: LLMProvider,
+        working_memories: List[MemoryUnit],
+        episodic_memories: List[MemoryUnit],
+        semantic_memories: List[MemoryUnit]
+    ) -> Tuple[RenderResult , ContextState]:
+        context_state = self.composer.compose(
+            session_id=conversation_input.session_id,
+            user_message=conversation_input.user_message,
+            working_memories=working_memories,
+            episodic_memories=episodic_memories,
+            semantic_memories=semantic_memories
+        )
+        render_request = RenderRequest(
+            context_state=context_state,
+            provider=target_provider
+        )
+        return self.renderer.render(render_request) , context_state
+
+    async def _retrieve_context(
+        self,
+        conversation_input: ConversationInput,
+        ranking_weights: Optional[RankingWeights]
+    ) -> Tuple[List[MemoryUnit] , List[MemoryUnit] , List[MemoryUnit] , Optional[SemanticCandidates] , Dict[str,str]]:
+        """Reads the three stores concurrently, each under its own timeout.
+
+        A store that times out or fails contributes nothing and is reported
+        in the returned ``degraded`` map; the others are still used. Returns
+        working, episodic and semantic memories, the candidate lists the
+        semantic ones were ranked from (None when semantic retrieval did not
+        complete) and ``degraded``.
+        """
+        degraded: Dict[str,str] = {}
+        semantic_candidates: List[Optional[SemanticCandidates]] = [None]
+
+        async def semantic() -> List[MemoryUnit]:
+            if not conversation_input.user_message:
+                return []
+            query_embedding = (await self.embed_texts([conversation_input.user_message]))[0]
+            memories , semantic_candidates[0] = await self.executor.run(
+                "semantic",
+                self.memory_store.search_semantic_candidates,
+                conversation_input.user_message,
+                query_embedding,
+                top_k=10,
+                mode=self.retrieval_mode,
+                project_id=conversation_input.project_id,
+                include_global=self.include_global_scope,
+                ranking_weights=ranking_weights
+            )
+            self.schedule_retrieval_flush()
+            return memories
+
+        working_memories , episodic_memories , semantic_memories = await asyncio.gather(
+            self._bounded_retrieval("working" , degraded , self.executor.run(
+                "working",
+                self.memory_store.working.get_active,
+                conversation_input.session_id
+            )),
+            self._bounded_retrieval("episodic" , degraded , self.executor.run(
+                "episodic",
+                self.memory_store.episodic.get_recent,
+                limit=10,
+                project_id=conversation_input.project_id,
+                include_global=self.include_global_scope
+            )),
+            self._bounded_retrieval("semantic" , degraded , semantic())
+        )
+        return working_memories , episodic_memories , semantic_memories , semantic_candidates[0] , degraded
+
+    async def _bounded_retrieval(self , store: str , degraded: Dict[str,str] , retrieval) -> List[MemoryUnit]:
+        timeout = self.retrieval_timeouts.get(store)
+        try:
+            return await asyncio.wait_for(retrieval , timeout or None)
+        except asyncio.TimeoutError:
+            degraded[store] = "timeout"
+            print(f"{store} memory retrieval timed out after {timeout}s; rendering without it")
+        except Exception as e:
+            degraded[store] = f"error: {e}"
+            print(f"{store} memory retrieval failed; rendering without it: {e}")
+        return []
+
+    async def _merge_stored(
+        self,
+        extracted: List[MemoryUnit],
+        policy_decisions: List[PolicyDecision],
+        stored_memories: List[MemoryUnit],
+        working_memories: List[MemoryUnit],
+        episodic_memories: List[MemoryUnit],
+        semantic_memories: List[MemoryUnit],
+        semantic_candidates: Optional[SemanticCandidates],
+        ranking_weights: Optional[RankingWeights]
+    ) -> Tuple[List[MemoryUnit] , List[MemoryUnit] , List[MemoryUnit] , int]:
+        """Adds the memories stored by this turn, which concurrent retrieval
+        could not see, to the retrieved ones. Working and episodic units are
+        the newest there are; semantic units are inserted into the search's
+        candidate lists and the top 10 ranked again, so they compete on the
+        scale of the retrieved hits (appended, within the 10, when semantic
+        retrieval did not complete). Memories this turn deprecated are
+        dropped from the retrieved lists. Returns the three lists and how
+        many memories were added."""
+        deprecated_ids = {
+            memory_id
+            for decision in policy_decisions
+            for memory_id in decision.deprecate_existing
+        }
+        if deprecated_ids:
+            working_memories = [memory for memory in working_memories if memory.id not in deprecated_ids]
+            episodic_memories = [memory for memory in episodic_memories if memory.id not in deprecated_ids]
+            semantic_memories = [memory for memory in semantic_memories if memory.id not in deprecated_ids]
+
+        stored_ids = {memory_unit.id for memory_unit in stored_memories}
+        new_by_store: Dict[str,List[MemoryUnit]] = {"working": [] , "episodic": [] , "semantic": []}
+        for memory_unit, decision in zip(extracted , policy_decisions):
+            if memory_unit.id in stored_ids and decision.target_store in new_by_store:
+                new_by_store[decision.target_store].append(memory_unit)
+        if not any(new_by_store.values()):
+            return working_memories , episodic_memories , semantic_memories , 0
+
+        retrieved_ids = {
+            memory.id for memory in working_memories + episodic_memories + semantic_memories
+        }
+        new_working = [unit for unit in new_by_store["working"] if unit.id not in retrieved_ids]
+        new_episodic = [unit for unit in new_by_store["episodic"] if unit.id not in retrieved_ids]
+        merged_working = working_memories + new_working
+        merged_episodic = (new_episodic[::-1] + episodic_memories)[:10]
+
+        merged_semantic = semantic_memories
+        new_semantic = [
+            unit for unit in new_by_store["semantic"]
+            if unit.id not in retrieved_ids and unit.confidence >= 0.5
+        ]
+        if new_semantic and semantic_candidates is not None:
+            # Cache hits: these contents were embedded for the write
+            embeddings = await self.embed_texts([unit.content for unit in new_semantic])
+            merged_semantic = await self.executor.run(
+                "semantic",
+                self.memory_store.rank_semantic,
+                semantic_candidates,
+                10,
+                list(zip(new_semantic , embeddings)),
+                deprecated_ids,
+                ranking_weights
+            )
+        elif new_semantic:
+            # No search lists to rank them in
+            merged_semantic = (semantic_memories + new_semantic)[:10]
+
+        new_ids = {unit.id for units in new_by_store.values() for unit in units}
+        merged = sum(
+            1 for memory in merged_working + merged_episodic + merged_semantic
+            if memory.id in new_ids
+        )
+        return merged_working , merged_episodic , merged_semantic , merged
+
+    async def _extraction_input(
+        self,
+        conversation_input: ConversationInput,
+        extraction_mode: str
+    ) -> Tuple[Optional[ConversationInput] , List[str]]:
+        hashes = conversation_turn_hashes(conversation_input)
+        history_window = self.extractor.history_window
+        if extraction_mode == "full":
+            # Only the turns the prompt shows count as extracted
+            return conversation_input , hashes[-(history_window + 1):]
+        processed = await self.executor.run(
+            "episodic",
+            self.memory_store.watermarks.get_processed,
+            conversation_input.session_id,
+            hashes
+        )
+        return incremental_input(conversation_input , processed , history_window)
+
+    async def _extract_and_store_streaming(
+        self,
+        conversation_input: ConversationInput,
+        apply_polices: bool
+    ) -> Tuple[ExtractionResult , List[MemoryUnit] , List[PolicyDecision]]:
+        # Units are evaluated and stored in micro-batches while the completion
+        # streams: each round takes whatever arrived since the previous one
+        metadata: dict = {}
+        extracted: List[MemoryUnit] = []
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async with self.executor.limit("extraction"):
+                    async for memory_unit in self.extractor.extract_stream(conversation_input , metadata):
+                        extracted.append(memory_unit)
+                        queue.put_nowait(memory_unit)
+            finally:
+                queue.put_nowait(None)
+
+        producer = asyncio.ensure_future(produce())
+        stored_memories: List[MemoryUnit] = []
+        policy_decisions: List[PolicyDecision] = []
+        try:
+            finished = False
+            while not finished:
+                batch = [await queue.get()]
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                if batch[-1] is None:
+                    finished = True
+                    batch.pop()
+                if batch and apply_polices:
+                    stored , decisions = await self.store_memory_units(batch)
+                    stored_memories.extend(stored)
+                    policy_decisions.extend(decisions)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+        return (
+            ExtractionResult(memory_units=extracted , extraction_metadata=metadata),
+            stored_memories,
+            policy_decisions
+        )
+
+    async def store_memory_units(
+        self,
+        memory_units: List[MemoryUnit]
+    ) -> Tuple[List[MemoryUnit] , List[PolicyDecision]]:
+        """Policy evaluation and grouped writes for already-extracted units,
+        without retrieval or rendering (used by bulk ingestion)."""
+        if not memory_units:
+            return [] , []
+        by_session: Dict[str,List[MemoryUnit]] = {}
+        for memory_unit in memory_units:
+            by_session.setdefault(memory_unit.source_session , []).append(memory_unit)
+        snapshots = await self._policy_snapshots(list(by_session))
+
+        evaluated = []
+        for units, (existing_memories, contradiction_index) in zip(by_session.values() , snapshots):
+            decisions = await self._evaluate_policies(
+                units,
+                existing_memories,
+                contradiction_index
+            )
+            evaluated.extend(zip(units , decisions))
+
+        semantic_units = [
+            memory_unit for memory_unit, decision in evaluated
+            if decision.should_store and decision.target_store == "semantic"
+        ]
+        embeddings = await self.embed_texts([memory_unit.content for memory_unit in semantic_units])
+        unit_embeddings = {
+            memory_unit.id: embedding
+            for memory_unit, embedding in zip(semantic_units , embeddings)
+        }
+        stored_memories = await self._store_grouped(evaluated , unit_embeddings)
+        return stored_memories , [decision for _, decision in evaluated]
+
+    async def _evaluate_policies(
+        self,
+        memory_units: List[MemoryUnit],
+        existing_memories: List[MemoryUnit],
+        contradiction_index: ContradictionIndexGroup
+    ) -> List[PolicyDecision]:
+        # Units checked for contradictions are embedded first so the index can
+        # match paraphrases; semantic units reuse the vectors from the cache
+        checked = self.policy_engine.checks_contradictions(memory_units)
+        vectors = iter(await self.embed_texts([
+            memory_unit.content for memory_unit, check in zip(memory_units , checked) if check
+        ]))
+        return self.policy_engine.evaluate_batch(
+            memory_units,
+            existing_memories,
+            contradiction_index=contradiction_index,
+            embeddings=[next(vectors) if check else None for check in checked]
+        )
+
+    async def _policy_snapshot(self , session_id: str) -> Tuple[List[MemoryUnit] , ContradictionIndexGroup]:
+        return (await self._policy_snapshots([session_id]))[0]
+
+    async def _policy_snapshots(
+        self,
+        session_ids: List[str]
+    ) -> List[Tuple[List[MemoryUnit] , ContradictionIndexGroup]]:
+        """Existing memories and contradiction index per session for policy
+        evaluation. Session parts are read under the episodic stage and the
+        shared semantic part once under the semantic stage, so a slow
+        semantic store neither holds episodic slots nor runs unserialized."""
+        semantic , *sessions = await asyncio.gather(
+            self.executor.run("semantic" , self.memory_store.get_semantic_snapshot),
+            *(
+                self.executor.run("episodic" , self.memory_store.get_session_snapshot , session_id)
+                for session_id in session_ids
+            )
+        )
+        semantic_memories , semantic_index = semantic
+        return [
+            (session_memories + semantic_memories , ContradictionIndexGroup([session_index , semantic_index]))
+            for session_memories, session_index in sessions
+        ]
+
+    async def _store_memory(
+        self,
+        memory_unit: MemoryUnit ,
+        decision:PolicyDecision,
+        embedding: Optional[List[float]] = None
+    ):
+        await self._store_grouped(
+            [(memory_unit , decision)],
+            {memory_unit.id: embedding} if embedding is not None else {}
+        )
+
+    async def _store_grouped(
+        self,
+        evaluated: List[Tuple[MemoryUnit , PolicyDecision]],
+        unit_embeddings: Dict[str,List[float]]
+    ) -> List[MemoryUnit]:
+        working_batch = []
+        episodic_batch = []
+        semantic_batch = []
+        stored_memories = []
+        deprecate_ids: Dict[str,None] = {}
+        evaluated_targets: Dict[str,str] = {}
+        for memory_unit, decision in evaluated:
+            if decision.should_store:
+                evaluated_targets[memory_unit.id] = decision.target_store
+                # Copied so each store keeps the unit as it was when it was routed
+                routed = memory_unit.model_copy()
+                if decision.target_store == "working":
+                    ttl = self.policy_engine.get_ttl_for_scope(memory_unit.scope)
+                    working_batch.append((routed , ttl))
+                elif decision.target_store == "episodic":
+                    episodic_batch.append((routed , self._episodic_event_type(memory_unit)))
+                elif decision.target_store == "semantic":
+                    semantic_batch.append((routed , unit_embeddings.get(memory_unit.id)))
+                if decision.confidence_override is not None:
+                    memory_unit.confidence = decision.confidence_override
+                stored_memories.append(memory_unit)
+
+            for deprecated_id in decision.deprecate_existing:
+                deprecate_ids[deprecated_id] = None
+                memory_unit.lifecycle = MemoryLifecycle.DEPRECATED
+                memory_unit.metadata["deprecated_reason"] = decision.reason
+
+        missing = [i for i, (_, embedding) in enumerate(semantic_batch) if embedding is None]
+        if missing:
+            vectors = await self.embed_texts([semantic_batch[i][0].content for i in missing])
+            for i, vector in zip(missing , vectors):
+                semantic_batch[i] = (semantic_batch[i][0] , vector)
+
+        reinforce_ids: List[str] = []
+        repeat_ids: List[str] = []
+        if self.dedup_enabled and (episodic_batch or semantic_batch):
+            episodic_batch , semantic_batch , duplicate_of = await self._deduplicate(
+                episodic_batch,
+                semantic_batch
+            )
+            if duplicate_of:
+                reinforce_ids = [
+                    duplicate_of[memory_unit.id] for memory_unit in stored_memories
+                    if memory_unit.id in duplicate_of
+                    and evaluated_targets.get(memory_unit.id) == "semantic"
+                ]
+                repeat_ids = [
+                    duplicate_of[memory_unit.id] for memory_unit in stored_memories
+                    if memory_unit.id in duplicate_of
+                    and evaluated_targets.get(memory_unit.id) == "episodic"
+                ]
+                for memory_unit in stored_memories:
+                    if memory_unit.id in duplicate_of:
+                        memory_unit.metadata["duplicate_of"] = duplicate_of[memory_unit.id]
+                stored_memories = [
+                    memory_unit for memory_unit in stored_memories
+                    if memory_unit.id not in duplicate_of
+                ]
+                # A repeat never deprecates the memory it repeats
+                for existing_id in duplicate_of.values():
+                    deprecate_ids.pop(existing_id , None)
+
+        if self.write_behind is not None:
+            # Acknowledged once journaled; the worker applies them in order
+            # (writes, then repeats and reinforcements, then deprecations)
+            await self.write_behind.enqueue(
+                working=working_batch,
+                episodic=episodic_batch,
+                semantic=semantic_batch,
+                reinforce_ids=reinforce_ids,
+                repeat_ids=repeat_ids,
+                deprecate_ids=list(deprecate_ids),
+                decisions={memory_unit.id: decision for memory_unit, decision in evaluated}
+            )
+            # For deprecations the worker has applied since the last check
+            self.schedule_compaction()
+            return stored_memories
+
+        # One call per store, with the stores written concurrently
+        writes = []
+        if working_batch:
+            writes.append(self.executor.run("working" , self.memory_store.write_working , working_batch))
+        if episodic_batch:
+            writes.append(self.executor.run("episodic" , self.memory_store.write_episodic , episodic_batch))
+        if semantic_batch:
+            writes.append(self.executor.run("semantic" , self.memory_store.write_semantic , semantic_batch))
+        await asyncio.gather(*writes)
+        if repeat_ids:
+            # After the writes, since in-batch repeats count against events logged above
+            await self.executor.run(
+                "episodic",
+                self.memory_store.repeat_episodic,
+                repeat_ids
+            )
+        if reinforce_ids:
+            # After the writes, since in-batch repeats reinforce units written above
+            await self.executor.run(
+                "semantic",
+                self.memory_store.reinforce_semantic,
+                reinforce_ids
+            )
+        if deprecate_ids:
+            await self.executor.run(
+                "semantic",
+                self.memory_store.deprecate_semantic,
+                list(deprecate_ids)
+            )
+            self.schedule_compaction()
+        return stored_memories
+
+    async def _deduplicate(
+        self,
+        episodic_batch: List[Tuple[MemoryUnit , str]],
+        semantic_batch: List[Tuple[MemoryUnit , List[float]]]
+    ) -> Tuple[List[Tuple[MemoryUnit , str]] , List[Tuple[MemoryUnit , List[float]]] , Dict[str,str]]:
+        """Collapses repeats of already-known content in the write batches.
+
+        An episodic event repeats when its normalized content hash is
+        already logged, or earlier in the batch; it is dropped, and the
+        caller counts the repeat on the original event. A semantic
+        memory repeats on a hash match, or when a live memory of the same
+        type and project is at least ``dedup_similarity_threshold`` cosine
+        similar; it is dropped, and in-batch repeats collapse onto their
+        first occurrence. Returns the remaining batches and, for every
+        repeat, the id of the memory it repeats.
+        """
+        duplicate_of: Dict[str,str] = {}
+        episodic_hashes = [content_hash(memory_unit) for memory_unit, _ in episodic_batch]
+        semantic_hashes = [content_hash(memory_unit) for memory_unit, _ in semantic_batch]
+        lookups = []
+        if episodic_batch:
+            lookups.append(self.executor.run(
+                "episodic",
+                self.memory_store.episodic.find_by_content_hashes,
+                list(dict.fromkeys(episodic_hashes))
+            ))
+        if semantic_batch:
+            lookups.append(self.executor.run(
+                "semantic",
+                self.memory_store.semantic.find_by_content_hashes,
+                list(dict.fromkeys(semantic_hashes))
+            ))
+        found = await asyncio.gather(*lookups)
+        episodic_known = found.pop(0) if episodic_batch else {}
+        semantic_known = found.pop(0) if semantic_batch else {}
+
+        kept_episodic = []
+        for (memory_unit, event_type), digest in zip(episodic_batch , episodic_hashes):
+            if digest in episodic_known:
+                duplicate_of[memory_unit.id] = episodic_known[digest]
+                continue
+            episodic_known[digest] = memory_unit.id
+            kept_episodic.append((memory_unit , event_type))
+
+        # Hash matches first; only the rest pay for a nearest-neighbour query
+        candidates = []
+        for i, ((memory_unit, _), digest) in enumerate(zip(semantic_batch , semantic_hashes)):
+            if digest in semantic_known:
+                duplicate_of[memory_unit.id] = semantic_known[digest]
+            else:
+                semantic_known[digest] = memory_unit.id
+                candidates.append(i)
+        nearest = await self.executor.run(
+            "semantic",
+            self.memory_store.semantic.find_nearest,
+            [semantic_batch[i][1] for i in candidates],
+            [semantic_batch[i][0].type for i in candidates],
+            self.dedup_similarity_threshold,
+            [semantic_batch[i][0].project_id for i in candidates]
+        ) if candidates else []
+        in_batch = batch_near_duplicates(
+            [semantic_batch[i][1] for i in candidates],
+            [semantic_batch[i][0].type for i in candidates],
+            self.dedup_similarity_threshold,
+            [semantic_batch[i][0].project_id for i in candidates]
+        )
+        for position, i in enumerate(candidates):
+            memory_unit = semantic_batch[i][0]
+            if nearest[position] is not None:
+                duplicate_of[memory_unit.id] = nearest[position].memory.id
+            elif in_batch[position] is not None:
+                first = semantic_batch[candidates[in_batch[position]]][0]
+                duplicate_of[memory_unit.id] = first.id
+        # Point in-batch repeats past a first occurrence that was itself a repeat
+        for memory_id, existing_id in duplicate_of.items():
+            duplicate_of[memory_id] = duplicate_of.get(existing_id , existing_id)
+        kept_semantic = [
+            (memory_unit , embedding) for memory_unit, embedding in semantic_batch
+            if memory_unit.id not in duplicate_of
+        ]
+
+        self.dedup_stats["episodic_repeated"] += len(episodic_batch) - len(kept_episodic)
+        self.dedup_stats["semantic_reinforced"] += len(semantic_batch) - len(kept_semantic)
+        return kept_episodic , kept_semantic , duplicate_of
     
-    def get_memory_stats(self,session_id:str) -> dict:
-        working = self.memory_store.working.get_active(session_id)
-        episodic = self.memory_store.episodic.get_session_timeline(session_id)
+    def _episodic_event_type(self , memory_unit: MemoryUnit) -> str:
+        return "decision" if memory_unit.type == MemoryType.DECISION else "event"
+
+    async def get_memory_stats(self,session_id:str) -> dict:
+        working = await self.executor.run(
+            "working",
+            self.memory_store.working.get_active,
+            session_id
+        )
+        episodic = await self.executor.run(
+            "episodic",
+            self.memory_store.episodic.get_session_timeline,
+            session_id
+        )
         
         # Get semantic count (approximate)
-        semantic_count = len(
-            self.memory_store.semantic.client.scroll(
-                collection_name=self.memory_store.semantic.collection_name,
-                limit=1
-            )[0]
+        semantic_count = await self.executor.run(
+            "semantic",
+            self.memory_store.semantic.count
         )
         
-        return {
+        stats = {
             "session_id": session_id,
             "working_memory_count": len(working),
             "episodic_memory_count": len(episodic),
             "total_semantic_memories": semantic_count,
+            "working_memory_store": self.memory_store.working.stats(),
+            "memory_snapshots": self.memory_store.snapshots.stats(),
+            "policy_rules": self.policy_engine.rule_stats(),
+            "deduplication": dict(self.dedup_stats),
             "timestamp": datetime.now(timezone.utc).isoformat()
-        }
\ No newline at end of file
+        }
+        if self.extractor.embedding_cache is not None:
+            stats["embedding_cache"] = self.extractor.embedding_cache.stats()
+        if self.extractor.extraction_cache is not None:
+            stats["extraction_cache"] = self.extractor.extraction_cache.stats()
+        if self.write_behind is not None:
+            stats["write_behind"] = self.write_behind.stats()
+        return stats
+
+    def start_write_behind(self):
+        # Replays writes journaled by an earlier run; needs a running event loop
+        if self.write_behind is not None:
+            self.write_behind.start()
+
+    async def shutdown(self):
+        if self.write_behind is not None:
+            # First, so the worker's in-flight journal transaction can finish
+            await self.write_behind.close()
+        self.executor.shutdown(wait=True)
+        self.memory_store.close()
+        if self.extractor.embedding_cache is not None:
+            self.extractor.embedding_cache.close()
+        if self.extractor.extraction_cache is not None:
+            self.extractor.extraction_cache.close()
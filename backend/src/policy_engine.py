@@ -1,100 +1,161 @@
-from typing import List , Optional , Dict
-from datetime import datetime , timezone
+from typing import List , Optional , Dict , Sequence , Tuple
+import numpy as np
+import os
 import re
+import threading
+import time
 
 from src.Schemas import (
     MemoryUnit , MemoryType , MemoryScope , MemoryLifecycle,
     PolicyDecision , PolicyRule
 )
+from src.contradiction_index import ContradictionIndex
+from src.token_budget import TokenCounter
+from src.policy_rules import (
+    DEFAULT_POLICY_RULES , build_columns , compile_rules , load_rules_file , parse_rules
+)
 
 class MemoryPolicyEngine:
-    def __init__(self):
-        self.rules: List[PolicyRule] = self._initialize_default_rules()
+    """Routes memory units to stores through a priority-ordered rule table.
+
+    Rules come from ``DEFAULT_POLICY_RULES`` or from ``rules_path`` (JSON or
+    YAML); a rules file is re-read when its mtime changes, checked at most
+    every ``reload_interval`` seconds. A file that fails to load leaves the
+    current table in place.
+    """
+    def __init__(
+        self,
+        rules_path: Optional[str] = None,
+        reload_interval: float = 1.0,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        self.rules_path = rules_path
+        self.token_counter = token_counter or TokenCounter()
+        self.reload_interval = reload_interval
+        self._rules_mtime: Optional[float] = None
+        self._last_reload_check = time.monotonic()
+        self.last_reload_error: Optional[str] = None
+        self._stats_lock = threading.Lock()
+        self._rule_hits: Dict[str,int] = {}
+        self._evaluations = 0
+        self._evaluation_ns = 0
+        if rules_path:
+            self._rules_mtime = os.path.getmtime(rules_path)
+            self._set_rules(load_rules_file(rules_path))
+        else:
+            self._set_rules(self._initialize_default_rules())
     
     def _initialize_default_rules(self) -> List[PolicyRule]:
-        return [
-            PolicyRule(
-                name = "High_confidence_decisions",
-                condition="Decision with confidence > 0.8",
-                action = "Store in semantic memory",
-                priority=10
-            ),
-            PolicyRule(
-                name="project_constraints",
-                condition="Constraint with project/global scope",
-                action="Store in semantic memory",
-                priority=8
-            ),
-            PolicyRule(
-                name="decision_events",
-                condition="Any decision type",
-                action="Store in episodic memory",
-                priority=7
-            ),
-            PolicyRule(
-                name="low_confidence_questions",
-                condition="Question with confidence < 0.5",
-                action="Do not store",
-                priority=3
-            ),
-        ]
+        return parse_rules(DEFAULT_POLICY_RULES)
+
+    def _set_rules(self , rules: List[PolicyRule]):
+        compiled = compile_rules(rules)
+        # Swapped as one reference so concurrent evaluations see either table whole
+        self._compiled = compiled
+        self.rules: List[PolicyRule] = [compiled_rule.rule for compiled_rule in compiled]
+
+    def reload_rules(self) -> bool:
+        if not self.rules_path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+            self._set_rules(load_rules_file(self.rules_path))
+        except Exception as e:
+            self.last_reload_error = f"{type(e).__name__}: {e}"
+            print(f"WARNING: keeping previous policy rules, reload failed: {self.last_reload_error}")
+            return False
+        self._rules_mtime = mtime
+        self.last_reload_error = None
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_interval:
+            return
+        self._last_reload_check = now
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+        except OSError:
+            return
+        if mtime != self._rules_mtime:
+            self._rules_mtime = mtime
+            self.reload_rules()
+
+    def _match(self , memory_unit: MemoryUnit) -> Optional[PolicyRule]:
+        for compiled_rule in self._compiled:
+            if compiled_rule.matches(memory_unit):
+                return compiled_rule.rule
+        return None
     
     def evaluate(
         self,
         memory_unit:MemoryUnit,
         existing_memories:List[MemoryUnit],
+        contradiction_index=None,
+        embedding: Optional[Sequence[float]] = None
     ) -> PolicyDecision:
-        if (memory_unit.type == MemoryType.DECISION and 
-            memory_unit.confidence > 0.8):
-            return PolicyDecision(
-                should_store=True,
-                target_store="semantic",
-                reason="High confidence decision - stable knowledge"
-            )
-        if(memory_unit.type == MemoryType.CONSTRAINT and 
-           memory_unit.scope in [MemoryScope.PROJECT , MemoryScope.GLOBAL] ):
-            return PolicyDecision(
-                should_store = True,
-                target_store="semantic",
-                reason="Project constraint - long-term applicable"
-            )
-        if(memory_unit.type == MemoryType.FACT and
-           memory_unit.scope == MemoryScope.SESSION):
+        if self.rules_path:
+            self._maybe_reload()
+        started = time.perf_counter_ns()
+        rule = self._match(memory_unit)
+        decision = self._decision_for(
+            rule , memory_unit , existing_memories , contradiction_index , embedding
+        )
+        elapsed = time.perf_counter_ns() - started
+        with self._stats_lock:
+            self._evaluations += 1
+            self._evaluation_ns += elapsed
+            if rule is not None:
+                self._rule_hits[rule.name] = self._rule_hits.get(rule.name , 0) + 1
+        return decision
+
+    def _decision_for(
+        self,
+        rule: Optional[PolicyRule],
+        memory_unit: MemoryUnit,
+        existing_memories: List[MemoryUnit],
+        contradiction_index=None,
+        embedding: Optional[Sequence[float]] = None
+    ) -> PolicyDecision:
+        if rule is None:
             return PolicyDecision(
                 should_store=True,
                 target_store="working",
-                reason="Session fact - temporary relevance"
+                reason="No matching policy rule - working memory with TTL"
             )
-        if memory_unit.type == MemoryType.DECISION :
-            deprecate_ids = self._check_contradictions(memory_unit, existing_memories)
-            return PolicyDecision(
-                should_store=True,
-                target_store="episodic",
-                deprecate_existing=deprecate_ids,
-                reason="Decision event - append to episodic log"
-            )
-        if (memory_unit.type == MemoryType.QUESTION and
-            memory_unit.confidence < 0.5):
-            return PolicyDecision(
-                should_store=False,
-                target_store=None,
-                reason="Low confidence question - not worth storing"
-            )
-        
-        # Rule: High confidence facts → semantic memory
-        if (memory_unit.type == MemoryType.FACT and
-            memory_unit.confidence > 0.7):
-            return PolicyDecision(
-                should_store=True,
-                target_store="semantic",
-                reason="High confidence fact - stable knowledge"
-            )
-        
+        deprecate_ids = []
+        if rule.check_contradictions:
+            if contradiction_index is not None:
+                deprecate_ids = contradiction_index.find_contradictions(memory_unit , embedding)
+            else:
+                deprecate_ids = self._check_contradictions(memory_unit, existing_memories)
         return PolicyDecision(
-            should_store=True,
-            target_store="working",
-            reason="Default - working memory with TTL"
+            should_store=rule.should_store,
+            target_store=rule.target_store if rule.should_store else None,
+            deprecate_existing=deprecate_ids,
+            reason=rule.reason or rule.name
         )
+
+    def rule_stats(self) -> dict:
+        with self._stats_lock:
+            evaluations = self._evaluations
+            evaluation_ns = self._evaluation_ns
+            hits = dict(self._rule_hits)
+        return {
+            "rules_path": self.rules_path,
+            "last_reload_error": self.last_reload_error,
+            "evaluations": evaluations,
+            "avg_evaluation_us": round(evaluation_ns / evaluations / 1000 , 3) if evaluations else 0.0,
+            "rules": [
+                {
+                    "name": rule.name,
+                    "priority": rule.priority,
+                    "target_store": rule.target_store,
+                    "hits": hits.get(rule.name , 0)
+                }
+                for rule in self.rules
+            ]
+        }
     
     def _check_contradictions(
         self,
@@ -123,19 +184,81 @@ class MemoryPolicyEngine:
     def evaluate_batch(
         self,
         memory_units: List[MemoryUnit],
-        existing_memories: List[MemoryUnit]
+        existing_memories: List[MemoryUnit],
+        contradiction_index=None,
+        embeddings: Optional[List[Optional[Sequence[float]]]] = None
     ) -> List[PolicyDecision]:
-        return[
-            self.evaluate(unit, existing_memories) for unit in memory_units
+        """Same decisions as ``evaluate`` per unit, with rule matching done as
+        mask operations over NumPy columns of the batch. ``embeddings``
+        (aligned with ``memory_units``, ``None`` where missing) let the
+        contradiction index match paraphrases as well as overlapping words."""
+        if not memory_units:
+            return []
+        if self.rules_path:
+            self._maybe_reload()
+        count = len(memory_units)
+        started = time.perf_counter_ns()
+        compiled , matched = self._match_batch(memory_units)
+
+        if contradiction_index is None and any(
+            compiled[position].rule.check_contradictions for position in np.unique(matched) if position >= 0
+        ):
+            # One index over the existing memories instead of a full scan per unit
+            contradiction_index = ContradictionIndex.from_memories(existing_memories)
+
+        decisions = [
+            self._decision_for(
+                compiled[position].rule if position >= 0 else None,
+                memory_unit,
+                existing_memories,
+                contradiction_index,
+                embeddings[i] if embeddings is not None else None
+            )
+            for i, (memory_unit, position) in enumerate(zip(memory_units , matched.tolist()))
         ]
+        elapsed = time.perf_counter_ns() - started
+
+        hits = np.bincount(matched[matched >= 0] , minlength=len(compiled))
+        with self._stats_lock:
+            self._evaluations += count
+            self._evaluation_ns += elapsed
+            for position in np.flatnonzero(hits):
+                name = compiled[position].rule.name
+                self._rule_hits[name] = self._rule_hits.get(name , 0) + int(hits[position])
+        return decisions
     
+    def checks_contradictions(self , memory_units: List[MemoryUnit]) -> List[bool]:
+        """Whether each unit's matching rule checks for contradictions, so
+        callers embed only those units before ``evaluate_batch``."""
+        if not memory_units:
+            return []
+        compiled , matched = self._match_batch(memory_units)
+        return [
+            position >= 0 and compiled[position].rule.check_contradictions
+            for position in matched.tolist()
+        ]
+
+    def _match_batch(self , memory_units: List[MemoryUnit]) -> Tuple[list , np.ndarray]:
+        # Index of each unit's first matching rule in the compiled table, -1 for none
+        compiled = self._compiled
+        count = len(memory_units)
+        fields = {field for compiled_rule in compiled for field, _, _ in compiled_rule.predicates}
+        columns = build_columns(memory_units , fields)
+        matched = np.full(count , -1 , dtype=np.int32)
+        for position, compiled_rule in enumerate(compiled):
+            unassigned = matched < 0
+            if not unassigned.any():
+                break
+            matched[compiled_rule.mask(columns , count) & unassigned] = position
+        return compiled , matched
+
     def should_summarize_working_memory(
         self,
-        working_memory_count:int,
+        working_memories: List[MemoryUnit],
         token_threshold: int = 2000
     ) -> bool : 
-        estimated_tokens = working_memory_count * 100
-        return estimated_tokens > token_threshold
+        tokens = sum(self.token_counter.count_many([memory.content for memory in working_memories]))
+        return tokens > token_threshold
     
     def get_ttl_for_scope(self,scope:MemoryScope) -> int:
         ttl_map = {
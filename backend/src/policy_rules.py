@@ -0,0 +1,240 @@
+from typing import Any , Callable , Dict , Iterable , List , Optional , Sequence , Tuple
+import json
+import numpy as np
+import operator
+import os
+
+try:
+    import yaml
+except ImportError:  # optional dependency, only needed for YAML rule files
+    yaml = None
+
+from src.Schemas import (
+    MemoryUnit , MemoryType , MemoryScope , MemoryLifecycle , PolicyRule
+)
+
+# Fields a rule may test, with the allowed values for enum-typed fields
+RULE_FIELDS: Dict[str,Optional[frozenset]] = {
+    "type": frozenset(member.value for member in MemoryType),
+    "scope": frozenset(member.value for member in MemoryScope),
+    "lifecycle": frozenset(member.value for member in MemoryLifecycle),
+    "confidence": None,
+    "source_session": None,
+}
+
+# Enum fields become small-integer columns for batch evaluation
+FIELD_CODES: Dict[str,Dict[str,int]] = {
+    field: {value: code for code, value in enumerate(sorted(values))}
+    for field, values in RULE_FIELDS.items()
+    if values is not None
+}
+
+RULE_OPERATORS: Dict[str,Callable[[Any,Any],bool]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": lambda value , allowed: value in allowed,
+    "not_in": lambda value , allowed: value not in allowed,
+}
+
+# The built-in policy, in the same order as the original hard-coded if-chain
+DEFAULT_POLICY_RULES: List[dict] = [
+    {
+        "name": "high_confidence_decisions",
+        "priority": 100,
+        "when": {"type": "decision" , "confidence": {"gt": 0.8}},
+        "target_store": "semantic",
+        "reason": "High confidence decision - stable knowledge",
+    },
+    {
+        "name": "project_constraints",
+        "priority": 90,
+        "when": {"type": "constraint" , "scope": ["project" , "global"]},
+        "target_store": "semantic",
+        "reason": "Project constraint - long-term applicable",
+    },
+    {
+        "name": "session_facts",
+        "priority": 80,
+        "when": {"type": "fact" , "scope": "session"},
+        "target_store": "working",
+        "reason": "Session fact - temporary relevance",
+    },
+    {
+        "name": "decision_events",
+        "priority": 70,
+        "when": {"type": "decision"},
+        "target_store": "episodic",
+        "check_contradictions": True,
+        "reason": "Decision event - append to episodic log",
+    },
+    {
+        "name": "low_confidence_questions",
+        "priority": 60,
+        "when": {"type": "question" , "confidence": {"lt": 0.5}},
+        "should_store": False,
+        "target_store": None,
+        "reason": "Low confidence question - not worth storing",
+    },
+    {
+        "name": "high_confidence_facts",
+        "priority": 50,
+        "when": {"type": "fact" , "confidence": {"gt": 0.7}},
+        "target_store": "semantic",
+        "reason": "High confidence fact - stable knowledge",
+    },
+    {
+        "name": "default_working",
+        "priority": 0,
+        "when": {},
+        "target_store": "working",
+        "reason": "Default - working memory with TTL",
+    },
+]
+
+# Elementwise counterparts of RULE_OPERATORS over NumPy columns
+COLUMN_OPERATORS: Dict[str,Callable[[np.ndarray,Any],np.ndarray]] = {
+    "eq": np.equal,
+    "ne": np.not_equal,
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+    "in": np.isin,
+    "not_in": lambda column , allowed: np.isin(column , allowed , invert=True),
+}
+
+Predicate = Tuple[str,str,Any]
+
+def _value(field) -> Any:
+    return getattr(field , "value" , field)
+
+def _compile_condition(rule_name: str , field: str , spec: Any) -> List[Predicate]:
+    if field not in RULE_FIELDS:
+        raise ValueError(f"Rule '{rule_name}': unknown field '{field}'")
+    if isinstance(spec , dict):
+        clauses = list(spec.items())
+    elif isinstance(spec , (list , tuple , set , frozenset)):
+        clauses = [("in" , spec)]
+    else:
+        clauses = [("eq" , spec)]
+
+    allowed = RULE_FIELDS[field]
+    predicates = []
+    for op, value in clauses:
+        if op not in RULE_OPERATORS:
+            raise ValueError(f"Rule '{rule_name}': unknown operator '{op}' for '{field}'")
+        if op in ("in" , "not_in"):
+            if not isinstance(value , (list , tuple , set , frozenset)):
+                raise ValueError(f"Rule '{rule_name}': '{op}' on '{field}' needs a list")
+            value = frozenset(_value(item) for item in value)
+            values = value
+        else:
+            value = _value(value)
+            values = [value]
+        if field == "confidence" and not all(
+            isinstance(item , (int , float)) and not isinstance(item , bool) for item in values
+        ):
+            raise ValueError(f"Rule '{rule_name}': confidence must be compared to numbers")
+        if allowed is not None:
+            unknown = [item for item in values if item not in allowed]
+            if unknown:
+                raise ValueError(f"Rule '{rule_name}': invalid {field} value(s) {unknown}")
+        predicates.append((field , op , value))
+    return predicates
+
+def _column_value(field: str , op: str , value: Any) -> Any:
+    codes = FIELD_CODES.get(field)
+    if op in ("in" , "not_in"):
+        values = [codes[item] for item in value] if codes is not None else list(value)
+        return np.array(values , dtype=np.int8 if codes is not None else object)
+    return codes[value] if codes is not None else value
+
+def build_columns(memory_units: Sequence[MemoryUnit] , fields: Iterable[str]) -> Dict[str,np.ndarray]:
+    count = len(memory_units)
+    columns = {}
+    for field in fields:
+        codes = FIELD_CODES.get(field)
+        if codes is not None:
+            columns[field] = np.fromiter(
+                (codes[_value(getattr(unit , field))] for unit in memory_units),
+                dtype=np.int8,
+                count=count
+            )
+        elif field == "confidence":
+            columns[field] = np.fromiter(
+                (unit.confidence for unit in memory_units),
+                dtype=np.float64,
+                count=count
+            )
+        else:
+            columns[field] = np.array(
+                [getattr(unit , field) for unit in memory_units],
+                dtype=object
+            )
+    return columns
+
+class CompiledRule:
+    __slots__ = ("rule" , "predicates" , "_checks" , "_column_checks")
+
+    def __init__(self , rule: PolicyRule):
+        self.rule = rule
+        self.predicates: List[Predicate] = []
+        for field, spec in rule.when.items():
+            self.predicates.extend(_compile_condition(rule.name , field , spec))
+        self._checks = tuple(
+            (field , RULE_OPERATORS[op] , value) for field, op, value in self.predicates
+        )
+        self._column_checks = tuple(
+            (field , COLUMN_OPERATORS[op] , _column_value(field , op , value))
+            for field, op, value in self.predicates
+        )
+
+    def matches(self , memory_unit: MemoryUnit) -> bool:
+        for field, check, value in self._checks:
+            if not check(_value(getattr(memory_unit , field)) , value):
+                return False
+        return True
+
+    def mask(self , columns: Dict[str,np.ndarray] , count: int) -> np.ndarray:
+        matched = np.ones(count , dtype=bool)
+        for field, check, value in self._column_checks:
+            matched &= check(columns[field] , value)
+        return matched
+
+def parse_rules(raw_rules: List[dict]) -> List[PolicyRule]:
+    rules = [PolicyRule(**raw_rule) for raw_rule in raw_rules]
+    for rule in rules:
+        if rule.should_store and rule.target_store is None:
+            raise ValueError(f"Rule '{rule.name}' stores memories but has no target_store")
+    names = [rule.name for rule in rules]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate policy rule names: {duplicates}")
+    return rules
+
+def compile_rules(rules: List[PolicyRule]) -> Tuple[CompiledRule,...]:
+    # Stable sort: rules with equal priority keep their file order
+    ordered = sorted(rules , key=lambda rule: rule.priority , reverse=True)
+    return tuple(CompiledRule(rule) for rule in ordered)
+
+def load_rules_file(path: str) -> List[PolicyRule]:
+    """Read rules from a JSON or YAML file.
+
+    The file holds either a list of rules or a mapping with a ``rules`` list.
+    """
+    with open(path , "r" , encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml" , ".yml"):
+            if yaml is None:
+                raise ImportError("The 'PyYAML' package is required for YAML policy rule files")
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+    if isinstance(document , dict):
+        document = document.get("rules")
+    if not isinstance(document , list):
+        raise ValueError(f"Policy rule file {path} must contain a list of rules")
+    return parse_rules(document)
@@ -0,0 +1,120 @@
+from typing import List , Optional , Tuple
+from datetime import datetime , timezone , timedelta
+import time
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for WORKING_MEMORY_BACKEND=redis
+    redis = None
+
+from src.memory_stores import BaseWorkingMemoryStore
+from src.Schemas import MemoryUnit , MemoryLifecycle , WorkingMemoryEntry
+
+class RedisWorkingMemoryStore(BaseWorkingMemoryStore):
+    """Working memory shared by every worker process through Redis.
+
+    Each entry is a JSON string under its own key with a native TTL, and each
+    session keeps a sorted set of memory ids scored by expiry time. Needs
+    Redis >= 7 for EXPIRE NX/GT.
+    """
+    backend_name = "redis"
+
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379/0",
+        key_prefix: str = "continuum:working",
+        client=None
+    ):
+        if client is None:
+            if redis is None:
+                raise ImportError(
+                    "The 'redis' package is required for the redis working memory backend"
+                )
+            client = redis.Redis.from_url(redis_url)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _unit_key(self , memory_id: str) -> str:
+        return f"{self.key_prefix}:unit:{memory_id}"
+
+    def _session_key(self , session_id: str) -> str:
+        return f"{self.key_prefix}:session:{session_id}"
+
+    def add(self , memory_unit: MemoryUnit , ttl_seconds: int = 3600):
+        self.add_many([(memory_unit , ttl_seconds)])
+
+    def add_many(self , entries: List[Tuple[MemoryUnit , int]]):
+        if not entries:
+            return
+        now = datetime.now(timezone.utc)
+        pipe = self.client.pipeline(transaction=False)
+        for memory_unit, ttl_seconds in entries:
+            expires_at = now + timedelta(seconds=ttl_seconds)
+            entry = WorkingMemoryEntry(
+                memory_unit=memory_unit,
+                ttl_seconds=ttl_seconds,
+                expires_at=expires_at
+            )
+            session_key = self._session_key(memory_unit.source_session)
+            pipe.set(self._unit_key(memory_unit.id) , entry.model_dump_json() , ex=max(1 , ttl_seconds))
+            pipe.zadd(session_key , {memory_unit.id: expires_at.timestamp()})
+            # The session index lives as long as its longest-lived entry
+            pipe.expire(session_key , max(1 , ttl_seconds) , nx=True)
+            pipe.expire(session_key , max(1 , ttl_seconds) , gt=True)
+        pipe.execute()
+
+    def get_active(self , session_id: str) -> List[MemoryUnit]:
+        now = time.time()
+        session_key = self._session_key(session_id)
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore(session_key , "-inf" , now)
+        pipe.zrangebyscore(session_key , f"({now}" , "+inf")
+        _ , memory_ids = pipe.execute()
+        if not memory_ids:
+            return []
+
+        memory_ids = [self._decode(memory_id) for memory_id in memory_ids]
+        payloads = self.client.mget([self._unit_key(memory_id) for memory_id in memory_ids])
+
+        active = []
+        stale = []
+        for memory_id, payload in zip(memory_ids , payloads):
+            if payload is None:
+                stale.append(memory_id)
+                continue
+            memory_unit = WorkingMemoryEntry.model_validate_json(payload).memory_unit
+            if memory_unit.lifecycle == MemoryLifecycle.ACTIVE:
+                active.append(memory_unit)
+        if stale:
+            self.client.zrem(session_key , *stale)
+        return active
+
+    def cleanup_expired(self):
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for session_key in self.client.scan_iter(match=f"{self.key_prefix}:session:*" , count=500):
+            pipe.zremrangebyscore(session_key , "-inf" , now)
+        pipe.execute()
+
+    def get_by_id(self , memory_id: str) -> Optional[MemoryUnit]:
+        payload = self.client.get(self._unit_key(memory_id))
+        if payload is None:
+            return None
+        return WorkingMemoryEntry.model_validate_json(payload).memory_unit
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend_name,
+            "key_prefix": self.key_prefix
+        }
+
+    def ping(self) -> bool:
+        return bool(self.client.ping())
+
+    def close(self):
+        self.client.close()
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode("utf-8") if isinstance(value , bytes) else value
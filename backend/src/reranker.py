@@ -0,0 +1,70 @@
+from typing import List , Optional
+from datetime import datetime , timezone
+import numpy as np
+
+from src.Schemas import MemoryLifecycle , RankingWeights , ScoredMemory
+
+class RelevanceReranker:
+    """Re-orders over-fetched retrieval candidates by a composite score.
+
+    Each candidate gets four features in [0, 1]: its retrieval score
+    (clipped cosine similarity, or a normalized fused rank), recency
+    (halving every ``half_life_hours`` since the last update), confidence,
+    and reinforcement (log retrieval count, with a reinforced lifecycle
+    counting as one more retrieval, relative to the best-retrieved
+    candidate). The score is their weighted mean, computed for the whole
+    candidate list as one matrix-vector product.
+    """
+    def __init__(self , weights: Optional[RankingWeights] = None):
+        self.weights = weights or RankingWeights()
+
+    def rerank(
+        self,
+        candidates: List[ScoredMemory],
+        top_k: int,
+        weights: Optional[RankingWeights] = None,
+        now: Optional[datetime] = None
+    ) -> List[ScoredMemory]:
+        """The best ``top_k`` candidates, each rescored with the composite
+        score, which is also set as the memory's ``metadata["relevance"]``."""
+        if not candidates or top_k <= 0:
+            return []
+        weights = weights or self.weights
+        now = now or datetime.now(timezone.utc)
+
+        updated_at = np.asarray([
+            (memory.updated_at if memory.updated_at.tzinfo else memory.updated_at.replace(tzinfo=timezone.utc)).timestamp()
+            for memory in (candidate.memory for candidate in candidates)
+        ])
+        age_hours = np.maximum(0.0 , (now.timestamp() - updated_at) / 3600.0)
+        retrievals = np.log1p(np.asarray([
+            candidate.retrieval_count + (candidate.memory.lifecycle == MemoryLifecycle.REINFORCED.value)
+            for candidate in candidates
+        ] , dtype=np.float64))
+
+        features = np.column_stack([
+            np.clip([candidate.score for candidate in candidates] , 0.0 , 1.0),
+            np.power(0.5 , age_hours / weights.half_life_hours),
+            [candidate.memory.confidence for candidate in candidates],
+            retrievals / retrievals.max() if retrievals.max() > 0 else retrievals
+        ])
+        weight_vector = np.asarray([
+            weights.similarity , weights.recency , weights.confidence , weights.reinforcement
+        ])
+        total = weight_vector.sum()
+        scores = features @ (weight_vector / total if total > 0 else weight_vector)
+
+        # Stable, so equal scores keep retrieval order
+        order = np.argsort(-scores , kind="stable")[:top_k]
+        ranked = []
+        for index in order:
+            candidate = candidates[index]
+            score = float(scores[index])
+            # Copied: stores may hand out their own metadata dicts
+            candidate.memory.metadata = {**candidate.memory.metadata , "relevance": round(score , 6)}
+            ranked.append(ScoredMemory(
+                memory=candidate.memory,
+                score=score,
+                retrieval_count=candidate.retrieval_count
+            ))
+        return ranked
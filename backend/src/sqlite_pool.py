@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from typing import List
+import sqlite3
+import queue
+
+class SQLiteConnectionPool:
+    """Bounded pool of long-lived SQLite connections tuned for concurrent access.
+
+    Connections run in WAL mode so readers do not block the writer, and keep
+    sqlite3's per-connection statement cache warm across requests.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int = 4,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 16 * 1024,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256
+    ):
+        self.db_path = db_path
+        # Every connection to ":memory:" is a separate database
+        self.pool_size = 1 if db_path == ":memory:" else max(1 , pool_size)
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._connections: List[sqlite3.Connection] = []
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=self.pool_size)
+        for _ in range(self.pool_size):
+            conn = self._connect()
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
@@ -0,0 +1,215 @@
+from typing import Callable , Dict , List , Optional , Tuple
+from collections import OrderedDict
+from datetime import datetime , timezone
+import threading
+import math
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+from src.Schemas import MemoryUnit , LLMProvider
+
+# Tokens available for rendered memory lines (headers included), per provider
+DEFAULT_TOKEN_BUDGETS: Dict[str,int] = {
+    LLMProvider.GROQ.value: 3000,
+    LLMProvider.CLAUDE.value: 6000,
+    LLMProvider.CHATGPT.value: 4000,
+    LLMProvider.GEMINI.value: 1500,
+}
+
+def heuristic_token_count(text: str) -> int:
+    # ~4 characters per token for English text under BPE vocabularies
+    return (len(text) + 3) // 4
+
+class TokenCounter:
+    """Counts tokens with a ``tokenizers`` tokenizer, falling back to a
+    character heuristic while none is loaded.
+
+    ``tokenizer_path`` (a local tokenizer.json) is loaded immediately. A hub
+    ``tokenizer_name`` is fetched on a background thread, since an offline
+    lookup retries for tens of seconds; counts use the heuristic until it
+    arrives, or for good if it fails. Counts are memoised in a bounded LRU.
+    """
+    def __init__(
+        self,
+        tokenizer_name: Optional[str] = None,
+        tokenizer_path: Optional[str] = None,
+        cache_size: int = 8192
+    ):
+        self.tokenizer_name = tokenizer_path or tokenizer_name
+        self.cache_size = cache_size
+        self.load_error: Optional[str] = None
+        self._tokenizer = None
+        self._cache: "OrderedDict[str,int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if Tokenizer is None:
+            if tokenizer_name or tokenizer_path:
+                self.load_error = "tokenizers is not installed"
+        elif tokenizer_path:
+            self._load(lambda: Tokenizer.from_file(tokenizer_path))
+        elif tokenizer_name:
+            threading.Thread(
+                target=self._load,
+                args=(lambda: Tokenizer.from_pretrained(tokenizer_name),),
+                daemon=True,
+                name="tokenizer-load"
+            ).start()
+
+    def _load(self , loader: Callable):
+        try:
+            tokenizer = loader()
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Tokenizer {self.tokenizer_name} unavailable, using heuristic counts: {e}")
+            return
+        with self._lock:
+            self._tokenizer = tokenizer
+            # Heuristic counts cached before the load are dropped
+            self._cache.clear()
+
+    @property
+    def backend(self) -> str:
+        return self.tokenizer_name if self._tokenizer is not None else "heuristic"
+
+    def count(self , text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self , texts: List[str]) -> List[int]:
+        counts: List[Optional[int]] = []
+        missing: Dict[str,None] = {}
+        with self._lock:
+            tokenizer = self._tokenizer
+            for text in texts:
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                else:
+                    missing[text] = None
+                counts.append(cached)
+        if not missing:
+            return counts
+
+        if tokenizer is not None:
+            encodings = tokenizer.encode_batch(list(missing) , add_special_tokens=False)
+            computed = {text: len(encoding.ids) for text, encoding in zip(missing , encodings)}
+        else:
+            computed = {text: heuristic_token_count(text) for text in missing}
+        with self._lock:
+            if tokenizer is self._tokenizer:
+                for text, count in computed.items():
+                    self._cache[text] = count
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [
+            count if count is not None else computed[text]
+            for text, count in zip(texts , counts)
+        ]
+
+class PackSection:
+    """One block of a rendered prompt: a header plus one line per memory.
+
+    ``memories`` are in display order, which is best-first when ``ranked``
+    (search results); ``weight`` scales the relevance of every memory in the
+    section.
+    """
+    def __init__(
+        self,
+        name: str,
+        memories: List[MemoryUnit],
+        format_line: Callable[[MemoryUnit],str],
+        header: str = "",
+        weight: float = 1.0,
+        ranked: bool = False
+    ):
+        self.name = name
+        self.memories = memories
+        self.format_line = format_line
+        self.header = header
+        self.weight = weight
+        self.ranked = ranked
+
+class TokenBudgetPacker:
+    """Greedily selects memories for a prompt within a token budget.
+
+    A memory that retrieval re-ranked scores its ``metadata["relevance"]``,
+    which already weighs recency and confidence. Any other memory scores a
+    prior from its rank in a ranked section (1 for unranked ones) x recency
+    x confidence, where recency halves every ``recency_half_life_hours``
+    since the last update. Either is scaled by the section weight. Memories are taken best-first while their rendered line
+    fits; a section's header is charged with its first line. Selected
+    memories keep display order.
+    """
+    def __init__(self , counter: TokenCounter , recency_half_life_hours: float = 168.0):
+        self.counter = counter
+        self.recency_half_life_hours = recency_half_life_hours
+
+    def score(self , memory: MemoryUnit , rank: Optional[int] , weight: float , now: datetime) -> float:
+        relevance = memory.metadata.get("relevance")
+        if isinstance(relevance , (int , float)):
+            return weight * float(relevance)
+        relevance = 1.0 / (1.0 + 0.1 * rank) if rank is not None else 1.0
+        updated_at = memory.updated_at
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        age_hours = max(0.0 , (now - updated_at).total_seconds() / 3600.0)
+        recency = math.pow(0.5 , age_hours / self.recency_half_life_hours)
+        return weight * relevance * recency * memory.confidence
+
+    def pack(
+        self,
+        sections: List[PackSection],
+        budget: int
+    ) -> Tuple[Dict[str,List[MemoryUnit]] , dict]:
+        """Returns the selected memories per section name and packing stats."""
+        now = datetime.now(timezone.utc)
+        candidates = []
+        lines = []
+        for section_index, section in enumerate(sections):
+            for position, memory in enumerate(section.memories):
+                candidates.append((
+                    self.score(memory , position if section.ranked else None , section.weight , now),
+                    section_index,
+                    position
+                ))
+                lines.append(section.format_line(memory))
+        headers = [section.header for section in sections]
+        costs = self.counter.count_many(lines + headers)
+        line_costs = costs[:len(lines)]
+        header_costs = costs[len(lines):]
+
+        offsets = []
+        offset = 0
+        for section in sections:
+            offsets.append(offset)
+            offset += len(section.memories)
+
+        used = 0
+        opened = set()
+        chosen: Dict[int,List[int]] = {}
+        # Highest score first; ties keep section and display order
+        for score, section_index, position in sorted(candidates , key=lambda c: (-c[0] , c[1] , c[2])):
+            cost = line_costs[offsets[section_index] + position]
+            if section_index not in opened:
+                cost += header_costs[section_index]
+            if used + cost > budget:
+                continue
+            used += cost
+            opened.add(section_index)
+            chosen.setdefault(section_index , []).append(position)
+
+        selected = {
+            section.name: [section.memories[position] for position in sorted(chosen.get(section_index , []))]
+            for section_index, section in enumerate(sections)
+        }
+        total = len(candidates)
+        packed = sum(len(memories) for memories in selected.values())
+        return selected , {
+            "token_budget": budget,
+            "context_tokens": used,
+            "memories_packed": packed,
+            "memories_dropped": total - packed,
+            "tokenizer": self.counter.backend
+        }
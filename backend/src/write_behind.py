@@ -0,0 +1,402 @@
+from typing import Dict , List , Optional , Sequence , Tuple
+from contextlib import contextmanager
+import asyncio
+import json
+import threading
+import time
+
+from src.concurrency import StageExecutor
+from src.sqlite_pool import SQLiteConnectionPool
+from src.Schemas import MemoryUnit , PolicyDecision
+
+# Journal operations, applied in this order within a batch: repeats and
+# reinforcements can target units written by the same batch, and a repeat
+# never deprecates the memory it repeats
+STORE_OPS = ("working" , "episodic" , "semantic")
+OPS = STORE_OPS + ("repeat" , "reinforce" , "deprecate")
+
+class WriteBehindQueue:
+    """Durable write-behind queue between request handling and the stores.
+
+    ``enqueue`` appends the routed writes of a request to a SQLite journal in
+    one transaction and returns; an asyncio worker then drains the journal in
+    batches of up to ``batch_size`` operations. Writes to the same memory in
+    a batch coalesce into the latest one, and each store gets a single
+    grouped call through the manager's ``write_*`` / ``repeat_episodic`` /
+    ``reinforce_semantic`` / ``deprecate_semantic``. A failed group stays journaled and is retried
+    with exponential backoff, from the second attempt one operation per
+    call so a single bad write doesn't hold back the rest. After
+    ``max_attempts`` an operation is dead-lettered (kept with its last
+    error, and no longer retried until ``requeue_dead``); rows that fail to
+    decode are dead-lettered at once. Journal rows are deleted only once
+    applied, so rows left by a crash are replayed when the worker next
+    starts: delivery is at-least-once, and a replayed reinforcement boosts
+    confidence again.
+
+    Queued writes are visible to retrieval, dedup and policy checks only
+    once the worker has applied them.
+    """
+    def __init__(
+        self,
+        memory_store,
+        executor: StageExecutor,
+        journal_path: str = "episodic_memory.db",
+        batch_size: int = 256,
+        coalesce_ms: float = 20.0,
+        max_attempts: int = 8,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 60.0
+    ):
+        self.memory_store = memory_store
+        self.executor = executor
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.coalesce_ms = coalesce_ms
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._pool: Optional[SQLiteConnectionPool] = SQLiteConnectionPool(journal_path , pool_size=1)
+        # Held for each journal transaction, so close() can wait out the one in progress
+        self._lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS write_journal(
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    memory_id TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_write_journal_due
+                ON write_journal(status , next_attempt_at)
+            """)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+        self.applied = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            if self._pool is None:
+                raise RuntimeError("Write-behind journal is closed")
+            with self._pool.connection() as conn:
+                yield conn
+
+    # -- producer side -------------------------------------------------
+
+    async def enqueue(
+        self,
+        working: Sequence[Tuple[MemoryUnit , int]] = (),
+        episodic: Sequence[Tuple[MemoryUnit , str]] = (),
+        semantic: Sequence[Tuple[MemoryUnit , List[float]]] = (),
+        reinforce_ids: Sequence[str] = (),
+        deprecate_ids: Sequence[str] = (),
+        repeat_ids: Sequence[str] = (),
+        decisions: Optional[Dict[str,PolicyDecision]] = None
+    ):
+        """Journals one request's writes (arguments as for the manager's
+        grouped writes) and wakes the worker. ``decisions`` are kept with
+        their units so dead letters show why each was stored."""
+        decisions = decisions or {}
+        now = time.time()
+        rows = []
+        for op, items in (("working" , working) , ("episodic" , episodic) , ("semantic" , semantic)):
+            for memory_unit, argument in items:
+                decision = decisions.get(memory_unit.id)
+                rows.append((op , memory_unit.id , json.dumps({
+                    "memory_unit": memory_unit.model_dump(mode="json"),
+                    "argument": argument,
+                    "decision": decision.model_dump(mode="json") if decision is not None else None
+                }) , now , now))
+        if repeat_ids:
+            rows.append(("repeat" , None , json.dumps({"memory_ids": list(repeat_ids)}) , now , now))
+        if reinforce_ids:
+            rows.append(("reinforce" , None , json.dumps({"memory_ids": list(reinforce_ids)}) , now , now))
+        if deprecate_ids:
+            rows.append(("deprecate" , None , json.dumps({"memory_ids": list(deprecate_ids)}) , now , now))
+        if not rows:
+            return
+        await self.executor.run("journal" , self._append , rows)
+        self.start()
+        self._wakeup.set()
+
+    def _append(self , rows: List[tuple]):
+        with self._connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO write_journal(op , memory_id , payload , next_attempt_at , enqueued_at)
+                VALUES(? , ? , ? , ? , ?)
+                """,
+                rows
+            )
+
+    # -- worker --------------------------------------------------------
+
+    def start(self):
+        """Starts the worker on the running loop; journaled rows from an
+        earlier run are replayed first."""
+        if self._worker is not None or self._closed:
+            return
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                rows , next_due = await self.executor.run("journal" , self._claim)
+                if rows:
+                    await self._apply(rows)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The journal itself failed; its rows are untouched, so try again shortly
+                self.last_error = f"journal: {e!r}"
+                print(f"Write-behind worker error: {e!r}")
+                await asyncio.sleep(self.retry_backoff)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    max(0.0 , next_due - time.time()) if next_due is not None else None
+                )
+            except asyncio.TimeoutError:
+                continue
+            # Let the rest of a burst arrive so it is applied as one batch
+            await asyncio.sleep(self.coalesce_ms / 1000.0)
+
+    def _claim(self) -> Tuple[List[dict] , Optional[float]]:
+        now = time.time()
+        with self._connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT seq , op , payload , attempts FROM write_journal
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY seq LIMIT ?
+                """,
+                (now , self.batch_size)
+            ).fetchall()
+            if rows:
+                return [dict(row) for row in rows] , None
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM write_journal WHERE status = 'pending'"
+            ).fetchone()
+            return [] , row[0]
+
+    async def _apply(self , rows: List[dict]):
+        # Per op: the coalesced store writes by memory id, or the id lists by row
+        groups: Dict[str,Dict[object,list]] = {op: {} for op in OPS}
+        seqs: Dict[str,Dict[object,List[int]]] = {op: {} for op in OPS}
+        attempts: Dict[int,int] = {}
+        failed: List[Tuple[str , List[int] , BaseException , bool]] = []
+        for row in rows:
+            op = row["op"]
+            attempts[row["seq"]] = row["attempts"]
+            try:
+                payload = json.loads(row["payload"])
+                if op in STORE_OPS:
+                    memory_unit = MemoryUnit(**payload["memory_unit"])
+                    key , item = memory_unit.id , (memory_unit , payload["argument"])
+                elif op in OPS:
+                    key , item = row["seq"] , list(payload["memory_ids"])
+                else:
+                    raise ValueError(f"Unknown journal operation {op!r}")
+            except Exception as e:
+                # Retrying can't fix a row that doesn't decode, e.g. one journaled before a schema change
+                failed.append((op , [row["seq"]] , e , False))
+                continue
+            if op in STORE_OPS:
+                # Rows are in seq order, so a later write of the same memory wins
+                groups[op][key] = [item]
+            else:
+                groups[op][key] = item
+            seqs[op].setdefault(key , []).append(row["seq"])
+
+        writers = {
+            "working": self.memory_store.write_working,
+            "episodic": self.memory_store.write_episodic,
+            "semantic": self.memory_store.write_semantic,
+        }
+
+        def retried(op: str) -> bool:
+            return any(attempts[seq] for op_seqs in seqs[op].values() for seq in op_seqs)
+
+        pending_ops = [op for op in STORE_OPS if groups[op]]
+        results = await asyncio.gather(*(
+            self._apply_group(op , writers[op] , groups[op] , isolate=retried(op)) for op in pending_ops
+        ))
+        outcomes: Dict[str,Dict[object,Optional[BaseException]]] = dict(zip(pending_ops , results))
+
+        # Repeats, reinforcements and deprecations wait for the writes they may refer to
+        failed_writes = {
+            op: {
+                memory_id: error for memory_id, error in outcomes.get(op , {}).items()
+                if error is not None
+            }
+            for op in ("episodic" , "semantic")
+        }
+        for op, stage, fn, unique in (
+            ("repeat" , "episodic" , self.memory_store.repeat_episodic , False),
+            ("reinforce" , "semantic" , self.memory_store.reinforce_semantic , False),
+            ("deprecate" , "semantic" , self.memory_store.deprecate_semantic , True),
+        ):
+            if not groups[op]:
+                continue
+            outcomes[op] = {}
+            ready = {}
+            for key, memory_ids in groups[op].items():
+                blocker = next(
+                    (failed_writes[stage][i] for i in memory_ids if i in failed_writes[stage]) , None
+                )
+                if blocker is not None:
+                    outcomes[op][key] = blocker
+                else:
+                    ready[key] = memory_ids
+            if ready:
+                outcomes[op].update(await self._apply_group(
+                    stage , fn , ready , unique=unique , isolate=retried(op)
+                ))
+
+        done = []
+        for op, results in outcomes.items():
+            for key, error in results.items():
+                if error is None:
+                    done.extend(seqs[op][key])
+                else:
+                    failed.append((op , seqs[op][key] , error , True))
+        await self.executor.run("journal" , self._settle , done , failed , attempts)
+
+    async def _apply_group(
+        self,
+        stage: str,
+        fn,
+        groups: Dict[object,list],
+        unique: bool = False,
+        isolate: bool = False
+    ) -> Dict[object,Optional[BaseException]]:
+        """Applies ``groups`` (key -> items) in one call of ``fn`` and
+        returns the error per key. With ``isolate`` (the group has failed
+        before), a failed call is retried one key per call, so one bad write
+        doesn't hold back the rest; a first failure is retried whole, which
+        keeps an outage of the store from costing a call per key."""
+        def merged(keys) -> list:
+            items = [item for key in keys for item in groups[key]]
+            return list(dict.fromkeys(items)) if unique else items
+        try:
+            await self.executor.run(stage , fn , merged(groups))
+            return dict.fromkeys(groups)
+        except Exception as e:
+            if not isolate or len(groups) == 1:
+                return {key: e for key in groups}
+        outcomes: Dict[object,Optional[BaseException]] = {}
+        for key in groups:
+            try:
+                await self.executor.run(stage , fn , merged([key]))
+                outcomes[key] = None
+            except Exception as e:
+                outcomes[key] = e
+        return outcomes
+
+    def _settle(
+        self,
+        done: List[int],
+        failed: List[Tuple[str , List[int] , BaseException , bool]],
+        attempts: Dict[int,int]
+    ):
+        """Deletes applied rows and reschedules failed ones; ``failed``
+        holds (op, seqs, error, retryable), and rows that aren't retryable
+        or are out of attempts are dead-lettered."""
+        now = time.time()
+        retried: Dict[str,Tuple[int , BaseException]] = {}
+        with self._connection() as conn:
+            for start in range(0 , len(done) , 500):
+                chunk = done[start:start + 500]
+                conn.execute(
+                    f"DELETE FROM write_journal WHERE seq IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+            for op, op_seqs, error, retryable in failed:
+                attempt = max(attempts[seq] for seq in op_seqs) + 1
+                dead = not retryable or attempt >= self.max_attempts
+                delay = min(self.max_backoff , self.retry_backoff * (2 ** (attempt - 1)))
+                conn.executemany(
+                    """
+                    UPDATE write_journal
+                    SET attempts = ? , status = ? , next_attempt_at = ? , last_error = ?
+                    WHERE seq = ?
+                    """,
+                    [
+                        (attempt , "dead" if dead else "pending" , now + delay , repr(error) , seq)
+                        for seq in op_seqs
+                    ]
+                )
+                self.last_error = f"{op}: {error!r}"
+                if dead:
+                    self.dead_lettered += len(op_seqs)
+                    print(f"Write-behind {op} dead-lettered {len(op_seqs)} operation(s) after {attempt} attempt(s): {error!r}")
+                else:
+                    self.retried += len(op_seqs)
+                    retried[op] = (retried.get(op , (0 , None))[0] + len(op_seqs) , error)
+        for op, (count, error) in retried.items():
+            print(f"Write-behind {op}: {count} operation(s) failed, retrying with backoff: {error!r}")
+        self.applied += len(done)
+
+    # -- maintenance ---------------------------------------------------
+
+    def requeue_dead(self) -> int:
+        """Puts dead-lettered operations back in the queue with fresh attempts."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE write_journal SET status = 'pending' , attempts = 0 , next_attempt_at = ?
+                WHERE status = 'dead'
+                """,
+                (time.time() ,)
+            )
+            requeued = cursor.rowcount
+        if requeued and self._wakeup is not None:
+            self._wakeup.set()
+        return requeued
+
+    def stats(self) -> dict:
+        with self._connection() as conn:
+            counts = dict(conn.execute(
+                "SELECT status , COUNT(*) FROM write_journal GROUP BY status"
+            ).fetchall())
+        return {
+            "pending": counts.get("pending" , 0),
+            "dead_lettered": counts.get("dead" , 0),
+            "applied": self.applied,
+            "retried": self.retried,
+            "last_error": self.last_error,
+            "running": self._worker is not None and not self._worker.done()
+        }
+
+    async def close(self):
+        """Stops the worker and closes the journal once a transaction in
+        progress has finished. Unapplied rows stay journaled and are
+        replayed on the next start."""
+        self._closed = True
+        worker , self._worker = self._worker , None
+        if worker is not None:
+            worker.cancel()
+            await asyncio.gather(worker , return_exceptions=True)
+        # A claim or settle the worker was awaiting still runs in its thread
+        await self.executor.run("journal" , self._close_pool)
+
+    def _close_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
@@ -0,0 +1,41 @@
+from src.json_stream import JsonArrayStreamParser , parse_json_array
+
+def _feed_chunks(text , size):
+    parser = JsonArrayStreamParser()
+    objects = []
+    for start in range(0 , len(text) , size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return objects , parser
+
+def test_brackets_inside_strings():
+    text = '[{"content": "keep ] and } and [ { inside"}, {"content": "second"}]'
+    assert parse_json_array(text) == [
+        {"content": "keep ] and } and [ { inside"},
+        {"content": "second"}
+    ]
+
+def test_escaped_quotes_and_backslashes():
+    text = r'[{"content": "say \"hi\" ]"}, {"content": "path C:\\dir\\"}]'
+    assert parse_json_array(text) == [
+        {"content": 'say "hi" ]'},
+        {"content": "path C:\\dir\\"}
+    ]
+
+def test_prose_around_array():
+    text = (
+        "Here are the memories [as requested]:\n```json\n"
+        '[{"type": "fact"}]\n```\nLet me know [if] you need more.'
+    )
+    assert parse_json_array(text) == [{"type": "fact"}]
+
+def test_chunked_feed_matches_whole_text():
+    text = 'Sure: [{"a": "x]\\"y"}, {"b": [1, 2, {"c": "}"}]}] trailing [{"ignored": 1}]'
+    whole = parse_json_array(text)
+    assert whole == [{"a": 'x]"y'} , {"b": [1 , 2 , {"c": "}"}]}]
+    for size in (1 , 2 , 3 , 7):
+        objects , parser = _feed_chunks(text , size)
+        assert objects == whole
+        assert parser.done
+
+def test_invalid_objects_are_dropped():
+    assert parse_json_array('[{"a": 1}, {"b": }, {"c": 3}]') == [{"a": 1} , {"c": 3}]
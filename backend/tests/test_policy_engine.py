@@ -0,0 +1,36 @@
+import itertools
+
+from src.policy_engine import MemoryPolicyEngine
+from src.Schemas import MemoryUnit , MemoryType , MemoryScope
+
+def _unit(memory_type , scope , confidence , content="use postgres for the main database"):
+    return MemoryUnit(
+        type=memory_type,
+        content=content,
+        scope=scope,
+        source_session="session-1",
+        confidence=confidence
+    )
+
+def test_evaluate_batch_matches_evaluate():
+    engine = MemoryPolicyEngine()
+    units = [
+        _unit(memory_type , scope , confidence)
+        for memory_type, scope, confidence in itertools.product(
+            list(MemoryType) , list(MemoryScope) , (0.3 , 0.5 , 0.75 , 0.85)
+        )
+    ]
+    existing = [
+        _unit(MemoryType.DECISION , scope , 0.4 , "use postgres for the main database today")
+        for scope in MemoryScope
+    ] + [_unit(MemoryType.DECISION , MemoryScope.PROJECT , 0.6 , "deploy with docker compose")]
+
+    batch = engine.evaluate_batch(units , existing)
+    single = [engine.evaluate(unit , existing) for unit in units]
+
+    assert [decision.model_dump() for decision in batch] == [decision.model_dump() for decision in single]
+    # The fixture exercises the contradiction path, not only routing
+    assert any(decision.deprecate_existing for decision in batch)
+
+def test_evaluate_batch_empty():
+    assert MemoryPolicyEngine().evaluate_batch([] , []) == []
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+
+from src.concurrency import StageExecutor
+from src.Schemas import MemoryUnit
+from src.write_behind import WriteBehindQueue
+
+class RecordingStore:
+    """Manager stand-in that records grouped writes and can reject units."""
+    def __init__(self , fail_calls: int = 0 , reject=()):
+        self.fail_calls = fail_calls
+        self.reject = set(reject)
+        self.calls = []
+
+    def _record(self , op , items):
+        if self.fail_calls:
+            self.fail_calls -= 1
+            raise RuntimeError("store unavailable")
+        contents = [item[0].content if isinstance(item , tuple) else item for item in items]
+        if self.reject & set(contents):
+            raise ValueError("rejected")
+        self.calls.append((op , contents))
+
+    def write_working(self , entries):
+        self._record("working" , entries)
+
+    def write_episodic(self , events):
+        self._record("episodic" , events)
+
+    def write_semantic(self , items):
+        self._record("semantic" , items)
+
+    def repeat_episodic(self , memory_ids):
+        self._record("repeat" , memory_ids)
+
+    def reinforce_semantic(self , memory_ids):
+        self._record("reinforce" , memory_ids)
+
+    def deprecate_semantic(self , memory_ids):
+        self._record("deprecate" , memory_ids)
+
+    def written(self , op):
+        return [content for call_op, contents in self.calls if call_op == op for content in contents]
+
+def _unit(content , memory_id=None):
+    unit = MemoryUnit(type="fact" , content=content , scope="project" , source_session="session-1")
+    if memory_id:
+        unit.id = memory_id
+    return unit
+
+def _queue(path , store , executor , **kwargs):
+    kwargs.setdefault("retry_backoff" , 0.01)
+    kwargs.setdefault("coalesce_ms" , 1.0)
+    return WriteBehindQueue(store , executor , journal_path=str(path) , **kwargs)
+
+async def _journal(path , executor , **writes):
+    """Journals ``writes`` and closes the queue before its worker runs."""
+    queue = _queue(path , RecordingStore() , executor)
+    await queue.enqueue(**writes)
+    await queue.close()
+
+async def _drain(queue , timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = queue.stats()
+        if not stats["pending"]:
+            return stats
+        assert time.monotonic() < deadline , stats
+        await asyncio.sleep(0.01)
+
+def test_journaled_writes_survive_a_restart(tmp_path):
+    async def scenario():
+        executor = StageExecutor()
+        path = tmp_path / "journal.db"
+        await _journal(path , executor , working=[(_unit("w") , 60)] , semantic=[(_unit("s") , [0.1 , 0.2])])
+
+        store = RecordingStore()
+        queue = _queue(path , store , executor)
+        assert queue.stats()["pending"] == 2
+        queue.start()
+        stats = await _drain(queue)
+        await queue.close()
+        executor.shutdown()
+        return store , stats
+
+    store , stats = asyncio.run(scenario())
+    assert store.written("working") == ["w"]
+    assert store.written("semantic") == ["s"]
+    assert stats["applied"] == 2 and stats["dead_lettered"] == 0
+
+def test_writes_to_the_same_memory_coalesce(tmp_path):
+    async def scenario():
+        executor = StageExecutor()
+        path = tmp_path / "journal.db"
+        await _journal(path , executor , semantic=[(_unit("first" , "m1") , [0.1]) , (_unit("other") , [0.2])])
+        await _journal(path , executor , semantic=[(_unit("second" , "m1") , [0.3])])
+
+        store = RecordingStore()
+        queue = _queue(path , store , executor)
+        queue.start()
+        await _drain(queue)
+        await queue.close()
+        executor.shutdown()
+        return store
+
+    store = asyncio.run(scenario())
+    # One grouped call, with the later write of m1 replacing the earlier one
+    assert store.calls == [("semantic" , ["second" , "other"])]
+
+def test_failed_writes_are_retried_then_dead_lettered(tmp_path):
+    async def scenario():
+        executor = StageExecutor()
+        store = RecordingStore(fail_calls=2)
+        queue = _queue(tmp_path / "journal.db" , store , executor)
+        await queue.enqueue(episodic=[(_unit("e") , "event")])
+        retried = await _drain(queue)
+
+        failing = _queue(tmp_path / "other.db" , RecordingStore(fail_calls=100) , executor , max_attempts=2)
+        await failing.enqueue(episodic=[(_unit("x") , "event")])
+        dead = await _drain(failing)
+        requeued = failing.requeue_dead()
+        await queue.close()
+        await failing.close()
+        executor.shutdown()
+        return store , retried , dead , requeued
+
+    store , retried , dead , requeued = asyncio.run(scenario())
+    assert store.written("episodic") == ["e"]
+    assert retried["retried"] == 2 and retried["applied"] == 1
+    assert dead["dead_lettered"] == 1 and dead["retried"] == 1
+    assert "store unavailable" in dead["last_error"]
+    assert requeued == 1
+
+def test_a_rejected_unit_does_not_hold_back_its_batch(tmp_path):
+    async def scenario():
+        executor = StageExecutor()
+        store = RecordingStore(reject={"bad"})
+        queue = _queue(tmp_path / "journal.db" , store , executor , max_attempts=3)
+        await queue.enqueue(semantic=[(_unit("good") , [0.1]) , (_unit("bad") , [0.2])])
+        stats = await _drain(queue)
+        await queue.close()
+        executor.shutdown()
+        return store , stats
+
+    store , stats = asyncio.run(scenario())
+    assert store.written("semantic") == ["good"]
+    assert stats["applied"] == 1 and stats["dead_lettered"] == 1
+
+def test_undecodable_rows_are_dead_lettered_at_once(tmp_path):
+    async def scenario():
+        executor = StageExecutor()
+        path = tmp_path / "journal.db"
+        await _journal(path , executor , working=[(_unit("w") , 60)])
+        queue = _queue(path , RecordingStore() , executor)
+        now = time.time()
+        queue._append([
+            ("semantic" , "stale" , json.dumps({"memory_unit": {"content": "no type"} , "argument": []}) , now , now),
+            ("working" , "broken" , "{not json" , now , now),
+        ])
+        store = queue.memory_store
+        queue.start()
+        stats = await _drain(queue)
+        await queue.close()
+        executor.shutdown()
+        return store , stats
+
+    store , stats = asyncio.run(scenario())
+    assert store.written("working") == ["w"]
+    assert stats["applied"] == 1 and stats["dead_lettered"] == 2 and stats["retried"] == 0